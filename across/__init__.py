@@ -1,4 +1,53 @@
-from .api import *
-from .fee_calculator import *
-from .lp_fee_calculator import *
-from .utils import *
\ No newline at end of file
+import importlib
+from typing import TYPE_CHECKING
+
+# Public names and the submodule defining them. Submodules are only imported when one of their names is first
+# used, so `import across` stays cheap and the pure fee math never imports web3, aiohttp or requests.
+_EXPORTS = {
+    "api": ["AcrossException", "AcrossAPI", "SuggestedFeesRequest"],
+    "async_api": ["AsyncAcrossAPI"],
+    "fee_calculator": [
+        "calculate_instantaneous_rate",
+        "calculate_apy_from_utilization",
+        "calculate_realized_lp_fee_pct",
+        "calculate_areas_under_rate_curve",
+        "calculate_apys_from_utilizations",
+        "convert_apys_to_weekly_fees",
+        "calculate_realized_lp_fee_pcts",
+    ],
+    "lp_fee_calculator": ["LpFeeCalculator", "LpFeeRequest"],
+    "async_lp_fee_calculator": ["AsyncLpFeeCalculator"],
+    "multi_chain": ["MultiChainLpFeeCalculator", "ChainLpFeeRequest"],
+    "backfill": ["Backfill", "BackfillPool"],
+    "utils": ["toBNWei", "fixedPointAdjustment", "BigNumberish", "sorted_index_by"],
+}
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+# `AcrossException` lives in `exceptions`, importing it from there avoids loading `requests` for it.
+_MODULES["AcrossException"] = "exceptions"
+
+__all__ = list(_MODULES)
+
+
+def __getattr__(name: str):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value  # Later lookups skip __getattr__.
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:
+    from .api import *
+    from .async_api import *
+    from .exceptions import AcrossException
+    from .fee_calculator import *
+    from .lp_fee_calculator import *
+    from .async_lp_fee_calculator import *
+    from .multi_chain import *
+    from .backfill import *
+    from .utils import *
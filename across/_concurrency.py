@@ -0,0 +1,16 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+async def _single_flight(
+    pending: Dict[Hashable, "asyncio.Future"],
+    key: Hashable,
+    factory: Callable[[], Awaitable[Any]],
+) -> Any:
+    # Concurrent callers asking for the same key share one in-flight request.
+    future = pending.get(key)
+    if future is None:
+        future = pending[key] = asyncio.ensure_future(factory())
+        future.add_done_callback(lambda _: pending.pop(key, None))
+    # Shield so a cancelled caller does not cancel the request for everyone else.
+    return await asyncio.shield(future)
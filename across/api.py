@@ -1,15 +1,141 @@
+import threading
+import time
 import requests
-from typing import Dict
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Sequence, Tuple, Union
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from .exceptions import AcrossException
 
 
-__all__ = ["AcrossException", "AcrossAPI"]
+__all__ = ["AcrossException", "AcrossAPI", "SuggestedFeesRequest"]
+
+# Responses worth retrying: rate limiting and transient server errors.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class SuggestedFeesRequest(NamedTuple):
+    """A single query for `AcrossAPI.suggested_fees_many`."""
+
+    l2Token: str
+    chainId: int
+    amount: int
+
+
+def bucket_amount(amount: int, significant_digits: Optional[int]) -> int:
+    """Rounds `amount` down to `significant_digits` significant digits, or returns it as is when None."""
+    amount = int(amount)
+    if significant_digits is None or amount <= 0:
+        return amount
+    scale = 10 ** max(len(str(amount)) - significant_digits, 0)
+    return amount // scale * scale
+
+
+class _TTLCache:
+    """An LRU cache whose entries expire `ttl` seconds after they are set. Callers synchronize access."""
+
+    def __init__(self, ttl: float, maxsize: int) -> None:
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # key -> (expires at, value)
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
 
 
 class AcrossAPI:
+    """Client for the Across API.
+
+    Requests share one pooled keep-alive session, time out after `timeout` seconds and are retried with
+    exponential backoff on connection errors and `RETRY_STATUSES`. Identical queries in flight at the same
+    time are sent once, and with a `cache_ttl` successful responses are reused for that many seconds.
+
+    Args:
+        base_url (str, optional): API root. Defaults to `BASEURL`.
+        timeout (Union[float, Tuple[float, float]], optional): connect and read timeouts in seconds.
+        retries (int, optional): retries after the first attempt. Defaults to 3.
+        backoff_factor (float, optional): retry `n` sleeps `backoff_factor * 2 ** (n - 1)` seconds.
+        cache_ttl (float, optional): seconds a response is reused for, 0 disables the cache. Defaults to 0.
+        cache_maxsize (int, optional): most responses kept in the cache. Defaults to 1024.
+        amount_significant_digits (Optional[int], optional): when set with a `cache_ttl`, amounts that agree on
+            this many significant digits share a cache entry. The exact amount is always queried. Defaults to None.
+        max_workers (int, optional): concurrent requests made by `suggested_fees_many`. Defaults to 8.
+        session (Optional[requests.Session], optional): session to use instead of a new pooled one.
+    """
 
     BASEURL = "https://across.to/api"
 
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        timeout: Union[float, Tuple[float, float]] = (3.05, 10.0),
+        retries: int = 3,
+        backoff_factor: float = 0.2,
+        cache_ttl: float = 0.0,
+        cache_maxsize: int = 1024,
+        amount_significant_digits: Optional[int] = None,
+        max_workers: int = 8,
+        session: Optional[requests.Session] = None,
+    ) -> None:
+        assert max_workers > 0, "max_workers must be greater than 0"
+        self.base_url = (base_url or self.BASEURL).rstrip("/")
+        self.timeout = timeout
+        self.amount_significant_digits = amount_significant_digits
+        self.max_workers = max_workers
+        if session is None:
+            session = requests.Session()
+            retry = Retry(
+                total=retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=RETRY_STATUSES,
+                allowed_methods=frozenset(["GET"]),
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers, max_retries=retry)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+        self.cache = _TTLCache(cache_ttl, cache_maxsize)
+        self._pending: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def __enter__(self) -> "AcrossAPI":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self.session.close()
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self.cache.clear()
+
     def suggested_fees(
         self, l2Token: str, chainId: int, amount: int
     ) -> Dict[str, int]:
@@ -34,14 +160,79 @@ class AcrossAPI:
                 - 400: invalid input.
                 - 500: an unexpected error within the API.
         """
-        url = f"{self.BASEURL}/suggested-fees"
+        amount = int(amount)
+        key = (l2Token.lower(), int(chainId), amount)
+        # Nearby amounts may share a cached response, but a request is only shared by identical queries.
+        cache_key = key[:2] + (bucket_amount(amount, self.amount_significant_digits),)
+        with self._lock:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return dict(cached)
+            # Identical queries already in flight wait for that request instead of sending their own.
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+        if not owner:
+            return dict(future.result())
+
+        try:
+            fees = self._request_suggested_fees(l2Token, chainId, amount)
+        except BaseException as e:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._pending[key]
+            self.cache.set(cache_key, fees)
+        future.set_result(fees)
+        return dict(fees)
+
+    def _request_suggested_fees(
+        self, l2Token: str, chainId: int, amount: int
+    ) -> Dict[str, int]:
+        url = f"{self.base_url}/suggested-fees"
         params = {"amount": amount, "chainId": chainId, "l2Token": l2Token}
-        response = requests.get(url, params=params)
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise AcrossException(f"Failed to get fees for {l2Token}: {e}") from e
         if response.status_code != 200:
             raise AcrossException(
                 f"Failed to get fees for {l2Token}: {response.text}"
             )
-        return response.json()
+        try:
+            return response.json()
+        except ValueError as e:
+            raise AcrossException(f"Failed to get fees for {l2Token}: {response.text}") from e
+
+    def suggested_fees_many(
+        self, queries: Sequence[SuggestedFeesRequest]
+    ) -> List[Union[Dict[str, int], AcrossException]]:
+        """get suggested fees for many queries concurrently.
+
+        Args:
+            queries (Sequence[SuggestedFeesRequest]): `(l2Token, chainId, amount)` queries.
+
+        Returns:
+            List[Union[Dict[str, int], AcrossException]]: suggested fees in the order of `queries`.
+                A query that failed has an `AcrossException` in its slot.
+        """
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        self.max_workers, thread_name_prefix="across-api"
+                    )
+        futures = [self._executor.submit(self.suggested_fees, *query) for query in queries]
+        results: List[Union[Dict[str, int], AcrossException]] = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except AcrossException as e:
+                results.append(e)
+        return results
 
 
 if __name__ == "__main__":
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import aiohttp
+from typing import (
+    AsyncIterator,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+from .api import RETRY_STATUSES, SuggestedFeesRequest, _TTLCache, bucket_amount
+from ._concurrency import _single_flight
+from .exceptions import AcrossException
+
+__all__ = ["AsyncAcrossAPI"]
+
+
+class AsyncAcrossAPI:
+    """An asyncio version of `AcrossAPI` on a shared `aiohttp` session.
+
+    At most `limit_per_host` requests are outstanding at once, identical queries in flight at the same
+    time are sent once and with a `cache_ttl` successful responses are reused for that many seconds. The session is
+    created on first use; close it with `close()` or `async with`.
+
+    Example:
+        >>> async with AsyncAcrossAPI(limit_per_host=16) as api:
+        ...     async for index, fees in api.iter_suggested_fees(queries):
+        ...         ...
+
+    Args:
+        base_url (str, optional): API root. Defaults to `BASEURL`.
+        timeout (float, optional): seconds a request may take, including connecting. Defaults to 10.
+        retries (int, optional): retries after the first attempt. Defaults to 3.
+        backoff_factor (float, optional): retry `n` sleeps `backoff_factor * 2 ** (n - 1)` seconds.
+        cache_ttl (float, optional): seconds a response is reused for, 0 disables the cache. Defaults to 0.
+        cache_maxsize (int, optional): most responses kept in the cache. Defaults to 1024.
+        amount_significant_digits (Optional[int], optional): when set with a `cache_ttl`, amounts that agree on
+            this many significant digits share a cache entry. The exact amount is always queried. Defaults to None.
+        limit_per_host (int, optional): most requests outstanding at once. Defaults to 8.
+        session (Optional[aiohttp.ClientSession], optional): session to use instead of a new one.
+    """
+
+    BASEURL = "https://across.to/api"
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        timeout: float = 10.0,
+        retries: int = 3,
+        backoff_factor: float = 0.2,
+        cache_ttl: float = 0.0,
+        cache_maxsize: int = 1024,
+        amount_significant_digits: Optional[int] = None,
+        limit_per_host: int = 8,
+        session: Optional[aiohttp.ClientSession] = None,
+    ) -> None:
+        assert limit_per_host > 0, "limit_per_host must be greater than 0"
+        self.base_url = (base_url or self.BASEURL).rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.amount_significant_digits = amount_significant_digits
+        self.limit_per_host = limit_per_host
+        self.cache = _TTLCache(cache_ttl, cache_maxsize)
+        self._session = session
+        self._owns_session = session is None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending: Dict[Hashable, "asyncio.Future"] = {}
+
+    async def __aenter__(self) -> "AsyncAcrossAPI":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Created lazily, a session must be created inside the event loop that uses it.
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=self.limit_per_host),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Also caps sessions passed in, whose connector may allow more connections.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit_per_host)
+        return self._semaphore
+
+    async def suggested_fees(
+        self, l2Token: str, chainId: int, amount: int
+    ) -> Dict[str, int]:
+        """get suggested fees for a given amount of l2Token.
+
+        Args:
+            l2Token (str): Address of L2 Token Contract to Transfer. For ETH use address `0x0`.
+            chainId (int): Chain ID to transfer from.
+            amount (int): Amount of the token to transfer, in the native decimals of the token.
+
+        Returns:
+            suggested fees for slow and instant relay.
+                - slowFeePct (int): Fee for slow relay.
+                - instantFeePct (int): Fee for instant relay.
+
+        Raises:
+            AcrossException: if the request fails.
+        """
+        amount = int(amount)
+        key = (l2Token.lower(), int(chainId), amount)
+        # Nearby amounts may share a cached response, but a request is only shared by identical queries.
+        cache_key = key[:2] + (bucket_amount(amount, self.amount_significant_digits),)
+        fees = self.cache.get(cache_key)
+        if fees is None:
+
+            async def request():
+                fees = await self._request_suggested_fees(l2Token, chainId, amount)
+                self.cache.set(cache_key, fees)
+                return fees
+
+            fees = await _single_flight(self._pending, key, request)
+        return dict(fees)
+
+    async def _request_suggested_fees(
+        self, l2Token: str, chainId: int, amount: int
+    ) -> Dict[str, int]:
+        url = f"{self.base_url}/suggested-fees"
+        params = {"amount": str(amount), "chainId": str(chainId), "l2Token": l2Token}
+        attempt = 0
+        while True:
+            try:
+                async with self.semaphore:
+                    async with self.session.get(url, params=params) as response:
+                        text = await response.text()
+                        status = response.status
+                error = f"Failed to get fees for {l2Token}: {text}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status, error = None, f"Failed to get fees for {l2Token}: {e!r}"
+            if status == 200:
+                try:
+                    return json.loads(text)
+                except ValueError:
+                    raise AcrossException(error)
+            if (status is not None and status not in RETRY_STATUSES) or attempt >= self.retries:
+                raise AcrossException(error)
+            attempt += 1
+            await asyncio.sleep(self.backoff_factor * 2 ** (attempt - 1))
+
+    async def _suggested_fees_or_exception(
+        self, query: SuggestedFeesRequest
+    ) -> Union[Dict[str, int], AcrossException]:
+        try:
+            return await self.suggested_fees(*query)
+        except AcrossException as e:
+            return e
+
+    async def suggested_fees_many(
+        self, queries: Sequence[SuggestedFeesRequest]
+    ) -> List[Union[Dict[str, int], AcrossException]]:
+        """get suggested fees for many queries concurrently.
+
+        Args:
+            queries (Sequence[SuggestedFeesRequest]): `(l2Token, chainId, amount)` queries.
+
+        Returns:
+            List[Union[Dict[str, int], AcrossException]]: suggested fees in the order of `queries`.
+                A query that failed has an `AcrossException` in its slot.
+        """
+        return list(
+            await asyncio.gather(*(self._suggested_fees_or_exception(query) for query in queries))
+        )
+
+    async def iter_suggested_fees(
+        self, queries: Sequence[SuggestedFeesRequest]
+    ) -> AsyncIterator[Tuple[int, Union[Dict[str, int], AcrossException]]]:
+        """Yields `(index, suggested fees)` for each query as soon as it completes.
+
+        Only a window of queries proportional to `limit_per_host` is scheduled at a time, so arbitrarily
+        large batches stream in constant memory. A query that failed yields an `AcrossException`.
+        """
+
+        async def indexed(index: int):
+            return index, await self._suggested_fees_or_exception(queries[index])
+
+        window = 4 * self.limit_per_host
+        running: Set["asyncio.Future"] = set()
+        next_index = 0
+        try:
+            while next_index < len(queries) or running:
+                while next_index < len(queries) and len(running) < window:
+                    running.add(asyncio.ensure_future(indexed(next_index)))
+                    next_index += 1
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        finally:
+            for future in running:
+                future.cancel()
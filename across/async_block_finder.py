@@ -0,0 +1,127 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional, Union
+from web3.types import BlockData
+from ._concurrency import _single_flight
+from .block_finder import (
+    Block,
+    BlockCache,
+    backward_search_distance,
+    keep_interpolating,
+    next_probe,
+)
+
+__all__ = ["AsyncBlockFinder"]
+
+
+class AsyncBlockFinder:
+    """An asyncio version of `BlockFinder`.
+
+    Any number of lookups can run concurrently on one event loop. They share the block cache, and
+    concurrent requests for the same block (or "latest") are merged into a single RPC.
+    """
+
+    def __init__(
+        self,
+        provider,
+        request_block: Callable[[Union[int, str]], Awaitable[BlockData]],
+        max_blocks: Optional[int] = 100_000,
+        network_id: Optional[int] = 1,
+    ) -> None:
+        self.provider = provider
+        self.request_block = request_block
+        self.blocks = BlockCache(max_blocks)
+        self.network_id = network_id
+        self._pending: Dict[Union[int, str], "asyncio.Future"] = {}
+
+    async def get_block_for_timestamp(self, timestamp: Union[int, str]) -> Optional[Block]:
+        """Gets the latest block whose timestamp is less than the provided timestamp.
+
+        Args:
+            timestamp (int): timestamp in seconds of latest block on L2 chain.
+
+        Returns:
+            Optional[Block]: number and timestamp of the latest block whose timestamp is less than the provided
+                timestamp.
+        """
+        timestamp = int(timestamp)
+        # If the last block we have stored is too early, grab the latest block.
+        if len(self.blocks) == 0 or self.blocks[-1].timestamp < timestamp:
+            block = await self.get_latest_block()
+            if block and timestamp >= block.timestamp:
+                return block
+        # The search bracket is kept locally, other lookups may change the cache while we await.
+        start_block, end_block = self.blocks.bracket(timestamp)
+        if end_block is None:
+            return start_block  # The last cached block has exactly this timestamp.
+        # If the first block is later than our timestamp, we need to find an earlier block.
+        if start_block is None:
+            distance = backward_search_distance(self.blocks, end_block, timestamp, self.network_id)
+            # Search backwards, doubling the step after every miss, until we find a block before the timestamp or
+            # hit block 0.
+            while True:
+                block_number = max(0, end_block.number - distance)
+                block = await self.get_block(block_number)
+                if block.timestamp <= timestamp:
+                    start_block = block
+                    break  # Found an earlier block.
+                assert block_number > 0, "timestamp is before block 0"
+                end_block = block
+                distance = max(
+                    2 * distance,
+                    backward_search_distance(self.blocks, end_block, timestamp, self.network_id),
+                )
+        if start_block.timestamp == timestamp:
+            return start_block
+        return await self.find_block(start_block, end_block, timestamp)
+
+    async def get_latest_block(self) -> Block:
+        # Grabs the most recent block and caches it.
+        block = await _single_flight(
+            self._pending, "latest", lambda: self.request_block("latest")
+        )
+        return self.blocks.add(Block(block.number, block.timestamp))
+
+    async def get_block(self, number: int) -> Block:
+        # Grabs the block for a particular number and caches it.
+        block = self.blocks.get(number)
+        if block is not None:
+            return block  # Return early if block already exists.
+        block = await _single_flight(
+            self._pending, number, lambda: self.request_block(number)
+        )
+        return self.blocks.add(Block(block.number, block.timestamp))
+
+    async def find_block(
+        self, start_block: Block, end_block: Block, timestamp: int
+    ) -> Block:
+        interpolate, slow_steps = True, 0
+        while True:
+            # In the case of equality, the end_block is expected to be passed as the one whose timestamp === the
+            # requested timestamp.
+            if end_block.timestamp == timestamp:
+                return end_block
+
+            # If there's no equality, but the blocks are adjacent, return the start_block, since we want the returned
+            # block's timestamp to be <= the requested timestamp.
+            if end_block.number == start_block.number + 1:
+                return start_block
+
+            assert (
+                end_block.number != start_block.number
+            ), "start_block cannot equal end_block"
+            assert (
+                timestamp < end_block.timestamp
+                and timestamp > start_block.timestamp
+            ), "timestamp not in between start and end blocks"
+
+            width = end_block.number - start_block.number
+            new_block = await self.get_block(next_probe(start_block, end_block, timestamp, interpolate))
+
+            # Depending on whether the new block is below or above the timestamp, narrow the search space accordingly.
+            if new_block.timestamp < timestamp:
+                start_block = new_block
+            else:
+                end_block = new_block
+            interpolate, slow_steps = keep_interpolating(
+                interpolate, width, end_block.number - start_block.number, slow_steps
+            )
@@ -0,0 +1,169 @@
+import asyncio
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Union
+from web3 import Web3
+from web3.eth import AsyncEth
+from web3.contract import Contract
+from web3.datastructures import AttributeDict
+from web3.types import BlockData
+from .utils import BigNumberish
+from .fee_calculator import calculate_realized_lp_fee_pct
+from .rate_model import RateModelHistory, parse_compiled_rate_model
+from .clients import BridgePool, RateModelStore, _decode_call_output
+from ._concurrency import _single_flight
+from .async_block_finder import AsyncBlockFinder
+from .exceptions import AcrossException
+from .lp_fee_calculator import LpFeeRequest, _as_across_exception
+
+__all__ = ["AsyncLpFeeCalculator"]
+
+
+class AsyncLpFeeCalculator:
+    """An asyncio version of `LpFeeCalculator` built on web3's async providers.
+
+    The contract reads of a quote run concurrently, identical reads that are in flight at the same
+    time are merged, and at most `max_in_flight` RPCs are outstanding at once, so thousands of quotes
+    can share one event loop.
+
+    Example:
+        >>> provider = Web3.AsyncHTTPProvider("{YOUR-PROVIDER-ADDRESS}")
+        >>> calculator = AsyncLpFeeCalculator(provider, max_in_flight=32)
+        >>> await calculator.get_lp_fee_pct(token_address, bridge_pool_address, amount, timestamp)
+    """
+
+    def __init__(
+        self,
+        provider,
+        max_in_flight: int = 16,
+        rate_model_history: Optional[RateModelHistory] = None,
+    ) -> None:
+        assert max_in_flight > 0, "max_in_flight must be greater than 0"
+        self.provider = provider
+        self.w3 = Web3(provider, modules={"eth": (AsyncEth,)}, middlewares=[])
+        self.max_in_flight = max_in_flight
+        # The network is resolved from the provider's chain id before the first lookup.
+        self.block_finder = AsyncBlockFinder(provider, self._get_block, network_id=None)
+        self.rate_model_history = rate_model_history
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending: Dict[Hashable, "asyncio.Future"] = {}
+        self._chain_id: Optional[int] = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running loop on Python < 3.10.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._semaphore
+
+    async def _get_block(self, block_identifier: Union[int, str]) -> BlockData:
+        async with self.semaphore:
+            return AttributeDict(await self.w3.eth.get_block(block_identifier))
+
+    async def _get_chain_id(self) -> int:
+        if self._chain_id is None:
+            async def request_chain_id():
+                async with self.semaphore:
+                    return await self.w3.eth.chain_id
+
+            self._chain_id = await _single_flight(self._pending, "chain_id", request_chain_id)
+        return self._chain_id
+
+    async def _call(
+        self, contract: Contract, fn_name: str, args: Sequence[Any], blockTag: int
+    ) -> Any:
+        async def request():
+            data = contract.encodeABI(fn_name=fn_name, args=list(args))
+            async with self.semaphore:
+                result = await self.w3.eth.call(
+                    {"to": contract.address, "data": data}, blockTag
+                )
+            return _decode_call_output(contract, fn_name, result)
+
+        key = (contract.address, fn_name, tuple(args), blockTag)
+        return await _single_flight(self._pending, key, request)
+
+    async def _get_rate_model(self, token_address: str, blockTag: int):
+        if self.rate_model_history is not None:
+            rateModel = self.rate_model_history.get(token_address, blockTag)
+            if rateModel is not None:
+                return rateModel
+        rate_model_store_address = RateModelStore().get_address(await self._get_chain_id())
+        rate_model_store_instance = RateModelStore.connect(
+            rate_model_store_address, self.provider
+        )
+        rate_model_for_block_height = await self._call(
+            rate_model_store_instance, "l1TokenRateModels", (token_address,), blockTag
+        )
+        # Parsing stringified rate model will error if the rate model doesn't contain exactly the expected keys or
+        # isn't a JSON object.
+        return parse_compiled_rate_model(rate_model_for_block_height)
+
+    async def get_lp_fee_pct(
+        self,
+        token_address: str,
+        bridge_pool_address: str,
+        amount: BigNumberish,
+        timestamp: Optional[int] = None,
+    ) -> int:
+        """Estimate LP Fees charged for a relay from L2 -> L1
+
+        Args:
+            token_address (str): token address on L1 to transfer from l2 to l1
+            bridge_pool_address (str): bridge pool address on L1 with the liquidity pool
+            amount (BigNumberish): amount in wei for user to send across
+            timestamp (Optional[int], optional): timestamp in seconds of latest block on L2 chain. Defaults to None.
+
+        Returns:
+            int: estimated LP Fees in wei charged for a relay from L2 -> L1
+
+        Raises:
+            AcrossException:
+                - Unable to find target block for timestamp
+                - Amount must be greater than 0
+        """
+        amount = int(amount)
+        assert amount > 0, "Amount must be greater than 0"
+
+        bridge_pool_instance = BridgePool.connect(
+            bridge_pool_address, self.provider
+        )
+
+        if self.block_finder.network_id is None:
+            self.block_finder.network_id = await self._get_chain_id()
+        if timestamp is not None:
+            targetBlock = await self.block_finder.get_block_for_timestamp(timestamp)
+        else:
+            targetBlock = await self.block_finder.get_latest_block()
+        assert targetBlock is not None, (
+            f"Unable to find target block for timestamp: {timestamp or 'latest'}"
+        )
+        blockTag = targetBlock.number
+
+        # The three reads are independent, run them concurrently.
+        currentUt, nextUt, rateModel = await asyncio.gather(
+            self._call(bridge_pool_instance, "liquidityUtilizationCurrent", (), blockTag),
+            self._call(bridge_pool_instance, "liquidityUtilizationPostRelay", (amount,), blockTag),
+            self._get_rate_model(token_address, blockTag),
+        )
+
+        return calculate_realized_lp_fee_pct(rateModel, currentUt, nextUt)
+
+    async def get_lp_fee_pcts(
+        self, requests: Sequence[LpFeeRequest]
+    ) -> List[Union[int, AcrossException]]:
+        """Estimate LP Fees for many relays concurrently.
+
+        Args:
+            requests (Sequence[LpFeeRequest]): quotes to estimate.
+
+        Returns:
+            List[Union[int, AcrossException]]: estimated LP Fees in wei, in the order of `requests`.
+                A request that could not be estimated has an `AcrossException` in its slot.
+        """
+        results = await asyncio.gather(
+            *(self.get_lp_fee_pct(*request) for request in requests),
+            return_exceptions=True,
+        )
+        return [
+            _as_across_exception(result) if isinstance(result, Exception) else result
+            for result in results
+        ]
@@ -0,0 +1,395 @@
+"""Historical LP fee time series: the realized LP fee of fixed amounts every `step` blocks.
+
+The sampled blocks are split into chunks that run in a process pool, each worker with its own provider and
+`LpFeeCalculator`. Every sampled block costs one `eth_call` (plus one `eth_getBlockByNumber` for its timestamp)
+whatever the number of pools and amounts. Rows are appended to a CSV or JSON Lines file as chunks finish, in
+the order chunks finish, and a checkpoint records the finished chunks so an interrupted backfill resumes where
+it stopped.
+
+    python -m across.backfill --rpc-url https://{YOUR-PROVIDER-ADDRESS} \\
+        --pool 0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2:0x7355Efc63Ae731f584380a9838292c7046c1e433:1000000000000000000 \\
+        --start 14000000 --end 14500000 --step 100 --workers 8 --output weth.csv --checkpoint weth.checkpoint
+"""
+import argparse
+import csv
+import hashlib
+import inspect
+import io
+import json
+import os
+import pickle
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple, Union
+from .block_index import BlockTimestampIndex
+from .exceptions import AcrossException
+from .lp_fee_calculator import LpFeeCalculator, LpFeeRequest
+
+__all__ = ["BackfillPool", "BackfillRow", "BackfillSummary", "Backfill"]
+
+# An RPC URL, or a picklable function returning a provider, called once in every worker.
+ProviderFactory = Union[str, Callable[[], Any]]
+
+
+class BackfillPool(NamedTuple):
+    """A bridge pool and the relay amounts to quote at every sampled block."""
+
+    token_address: str
+    bridge_pool_address: str
+    amounts: Tuple[int, ...]
+
+
+class BackfillRow(NamedTuple):
+    block_number: int
+    timestamp: Optional[int]
+    token_address: str
+    bridge_pool_address: str
+    amount: int
+    lp_fee_pct: Optional[int]
+    # Why the quote failed, e.g. before the pool was deployed. `lp_fee_pct` is None then.
+    error: Optional[str]
+
+
+class BackfillSummary(NamedTuple):
+    chunks: int
+    # Chunks finished by this run, and by earlier runs according to the checkpoint.
+    completed: int
+    skipped: int
+    rows: int
+
+    @property
+    def remaining(self) -> int:
+        return self.chunks - self.completed - self.skipped
+
+
+def _provider(provider: ProviderFactory):
+    if isinstance(provider, str):
+        from .multi_chain import pooled_provider
+
+        return pooled_provider(provider)
+    return provider()
+
+
+# The calculator of a worker process, built once by `_init_worker`.
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(provider: ProviderFactory, with_timestamps: bool, calculator_kwargs: Dict[str, Any]) -> None:
+    _worker["calculator"] = LpFeeCalculator(_provider(provider), **calculator_kwargs)
+    _worker["with_timestamps"] = with_timestamps
+
+
+def _run_chunk(pools: Sequence[BackfillPool], blocks: range) -> List[BackfillRow]:
+    calculator: LpFeeCalculator = _worker["calculator"]
+    requests = [
+        LpFeeRequest(pool.token_address, pool.bridge_pool_address, amount)
+        for pool in pools
+        for amount in pool.amounts
+    ]
+    rows = []
+    for block_number in blocks:
+        timestamp = calculator.w3.eth.get_block(block_number).timestamp if _worker["with_timestamps"] else None
+        results = calculator.get_lp_fee_pcts_at_block(requests, block_number)
+        for request, result in zip(requests, results):
+            failed = isinstance(result, Exception)
+            rows.append(
+                BackfillRow(
+                    block_number,
+                    timestamp,
+                    request.token_address,
+                    request.bridge_pool_address,
+                    int(request.amount),
+                    None if failed else result,
+                    str(result) if failed else None,
+                )
+            )
+    return rows
+
+
+def _encode_rows(rows: Sequence[BackfillRow], output_format: str, header: bool) -> bytes:
+    if output_format == "jsonl":
+        return "".join(json.dumps(row._asdict()) + "\n" for row in rows).encode()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(BackfillRow._fields)
+    writer.writerows(rows)
+    return buffer.getvalue().encode()
+
+
+# Calculator settings that do not change the quotes, left out of checkpoint fingerprints.
+_UNQUOTED_SETTINGS = ("instrumentation", "read_cache")
+# `LpFeeCalculator` settings with a default. A setting given its default is left out of checkpoint fingerprints,
+# so a backfill passing it quotes, and resumes, like one that does not.
+_DEFAULT_SETTINGS = {
+    name: parameter.default
+    for name, parameter in inspect.signature(LpFeeCalculator).parameters.items()
+    if parameter.default is not inspect.Parameter.empty
+}
+
+
+def _setting_fingerprint(value: Any) -> Any:
+    # A JSON form of a calculator setting, equal for settings that quote the same way.
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, tuple) and hasattr(value, "_asdict"):
+        return {name: _setting_fingerprint(field) for name, field in value._asdict().items()}
+    if isinstance(value, (list, tuple)):
+        return [_setting_fingerprint(item) for item in value]
+    if isinstance(value, Mapping):
+        return {str(key): _setting_fingerprint(item) for key, item in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, BlockTimestampIndex):
+        return {"block_index": os.path.abspath(value.path)}
+    # E.g. a `RateModelHistory`: its contents, which are pickled for the workers anyway.
+    try:
+        digest = hashlib.sha256(pickle.dumps(value)).hexdigest()
+    except Exception:
+        digest = None
+    return {"type": type(value).__qualname__, "sha256": digest}
+
+
+class Backfill:
+    """Samples the LP fee of `pools` every `step` blocks from `start_block` to `end_block`, see the module docs.
+
+    Example:
+        >>> pools = [BackfillPool(token_address, bridge_pool_address, (10**18, 100 * 10**18))]
+        >>> Backfill("https://...", pools, 14_000_000, 14_500_000, step=100).run("weth.jsonl", checkpoint="weth.ckpt")
+
+    Args:
+        provider (ProviderFactory): RPC URL, or a picklable function returning a provider, e.g.
+            `functools.partial(Web3.HTTPProvider, url)`. Every worker builds its own.
+        pools (Sequence[BackfillPool]): pools and amounts to quote.
+        start_block (int): first sampled block.
+        end_block (int): last block of the range, sampled if `step` lands on it.
+        step (int, optional): blocks between samples. Defaults to 1.
+        chunk_size (int, optional): sampled blocks per chunk, the unit of work and of checkpointing. Defaults to 100.
+        workers (Optional[int], optional): worker processes, 0 to run in this process. Defaults to the CPU count.
+        with_timestamps (bool, optional): add the timestamp of each sampled block to its rows. Defaults to True.
+        **calculator_kwargs: passed to the `LpFeeCalculator` of every worker, e.g. `chain` or `local_utilization`.
+            They are pickled, so give a `rate_model_history` but not a `read_cache`.
+    """
+
+    def __init__(
+        self,
+        provider: ProviderFactory,
+        pools: Sequence[BackfillPool],
+        start_block: int,
+        end_block: int,
+        step: int = 1,
+        chunk_size: int = 100,
+        workers: Optional[int] = None,
+        with_timestamps: bool = True,
+        **calculator_kwargs,
+    ) -> None:
+        assert step > 0, "step must be greater than 0"
+        assert chunk_size > 0, "chunk_size must be greater than 0"
+        assert start_block <= end_block, "start_block must not be after end_block"
+        self.provider = provider
+        self.pools = [
+            BackfillPool(pool.token_address, pool.bridge_pool_address, tuple(int(amount) for amount in pool.amounts))
+            for pool in pools
+        ]
+        self.blocks = range(int(start_block), int(end_block) + 1, step)
+        self.chunk_size = chunk_size
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.with_timestamps = with_timestamps
+        self.calculator_kwargs = calculator_kwargs
+
+    @property
+    def chunks(self) -> int:
+        return -(-len(self.blocks) // self.chunk_size)
+
+    def chunk_blocks(self, chunk: int) -> range:
+        return self.blocks[chunk * self.chunk_size : (chunk + 1) * self.chunk_size]
+
+    def _fingerprint(self, output_format: str) -> Dict[str, Any]:
+        # What a checkpoint must match to be resumed.
+        fingerprint = {
+            "pools": [[pool.token_address, pool.bridge_pool_address, [str(a) for a in pool.amounts]] for pool in self.pools],
+            "blocks": [self.blocks.start, self.blocks.stop, self.blocks.step],
+            "chunk_size": self.chunk_size,
+            "format": output_format,
+            "with_timestamps": self.with_timestamps,
+        }
+        settings = {
+            name: _setting_fingerprint(value)
+            for name, value in sorted(self.calculator_kwargs.items())
+            if name not in _UNQUOTED_SETTINGS
+        }
+        for name, value in list(settings.items()):
+            if name in _DEFAULT_SETTINGS and value == _setting_fingerprint(_DEFAULT_SETTINGS[name]):
+                del settings[name]
+        # Left out without settings, so checkpoints of default backfills stay valid.
+        if settings:
+            fingerprint["calculator"] = settings
+        return fingerprint
+
+    def _load_checkpoint(self, checkpoint: str, fingerprint: Dict[str, Any]) -> Tuple[Set[int], Optional[int]]:
+        # Finished chunks and the output size after the last of them, or no offset for a new checkpoint.
+        if not os.path.exists(checkpoint) or os.path.getsize(checkpoint) == 0:
+            with open(checkpoint, "w") as checkpoint_file:
+                checkpoint_file.write(json.dumps({"backfill": fingerprint}) + "\n")
+            return set(), None
+        done, offset = set(), 0
+        with open(checkpoint, "r+b") as checkpoint_file:
+            header = json.loads(checkpoint_file.readline())
+            if header.get("backfill") != fingerprint:
+                raise AcrossException(f"Checkpoint {checkpoint} was written by a different backfill")
+            end = checkpoint_file.tell()
+            while True:
+                line = checkpoint_file.readline()
+                try:
+                    entry = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    entry = None
+                if entry is None:
+                    break
+                done.add(entry["chunk"])
+                offset = entry["offset"]
+                end = checkpoint_file.tell()
+            # Drop a line cut short by a crash, its chunk runs again.
+            checkpoint_file.truncate(end)
+        return done, offset
+
+    def _chunk_results(self, chunks: List[int]) -> Iterator[Tuple[int, List[BackfillRow]]]:
+        # Yields (chunk, rows) as chunks finish, with at most two chunks per worker in flight.
+        if self.workers == 0:
+            _init_worker(self.provider, self.with_timestamps, self.calculator_kwargs)
+            for chunk in chunks:
+                yield chunk, _run_chunk(self.pools, self.chunk_blocks(chunk))
+            return
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.provider, self.with_timestamps, self.calculator_kwargs),
+        ) as executor:
+            queued = iter(chunks)
+            in_flight = {}
+            while True:
+                while len(in_flight) < 2 * self.workers:
+                    chunk = next(queued, None)
+                    if chunk is None:
+                        break
+                    in_flight[executor.submit(_run_chunk, self.pools, self.chunk_blocks(chunk))] = chunk
+                if not in_flight:
+                    return
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield in_flight.pop(future), future.result()
+
+    def run(
+        self,
+        output: str,
+        output_format: Optional[str] = None,
+        checkpoint: Optional[str] = None,
+        max_chunks: Optional[int] = None,
+    ) -> BackfillSummary:
+        """Quotes the chunks not finished yet and appends their rows to `output`.
+
+        Without a checkpoint `output` is overwritten. With one, `output` is cut back to its size after the last
+        checkpointed chunk, which drops the rows of a chunk interrupted while being written, and only the other
+        chunks run. A chunk that fails (e.g. the RPC is down) stops the run, finished chunks stay checkpointed.
+
+        Args:
+            output (str): path of the CSV or JSON Lines file.
+            output_format (Optional[str], optional): "csv" or "jsonl". Defaults to "jsonl" for `.jsonl` and `.ndjson`
+                paths and "csv" otherwise.
+            checkpoint (Optional[str], optional): path of the checkpoint file, created if missing.
+            max_chunks (Optional[int], optional): stop after this many chunks, e.g. to spread a backfill over
+                several runs. Defaults to all of them.
+
+        Returns:
+            BackfillSummary: chunks finished and rows written by this run.
+
+        Raises:
+            AcrossException:
+                - The checkpoint was written by a backfill with other parameters or calculator settings.
+                - The checkpoint has finished chunks but `output` is missing.
+        """
+        if output_format is None:
+            output_format = "jsonl" if output.endswith((".jsonl", ".ndjson")) else "csv"
+        assert output_format in ("csv", "jsonl"), f"Unknown format: {output_format}"
+
+        done: Set[int] = set()
+        offset = None
+        if checkpoint is not None:
+            done, offset = self._load_checkpoint(checkpoint, self._fingerprint(output_format))
+        chunks = [chunk for chunk in range(self.chunks) if chunk not in done]
+        if max_chunks is not None:
+            chunks = chunks[:max_chunks]
+
+        if offset and not os.path.exists(output):
+            raise AcrossException(f"Output {output} of checkpoint {checkpoint} is missing")
+        completed = rows_written = 0
+        mode = "r+b" if offset is not None and os.path.exists(output) else "wb"
+        checkpoint_file = open(checkpoint, "a") if checkpoint is not None else None
+        try:
+            with open(output, mode) as output_file:
+                output_file.truncate(offset or 0)
+                output_file.seek(offset or 0)
+                for chunk, rows in self._chunk_results(chunks):
+                    output_file.write(_encode_rows(rows, output_format, header=output_file.tell() == 0))
+                    output_file.flush()
+                    if checkpoint_file is not None:
+                        # The rows are on disk before the chunk is recorded as finished.
+                        os.fsync(output_file.fileno())
+                        checkpoint_file.write(json.dumps({"chunk": chunk, "offset": output_file.tell()}) + "\n")
+                        checkpoint_file.flush()
+                    completed += 1
+                    rows_written += len(rows)
+        finally:
+            if checkpoint_file is not None:
+                checkpoint_file.close()
+        return BackfillSummary(self.chunks, completed, len(done), rows_written)
+
+
+def _parse_pool(value: str) -> BackfillPool:
+    try:
+        token_address, bridge_pool_address, amounts = value.split(":")
+        return BackfillPool(token_address, bridge_pool_address, tuple(int(a) for a in amounts.split(",")))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected TOKEN:POOL:AMOUNT[,AMOUNT...], got {value!r}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rpc-url", required=True, help="JSON-RPC endpoint of an archive node")
+    parser.add_argument(
+        "--pool", type=_parse_pool, action="append", required=True, metavar="TOKEN:POOL:AMOUNT[,AMOUNT...]",
+        help="L1 token, bridge pool and amounts in wei to quote, may be repeated",
+    )
+    parser.add_argument("--start", type=int, required=True, help="first block")
+    parser.add_argument("--end", type=int, required=True, help="last block")
+    parser.add_argument("--step", type=int, default=1, help="blocks between samples")
+    parser.add_argument("--chunk-size", type=int, default=100, help="sampled blocks per chunk")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, 0 to run in this process")
+    parser.add_argument("--output", required=True, help="CSV or JSON Lines file to write")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="defaults to the extension of --output")
+    parser.add_argument("--checkpoint", help="checkpoint file to resume from")
+    parser.add_argument("--max-chunks", type=int, help="stop after this many chunks")
+    parser.add_argument("--no-timestamps", action="store_true", help="do not fetch block timestamps")
+    parser.add_argument("--local-utilization", action="store_true", help="compute utilization from pool reserves")
+    args = parser.parse_args(argv)
+
+    backfill = Backfill(
+        args.rpc_url,
+        args.pool,
+        args.start,
+        args.end,
+        step=args.step,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        with_timestamps=not args.no_timestamps,
+        local_utilization=args.local_utilization,
+    )
+    summary = backfill.run(args.output, args.format, checkpoint=args.checkpoint, max_chunks=args.max_chunks)
+    print(
+        f"{summary.completed} chunks ({summary.rows} rows) written, {summary.skipped} already done, "
+        f"{summary.remaining} remaining",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,15 @@
-from typing import Callable, Optional, Union
-from web3.types import BlockData
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
 from web3 import Web3
-from .utils import sorted_index_by
+from .block_index import BlockTimestampIndex
+from .chains import get_chain
+from .clients import contract_registry
+from .instrumentation import Instrumentation, NULL_INSTRUMENTATION
 
 
 def average_block_time_seconds(lookbackSeconds: Optional[int]=1, networkId: Optional[int]=1) -> float:
@@ -9,134 +17,582 @@ def average_block_time_seconds(lookbackSeconds: Optional[int]=1, networkId: Opti
     # TODO: Call an external API to get this data. Currently this value is a hard-coded estimate
     # based on the data from https://etherscan.io/chart/blocktime. ~13.5 seconds has been the average
     # since April 2016, although this value seems to spike periodically for a relatively short period of time.
-    defaultBlockTimeSeconds = 13.5
-    if not defaultBlockTimeSeconds:
+    # Chains without a configured block time (see `across.chains`) use the mainnet default.
+    blockTimeSeconds = get_chain(1 if networkId is None else networkId).block_time
+    if not blockTimeSeconds:
         raise Exception("Missing default block time value")
-
-    if networkId == 137:
-        # Source: https://polygonscan.com/chart/blocktime
-        return 2.5
-    elif networkId == 1:
-        return defaultBlockTimeSeconds
-    else:
-        return defaultBlockTimeSeconds
+    return blockTimeSeconds
 
 
-def estimate_blocks_elapsed(seconds: int, cushionPercentage=0.0) -> int:
+def estimate_blocks_elapsed(seconds: int, cushionPercentage=0.0, networkId: Optional[int]=1) -> int:
     cushionMultiplier = cushionPercentage + 1.0
-    averageBlockTime = average_block_time_seconds()
+    averageBlockTime = average_block_time_seconds(networkId=networkId)
     # FIXME: if need floow
     return int((seconds * cushionMultiplier) // averageBlockTime)
 
 
+class Block(NamedTuple):
+    """The fields of a block that `BlockFinder` keeps."""
+
+    number: int
+    timestamp: int
+
+
+class BlockCache:
+    """Known blocks as parallel `array("q")` columns of numbers and timestamps, sorted by number.
+
+    Lookups are binary searches. When `max_size` is set, the blocks that were cached first are
+    evicted to make room for new ones. Methods hold a lock while they touch the columns, so threads
+    sharing a cache never see one column updated without the other.
+    """
+
+    def __init__(self, max_size: Optional[int] = None) -> None:
+        assert max_size is None or max_size > 0, "max_size must be greater than 0"
+        self.max_size = max_size
+        self.numbers = array("q")
+        self.timestamps = array("q")
+        self._insertion_order = deque()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def __getitem__(self, index: int) -> Block:
+        with self._lock:
+            return Block(self.numbers[index], self.timestamps[index])
+
+    def get(self, number: int) -> Optional[Block]:
+        with self._lock:
+            index = bisect_left(self.numbers, number)
+            if index < len(self.numbers) and self.numbers[index] == number:
+                return Block(number, self.timestamps[index])
+            return None
+
+    def add(self, block: Block) -> Block:
+        with self._lock:
+            index = bisect_left(self.numbers, block.number)
+            if index < len(self.numbers) and self.numbers[index] == block.number:
+                return Block(block.number, self.timestamps[index])
+            self.numbers.insert(index, block.number)
+            self.timestamps.insert(index, block.timestamp)
+            if self.max_size is not None:
+                self._insertion_order.append(block.number)
+                while len(self.numbers) > self.max_size:
+                    self._remove(self._insertion_order.popleft())
+            return block
+
+    def drop_from(self, number: int) -> None:
+        """Removes the blocks numbered `number` and later, after a reorg replaced them."""
+        with self._lock:
+            index = bisect_left(self.numbers, number)
+            del self.numbers[index:]
+            del self.timestamps[index:]
+            # Re-added blocks queue up again, keep no stale entries that would evict them early.
+            if self._insertion_order:
+                self._insertion_order = deque(n for n in self._insertion_order if n < number)
+
+    def _remove(self, number: int) -> None:
+        index = bisect_left(self.numbers, number)
+        if index < len(self.numbers) and self.numbers[index] == number:
+            del self.numbers[index]
+            del self.timestamps[index]
+
+    def average_block_time(self) -> Optional[float]:
+        """Seconds per block across the cached blocks, or None if they span less than two blocks."""
+        with self._lock:
+            if len(self.numbers) < 2 or self.timestamps[-1] == self.timestamps[0]:
+                return None
+            return (self.timestamps[-1] - self.timestamps[0]) / (self.numbers[-1] - self.numbers[0])
+
+    def bracket(self, timestamp: int) -> Tuple[Optional[Block], Optional[Block]]:
+        """Returns the last cached block with a timestamp <= `timestamp` and the first one after it."""
+        with self._lock:
+            # Block timestamps never decrease with the block number, so the timestamp column is sorted too.
+            index = bisect_right(self.timestamps, timestamp)
+            below = Block(self.numbers[index - 1], self.timestamps[index - 1]) if index > 0 else None
+            above = Block(self.numbers[index], self.timestamps[index]) if index < len(self.numbers) else None
+            return below, above
+
+
+def backward_search_distance(
+    blocks: BlockCache, end_block: Block, timestamp: int, networkId: Optional[int] = 1
+) -> int:
+    """Estimated blocks between `timestamp` and `end_block`.
+
+    The block time is measured from the cached blocks when they span more than one block, otherwise the
+    network's average block time is used. Aiming at the estimate rather than past it lands close to the
+    target, which leaves interpolation a short range to search.
+    """
+    blockTime = blocks.average_block_time() or average_block_time_seconds(networkId=networkId)
+    # Ensure the distance is _at least_ a single block to prevent an infinite loop.
+    return max(int((end_block.timestamp - timestamp) / blockTime), 1)
+
+
+def next_probe(start_block: Block, end_block: Block, timestamp: int, interpolate: bool) -> int:
+    """The block to fetch next when searching for `timestamp` strictly between two blocks.
+
+    Interpolates the timestamp to a block number, or bisects the range when `interpolate` is False. The
+    result is clamped to be strictly greater than the start block and strictly less than the end block.
+    """
+    if interpolate:
+        block_percentile = (timestamp - start_block.timestamp) / (
+            end_block.timestamp - start_block.timestamp
+        )
+        estimated_block = start_block.number + round(
+            block_percentile * (end_block.number - start_block.number)
+        )
+    else:
+        estimated_block = (start_block.number + end_block.number) // 2
+    return max(min(estimated_block, end_block.number - 1), start_block.number + 1)
+
+
+def keep_interpolating(
+    interpolated: bool, width_before: int, width_after: int, slow_steps: int
+) -> Tuple[bool, int]:
+    """Decides whether the next search step interpolates, returning it with the updated `slow_steps`.
+
+    Interpolation converges in very few steps when block times are even, but can crawl towards the target
+    one side at a time when they are not. After three interpolation steps in a row that fail to halve the
+    range, one bisection step is made, so the range at least halves every four steps and the worst case
+    stays logarithmic.
+    """
+    if not interpolated or width_after * 2 <= width_before:
+        return True, 0
+    return slow_steps < 2, slow_steps + 1
+
+
+class _Search:
+    """The state of one timestamp's search in `BlockFinder.get_blocks_for_timestamps`."""
+
+    __slots__ = ("start_block", "end_block", "interpolate", "slow_steps", "backward_distance")
+
+    def __init__(self) -> None:
+        self.start_block: Optional[Block] = None
+        self.end_block: Optional[Block] = None
+        self.interpolate = True
+        self.slow_steps = 0
+        self.backward_distance: Optional[int] = None
+
+
 class BlockFinder:
-    def __init__(self, provider, request_block: Callable) -> None:
+    """Finds the block at a timestamp, caching the blocks it fetches.
+
+    One finder can be shared by many threads. They share its cache, and concurrent requests for the
+    same block number (or "latest") are collapsed into one RPC whose result every caller receives.
+    """
+
+    def __init__(
+        self,
+        provider,
+        request_block: Callable,
+        block_index: Optional[BlockTimestampIndex] = None,
+        max_blocks: Optional[int] = 100_000,
+        instrumentation: Instrumentation = NULL_INSTRUMENTATION,
+        network_id: Optional[int] = 1,
+        max_workers: int = 8,
+        max_head_age: Optional[float] = 60.0,
+    ) -> None:
+        assert max_workers > 0, "max_workers must be greater than 0"
         self.provider = provider
         self.w3 = Web3(provider=provider)
         self.request_block = request_block
-        self.blocks = []
+        self.blocks = BlockCache(max_blocks)
+        # Optional on-disk index consulted before the network and filled with settled blocks as they are fetched.
+        self.block_index = block_index
+        self.latest_block_number: Optional[int] = None
+        # Picks the default block time used until the cache spans enough blocks to measure it. None reads the
+        # provider's chain id when it is first needed.
+        self._network_id = network_id
+        self.instrumentation = instrumentation
+        # Block requests of a `get_blocks_for_timestamps` round sent concurrently.
+        self.max_workers = max_workers
+        # Blocks visited by searches so far, see the `block_finder.search_iterations` metric. Each thread also
+        # counts its own, so the metric of a lookup is not inflated by lookups running at the same time.
+        self.search_iterations = 0
+        self._thread = threading.local()
+        self._stats_lock = threading.Lock()
+        # Chain head pushed by a follower, see `push_head`. Updates are queued by the follower's thread and
+        # applied by the first thread doing a lookup.
+        self.head: Optional[Block] = None
+        self._pending_heads: deque = deque()
+        self._head_lock = threading.Lock()
+        # Seconds a pushed head is used for, so a stalled follower does not serve a stale head. None to use it
+        # until the next push.
+        self.max_head_age = max_head_age
+        self._head_pushed_at = 0.0
+        # Block requests in flight by block number or "latest", shared by the threads asking for the same one.
+        self._in_flight: Dict[Union[int, str], Future] = {}
+        self._in_flight_lock = threading.Lock()
+        # The block index keeps unsorted tail columns in memory, which are not safe to update concurrently.
+        self._index_lock = threading.Lock()
 
-    def get_block_for_timestamp(
-        self, timestamp: Union[int, str]
-    ) -> Optional[BlockData]:
+    @property
+    def network_id(self) -> int:
+        if self._network_id is None:
+            self._network_id = contract_registry.chain_id(self.provider)
+        return self._network_id
+
+    @network_id.setter
+    def network_id(self, value: Optional[int]) -> None:
+        self._network_id = value
+
+    def _searched(self, count: int = 1) -> None:
+        self._thread.search_iterations = getattr(self._thread, "search_iterations", 0) + count
+        with self._stats_lock:
+            self.search_iterations += count
+
+    def _request(self, number: Union[int, str]):
+        # Requests a block, or waits for the same request sent by another thread.
+        with self._in_flight_lock:
+            future = self._in_flight.get(number)
+            sending = future is None
+            if sending:
+                future = self._in_flight[number] = Future()
+        if not sending:
+            self.instrumentation.increment("block_finder.request.shared")
+            return future.result()
+        try:
+            block = self.request_block(number)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(block)
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[number]
+        return block
+
+    def push_head(self, block: Block, replaced_from: Optional[int] = None) -> None:
+        """Hands a new chain head to the finder, from any thread.
+
+        Until `clear_head`, the newest pushed head is used as the latest block instead of requesting it, as long
+        as it was pushed less than `max_head_age` seconds ago. Pushing the same head again keeps it in use.
+
+        Args:
+            block (Block): the new head.
+            replaced_from (Optional[int], optional): first block number replaced by a reorg, cached blocks from
+                there on are dropped. Defaults to None.
+        """
+        self._pending_heads.append((block, replaced_from, time.monotonic()))
+
+    def clear_head(self) -> None:
+        """Goes back to requesting the latest block, e.g. when the follower lost its connection."""
+        self._pending_heads.append(None)
+
+    def current_head(self) -> Optional[Block]:
+        """The newest head pushed by a follower, or None when not following the chain or the head is too old."""
+        if self._pending_heads:
+            # Updates are applied by one thread at a time, in the order they were pushed.
+            with self._head_lock:
+                while self._pending_heads:
+                    update = self._pending_heads.popleft()
+                    if update is None:
+                        self.head = None
+                        continue
+                    block, replaced_from, pushed_at = update
+                    if replaced_from is not None:
+                        self.blocks.drop_from(replaced_from)
+                    self._head_pushed_at = pushed_at
+                    self.head = self.blocks.add(block)
+                    self.latest_block_number = block.number
+        head = self.head
+        if (
+            head is not None
+            and self.max_head_age is not None
+            and time.monotonic() - self._head_pushed_at > self.max_head_age
+        ):
+            return None
+        return head
+
+    def get_block_for_timestamp(self, timestamp: Union[int, str]) -> Optional[Block]:
         """Gets the latest block whose timestamp is less than the provided timestamp.
 
         Args:
             timestamp (int): timestamp in seconds of latest block on L2 chain.
 
         Returns:
-            Optional[BlockData]: latest block whose timestamp is less than the provided timestamp.
+            Optional[Block]: number and timestamp of the latest block whose timestamp is less than the provided
+                timestamp.
         """
+        if not self.instrumentation.enabled:
+            return self._get_block_for_timestamp(timestamp)
+        search_iterations = getattr(self._thread, "search_iterations", 0)
+        with self.instrumentation.timer("block_finder.lookup_seconds"):
+            block = self._get_block_for_timestamp(timestamp)
+        self.instrumentation.observe(
+            "block_finder.search_iterations", self._thread.search_iterations - search_iterations
+        )
+        return block
+
+    def _indexed_block_for_timestamp(self, timestamp: int) -> Optional[Block]:
+        # Answers from the block index if it holds the block, otherwise caches the closest indexed blocks so the
+        # search starts from them.
+        with self._index_lock:
+            below, above = self.block_index.bracket(timestamp)
+        if below is not None and (
+            below[1] == timestamp or (above is not None and above[0] == below[0] + 1)
+        ):
+            self.instrumentation.increment("block_finder.index.hit")
+            return Block(*below)
+        for indexed in (below, above):
+            if indexed is not None:
+                self.blocks.add(Block(*indexed))
+        return None
+
+    def _get_block_for_timestamp(self, timestamp: Union[int, str]) -> Optional[Block]:
         timestamp = int(timestamp)
         assert timestamp is not None, "timestamp must be provided"
+        self.current_head()  # Applies heads and reorgs pushed by a follower.
+        if self.block_index is not None:
+            block = self._indexed_block_for_timestamp(timestamp)
+            if block is not None:
+                return block
         # If the last block we have stored is too early, grab the latest block.
         if len(self.blocks) == 0 or self.blocks[-1].timestamp < timestamp:
             block = self.get_latest_block()
             if block and timestamp >= block.timestamp:
                 return block
-        # Check the first block. If it's grater than our timestamp, we need to find an earlier block.
-        if len(self.blocks) > 0 and self.blocks[0].timestamp > timestamp:
-            initial_block = self.blocks[0]
-            cushion = 1.1
-            # Ensure the increment block distance is _at least_ a single block to prevent an infinite loop.
-            increment_distance = max(
-                estimate_blocks_elapsed(
-                    initial_block.timestamp - timestamp, cushion
-                ),
-                1,
-            )
-
-            # Search backwards by a constant increment until we find a block before the timestamp or hit block 0.
-            multiplier = 1
+        # The search bracket is kept locally, so evictions from the cache cannot invalidate it.
+        start_block, end_block = self.blocks.bracket(timestamp)
+        if end_block is None:
+            return start_block  # The last cached block has exactly this timestamp.
+        # If the first block is later than our timestamp, we need to find an earlier block.
+        if start_block is None:
+            distance = backward_search_distance(self.blocks, end_block, timestamp, self.network_id)
+            # Search backwards, doubling the step after every miss, until we find a block before the timestamp or
+            # hit block 0.
             while True:
-                distance = multiplier * increment_distance
-                block_bumber = max(0, initial_block.number - distance)
-                block = self.get_block(block_bumber)
+                block_number = max(0, end_block.number - distance)
+                self._searched()
+                block = self.get_block(block_number)
                 if block.timestamp <= timestamp:
+                    start_block = block
                     break  # Found an earlier block.
-                assert block_bumber > 0, "timestamp is before block 0"
-                multiplier += 1
-        index = sorted_index_by(self.blocks, timestamp, "timestamp")
-        return self.find_block(
-            self.blocks[index - 1], self.blocks[index], timestamp
-        )
+                assert block_number > 0, "timestamp is before block 0"
+                end_block = block
+                distance = max(
+                    2 * distance,
+                    backward_search_distance(self.blocks, end_block, timestamp, self.network_id),
+                )
+        if start_block.timestamp == timestamp:
+            return start_block
+        return self.find_block(start_block, end_block, timestamp)
 
-    def get_latest_block(self) -> BlockData:
+    def get_latest_block(self) -> Block:
         # Grabs the most recent block and caches it.
-        block = self.request_block("latest")
-        index = sorted_index_by(self.blocks, block, "number")
-        if index > len(self.blocks) - 1 or self.blocks[index].number != block.number:
-            self.blocks.insert(index, block)
-        return self.blocks[index]
+        head = self.current_head()
+        if head is not None:
+            return head
+        block = self._request("latest")
+        self.latest_block_number = block.number
+        return self.blocks.add(Block(block.number, block.timestamp))
 
-    def get_block(self, number: int) -> BlockData:
+    def get_block(self, number: int) -> Block:
         # Grabs the block for a particular number and caches it.
-        index = sorted_index_by(self.blocks, number, "number")
-        if index > len(self.blocks) - 1 and self.blocks[index].number == number:
-            return self.blocks[index]  # Return early if block already exists.
-        block = self.request_block(number)
-        self.blocks.insert(index, block) # A simple insert at index.
-        return block
+        block = self._known_block(number)
+        if block is not None:
+            return block  # Return early if block already exists.
+        return self._store_block(self._request(number))
+
+    def get_blocks(
+        self, numbers: Iterable[int], executor: Optional[Executor] = None
+    ) -> Dict[int, Block]:
+        """Grabs several blocks, requesting the ones that are not cached or indexed through `executor` if given."""
+        blocks, missing = {}, []
+        for number in numbers:
+            block = self._known_block(number)
+            if block is not None:
+                blocks[number] = block
+            else:
+                missing.append(number)
+        if executor is not None and len(missing) > 1:
+            fetched = list(executor.map(self._request, missing))
+        else:
+            fetched = [self._request(number) for number in missing]
+        for block in fetched:
+            blocks[block.number] = self._store_block(block)
+        return blocks
+
+    def _known_block(self, number: int) -> Optional[Block]:
+        block = self.blocks.get(number)
+        if block is not None:
+            self.instrumentation.increment("block_finder.cache.hit")
+            return block
+        self.instrumentation.increment("block_finder.cache.miss")
+        if self.block_index is not None:
+            with self._index_lock:
+                timestamp = self.block_index.get_timestamp(number)
+            if timestamp is not None:
+                self.instrumentation.increment("block_finder.index.hit")
+                return self.blocks.add(Block(number, timestamp))
+            self.instrumentation.increment("block_finder.index.miss")
+        return None
+
+    def _store_block(self, block) -> Block:
+        # Caches a block fetched over RPC, and indexes it once it is settled.
+        if (
+            self.block_index is not None
+            and self.latest_block_number is not None
+            and block.number <= self.latest_block_number - self.block_index.confirmations
+        ):
+            with self._index_lock:
+                self.block_index.add(block.number, block.timestamp)
+        return self.blocks.add(Block(block.number, block.timestamp))
+
+    def get_blocks_for_timestamps(
+        self, timestamps: Sequence[Union[int, str]], max_workers: Optional[int] = None
+    ) -> List[Optional[Block]]:
+        """Gets the latest block at or before each of many timestamps, sharing fetched blocks between the searches.
+
+        The distinct timestamps are searched together in rounds. Each round collects the next block every
+        unfinished search needs, fetches the distinct ones in one batch and narrows every search to the closest
+        blocks now known on both sides, so neighbouring timestamps reuse each other's probes and the cost grows
+        with the number of distinct blocks fetched rather than the number of timestamps. A round's requests are
+        sent concurrently, so the time spent waiting on the node grows with the number of rounds.
+
+        Args:
+            timestamps (Sequence[Union[int, str]]): timestamps in seconds.
+            max_workers (Optional[int], optional): block requests of a round sent concurrently, 1 to send them
+                one after another. Defaults to the finder's `max_workers`.
+
+        Returns:
+            List[Optional[Block]]: for each timestamp, in order, the latest block whose timestamp is less than or
+                equal to it, or None if it is before block 0.
+        """
+        if max_workers is None:
+            max_workers = self.max_workers
+        assert max_workers > 0, "max_workers must be greater than 0"
+        wanted = sorted({int(timestamp) for timestamp in timestamps})
+        found: Dict[int, Optional[Block]] = {}
+        self.current_head()
+        if self.block_index is not None:
+            for timestamp in wanted:
+                block = self._indexed_block_for_timestamp(timestamp)
+                if block is not None:
+                    found[timestamp] = block
+        # One "latest" request serves every timestamp after the last cached block.
+        if wanted and (len(self.blocks) == 0 or self.blocks[-1].timestamp < wanted[-1]):
+            self.get_latest_block()
+
+        searches = {timestamp: _Search() for timestamp in wanted if timestamp not in found}
+        executor = ThreadPoolExecutor(max_workers) if max_workers > 1 else None
+        try:
+            while searches:
+                # Searches whose closest known blocks are the same share a gap, only one of them probes it.
+                gaps: Dict[Tuple[Optional[int], int], List[int]] = {}
+                for timestamp, search in list(searches.items()):
+                    start_block, end_block = self._narrow(search, timestamp)
+                    if start_block is not None and start_block.timestamp == timestamp:
+                        found[timestamp] = start_block
+                    elif end_block is None:
+                        found[timestamp] = start_block
+                    elif end_block.timestamp == timestamp:
+                        found[timestamp] = end_block
+                    elif start_block is not None and end_block.number == start_block.number + 1:
+                        found[timestamp] = start_block
+                    elif start_block is None and end_block.number == 0:
+                        found[timestamp] = None  # The timestamp is before block 0.
+                    else:
+                        start_number = None if start_block is None else start_block.number
+                        gaps.setdefault((start_number, end_block.number), []).append(timestamp)
+                        continue
+                    del searches[timestamp]
+
+                probes: Dict[int, Tuple[int, int]] = {}
+                for (start_number, end_number), gap in gaps.items():
+                    if start_number is None:
+                        # The earliest timestamp searches backwards, the later ones then start from its blocks.
+                        timestamp = gap[0]
+                        search = searches[timestamp]
+                        if search.backward_distance is None:
+                            search.backward_distance = backward_search_distance(
+                                self.blocks, search.end_block, timestamp, self.network_id
+                            )
+                        probes[timestamp] = (max(0, end_number - search.backward_distance), 0)
+                    else:
+                        # Probing for the median timestamp splits the gap's searches in half.
+                        timestamp = gap[len(gap) // 2]
+                        search = searches[timestamp]
+                        probes[timestamp] = (
+                            next_probe(search.start_block, search.end_block, timestamp, search.interpolate),
+                            end_number - start_number,
+                        )
+                if not probes:
+                    continue
+
+                numbers = {number for number, _ in probes.values()}
+                self._searched(len(numbers))
+                blocks = self.get_blocks(sorted(numbers), executor)
+                for timestamp, (number, width) in probes.items():
+                    search, new_block = searches[timestamp], blocks[number]
+                    if search.start_block is None:
+                        # A backward step, doubled after every miss.
+                        if new_block.timestamp <= timestamp:
+                            search.start_block = new_block
+                        else:
+                            search.end_block = new_block
+                            search.backward_distance = max(
+                                2 * search.backward_distance,
+                                backward_search_distance(self.blocks, new_block, timestamp, self.network_id),
+                            )
+                        continue
+                    if new_block.timestamp < timestamp:
+                        search.start_block = new_block
+                    else:
+                        search.end_block = new_block
+                    search.interpolate, search.slow_steps = keep_interpolating(
+                        search.interpolate,
+                        width,
+                        search.end_block.number - search.start_block.number,
+                        search.slow_steps,
+                    )
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return [found[int(timestamp)] for timestamp in timestamps]
+
+    def _narrow(self, search: _Search, timestamp: int) -> Tuple[Optional[Block], Optional[Block]]:
+        # Tightens a search to the closest cached blocks, which may have been fetched by other searches.
+        below, above = self.blocks.bracket(timestamp)
+        if below is not None and (search.start_block is None or below.number > search.start_block.number):
+            search.start_block = below
+        if above is not None and (search.end_block is None or above.number < search.end_block.number):
+            search.end_block = above
+        return search.start_block, search.end_block
 
     def find_block(
-        self, start_block: BlockData, end_block: BlockData, timestamp: int
-    ) -> BlockData:
-        # In the case of equality, the end_block is expected to be passed as the one whose timestamp === the requested
-        # timestamp.
-        if end_block.timestamp == timestamp:
-            return end_block
-
-        # If there's no equality, but the blocks are adjacent, return the start_block, since we want the returned block's
-        # timestamp to be <= the requested timestamp.
-        if end_block.number == start_block.number + 1:
-            return start_block
+        self, start_block: Block, end_block: Block, timestamp: int
+    ) -> Block:
+        interpolate, slow_steps = True, 0
+        while True:
+            # In the case of equality, the end_block is expected to be passed as the one whose timestamp === the
+            # requested timestamp.
+            if end_block.timestamp == timestamp:
+                return end_block
 
-        assert (
-            end_block.number != start_block.number
-        ), "start_block cannot equal end_block"
-        assert (
-            timestamp < end_block.timestamp
-            and timestamp > start_block.timestamp
-        ), "timestamp not in between start and end blocks"
-
-        # Interpolating the timestamp we're searching for to block numbers.
-        total_time_difference = end_block.timestamp - start_block.timestamp
-        total_block_distance = end_block.number - start_block.number
-        block_percentile = (
-            timestamp - start_block.timestamp
-        ) / total_time_difference
-        estimated_block = start_block.number + round(
-            block_percentile * total_block_distance
-        )
+            # If there's no equality, but the blocks are adjacent, return the start_block, since we want the returned
+            # block's timestamp to be <= the requested timestamp.
+            if end_block.number == start_block.number + 1:
+                return start_block
 
-        # Clamp ensures the estimated block is strictly greater than the start block and strictly less than the end block.
-        clamp = lambda v, minv, maxv: max(min(v, maxv), minv)
-        new_block = self.get_block(
-            clamp(estimated_block, start_block.number + 1, end_block.number - 1)
-        )
+            assert (
+                end_block.number != start_block.number
+            ), "start_block cannot equal end_block"
+            assert (
+                timestamp < end_block.timestamp
+                and timestamp > start_block.timestamp
+            ), "timestamp not in between start and end blocks"
 
-        # Depending on whether the new block is below or above the timestamp, narrow the search space accordingly.
-        if new_block.timestamp < timestamp:
-            return self.find_block(new_block, end_block, timestamp)
-        else:
-            return self.find_block(start_block, new_block, timestamp)
+            width = end_block.number - start_block.number
+            self._searched()
+            new_block = self.get_block(next_probe(start_block, end_block, timestamp, interpolate))
+
+            # Depending on whether the new block is below or above the timestamp, narrow the search space accordingly.
+            if new_block.timestamp < timestamp:
+                start_block = new_block
+            else:
+                end_block = new_block
+            interpolate, slow_steps = keep_interpolating(
+                interpolate, width, end_block.number - start_block.number, slow_steps
+            )
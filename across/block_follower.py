@@ -0,0 +1,172 @@
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from .block_finder import Block
+
+__all__ = ["BlockFollower"]
+
+
+def _head_fields(block: Any) -> Tuple[int, int, str, str]:
+    # (number, timestamp, hash, parentHash) of a block from web3 or of a raw `newHeads` notification.
+    values = []
+    for field in ("number", "timestamp"):
+        value = block[field]
+        values.append(int(value, 16) if isinstance(value, str) else int(value))
+    for field in ("hash", "parentHash"):
+        value = block[field]
+        values.append((value if isinstance(value, str) else value.hex()).lower())
+    return tuple(values)
+
+
+class BlockFollower:
+    """Follows the chain head in a background thread and keeps an `LpFeeCalculator`'s caches warm.
+
+    New heads come from a websocket `newHeads` subscription when `websocket_url` is given, otherwise from
+    polling the latest block every `poll_interval` seconds. Each head is handed to the calculator's
+    `BlockFinder`, so latest quotes and lookups of recent timestamps need no "latest" RPC, and the fee curves
+    of the `warm` (token, pool) pairs are built at every head ahead of the quotes that use them.
+
+    A head that does not extend the known chain is a reorg: the replaced blocks, reads and fee curves are
+    dropped. While the subscription or polling fails, or no head arrives for the finder's `max_head_age`
+    seconds, the calculator requests the latest block itself.
+
+    Example:
+        >>> with BlockFollower(calculator, warm=[(token_address, bridge_pool_address)]):
+        ...     calculator.get_lp_fee_pct(token_address, bridge_pool_address, amount)
+
+    Args:
+        calculator (LpFeeCalculator): calculator whose caches are kept warm.
+        warm (Sequence[Tuple[str, str]], optional): (token address, bridge pool address) pairs whose fee curve is
+            built at every head. Defaults to none.
+        websocket_url (Optional[str], optional): websocket endpoint to subscribe to `newHeads` on. Defaults to
+            polling through the calculator's provider.
+        poll_interval (float, optional): seconds between polls, and between reconnection attempts. Defaults to 2.
+        depth (int, optional): recent blocks whose hashes are kept to detect reorgs. Defaults to 64.
+    """
+
+    def __init__(
+        self,
+        calculator,
+        warm: Sequence[Tuple[str, str]] = (),
+        websocket_url: Optional[str] = None,
+        poll_interval: float = 2.0,
+        depth: int = 64,
+    ) -> None:
+        self.calculator = calculator
+        self.block_finder = calculator.block_finder
+        self.instrumentation = calculator.instrumentation
+        self.warm = list(warm)
+        self.websocket_url = websocket_url
+        self.poll_interval = poll_interval
+        self.depth = depth
+        # number -> hash of the recent canonical blocks.
+        self._hashes: "OrderedDict[int, str]" = OrderedDict()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "BlockFollower":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def start(self) -> "BlockFollower":
+        assert self._thread is None, "already started"
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="across-block-follower", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.block_finder.clear_head()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                if self.websocket_url is not None:
+                    asyncio.run(self._subscribe())
+                else:
+                    self.poll()
+            except Exception:
+                self.instrumentation.increment("block_follower.errors")
+                self.block_finder.clear_head()
+            self._stopped.wait(self.poll_interval)
+
+    def poll(self) -> None:
+        """Requests the latest block and processes it as a new head."""
+        self.on_head(self.block_finder.request_block("latest"))
+
+    async def _subscribe(self) -> None:
+        import aiohttp
+
+        async with aiohttp.ClientSession() as session:
+            async with session.ws_connect(self.websocket_url, heartbeat=30) as connection:
+                await connection.send_json(
+                    {"jsonrpc": "2.0", "id": 1, "method": "eth_subscribe", "params": ["newHeads"]}
+                )
+                response = await connection.receive_json()
+                if "result" not in response:
+                    raise ConnectionError(f"newHeads subscription failed: {response.get('error')}")
+                while not self._stopped.is_set():
+                    try:
+                        message = await connection.receive(self.poll_interval)
+                    except asyncio.TimeoutError:
+                        continue
+                    if message.type != aiohttp.WSMsgType.TEXT:
+                        raise ConnectionError(f"newHeads subscription closed: {message.type!r}")
+                    head = json.loads(message.data).get("params", {}).get("result")
+                    if head is not None:
+                        # Runs in a worker thread, it may request blocks through the calculator's provider.
+                        await asyncio.get_running_loop().run_in_executor(None, self.on_head, head)
+
+    def on_head(self, head: Dict[str, Any]) -> None:
+        """Processes a new chain head, a block from web3 or a `newHeads` notification."""
+        number, timestamp, blockHash, parentHash = _head_fields(head)
+        if self._hashes.get(number) == blockHash:
+            # Still the head, pushed again so the finder keeps using it.
+            self.block_finder.push_head(Block(number, timestamp))
+            return
+        if self._hashes and number - self.depth > next(reversed(self._hashes)):
+            self._hashes.clear()  # Too far behind to link the new head to the known chain.
+        replaced_from = None
+        if self._hashes and number <= next(reversed(self._hashes)):
+            replaced_from = number
+        # Walk back along the new head's ancestors until they join the known chain, fetching the ones not seen
+        # yet. Known blocks that are not ancestors were replaced.
+        ancestors: List[Tuple[int, str]] = []
+        parentNumber, expectedHash = number - 1, parentHash
+        while self._hashes and parentNumber >= next(iter(self._hashes)):
+            knownHash = self._hashes.get(parentNumber)
+            if knownHash == expectedHash:
+                break
+            if knownHash is not None:
+                replaced_from = parentNumber
+            ancestor = _head_fields(self.block_finder.request_block(parentNumber))
+            ancestors.append((parentNumber, ancestor[2]))
+            parentNumber, expectedHash = parentNumber - 1, ancestor[3]
+
+        if replaced_from is not None:
+            self.instrumentation.increment("block_follower.reorgs")
+            for known in [known for known in self._hashes if known >= replaced_from]:
+                del self._hashes[known]
+            self.calculator.drop_blocks(replaced_from)
+        for ancestorNumber, ancestorHash in reversed(ancestors):
+            self._hashes[ancestorNumber] = ancestorHash
+        self._hashes[number] = blockHash
+        self._hashes = OrderedDict(sorted(self._hashes.items()))
+        while len(self._hashes) > self.depth:
+            self._hashes.popitem(last=False)
+
+        self.block_finder.push_head(Block(number, timestamp), replaced_from)
+        self.instrumentation.increment("block_follower.heads")
+        for token_address, bridge_pool_address in self.warm:
+            try:
+                self.calculator.warm_fee_curve(token_address, bridge_pool_address, number)
+            except Exception:
+                self.instrumentation.increment("block_follower.errors")
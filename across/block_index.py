@@ -0,0 +1,217 @@
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+__all__ = ["BlockTimestampIndex"]
+
+BlockNumberAndTimestamp = Tuple[int, int]
+
+_MAGIC = b"ACRBLKv1"
+# Native byte order, matching the memory-mapped `array("q")` columns.
+_HEADER = struct.Struct("=8sq")
+_RECORD = struct.Struct("=qq")
+
+
+class BlockTimestampIndex:
+    """A compact on-disk (block number, timestamp) index shared by every process that opens it.
+
+    The file holds a sorted section with a column of block numbers followed by a column of their
+    timestamps, which is memory-mapped and binary searched in place, and a tail of records appended
+    since the last compaction. Appends are single `O_APPEND` writes, so several processes can add to
+    the same file; `compact` merges the tail into the sorted section and atomically replaces the file.
+
+    Only settled blocks should be added: a block is written once and never updated, so a block that
+    is later reorged out would stay in the index. `confirmations` tells `BlockFinder` how far behind
+    the latest block a block must be before it is indexed.
+    """
+
+    def __init__(
+        self, path: str, confirmations: int = 64, compact_threshold: int = 4096
+    ) -> None:
+        self.path = os.fspath(path)
+        self.confirmations = confirmations
+        self.compact_threshold = compact_threshold
+        self._fd: Optional[int] = None
+        self._inode = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._numbers: memoryview = memoryview(array("q"))
+        self._timestamps: memoryview = memoryview(array("q"))
+        self._tail_numbers = array("q")
+        self._tail_timestamps = array("q")
+        self._read_offset = 0
+        self._open()
+
+    def __len__(self) -> int:
+        return len(self._numbers) + len(self._tail_numbers)
+
+    def __enter__(self) -> "BlockTimestampIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._unmap()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _unmap(self) -> None:
+        self._numbers.release()
+        self._timestamps.release()
+        self._numbers = memoryview(array("q"))
+        self._timestamps = memoryview(array("q"))
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _open(self, locked: bool = False) -> None:
+        # `locked` when the caller already holds the file lock, which must not be taken twice.
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            if locked:
+                self._write_file([], [])
+            else:
+                with self._locked():
+                    if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+                        self._write_file([], [])
+        self.close()
+        self._fd = os.open(self.path, os.O_RDWR | os.O_APPEND)
+        self._inode = os.fstat(self._fd).st_ino
+        size = os.fstat(self._fd).st_size
+        self._mmap = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ)
+        magic, sorted_count = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC:
+            raise ValueError(f"{self.path} is not a block timestamp index")
+        columns = memoryview(self._mmap)[_HEADER.size : _HEADER.size + 16 * sorted_count].cast("q")
+        self._numbers = columns[:sorted_count]
+        self._timestamps = columns[sorted_count:]
+        columns.release()
+        self._tail_numbers = array("q")
+        self._tail_timestamps = array("q")
+        self._read_offset = _HEADER.size + 16 * sorted_count
+        self._read_tail()
+
+    def _read_tail(self) -> None:
+        # Picks up records appended (by any process) since we last looked.
+        size = os.fstat(self._fd).st_size
+        if size <= self._read_offset:
+            return
+        os.lseek(self._fd, self._read_offset, os.SEEK_SET)
+        data = os.read(self._fd, size - self._read_offset)
+        data = data[: len(data) - len(data) % _RECORD.size]
+        for number, timestamp in _RECORD.iter_unpack(data):
+            self._add_to_tail(number, timestamp)
+        self._read_offset += len(data)
+
+    def _add_to_tail(self, number: int, timestamp: int) -> bool:
+        if self._find_number(number) is not None:
+            return False
+        index = bisect_left(self._tail_numbers, number)
+        self._tail_numbers.insert(index, number)
+        self._tail_timestamps.insert(index, timestamp)
+        return True
+
+    def refresh(self, locked: bool = False) -> None:
+        """Loads records other processes added, reopening the file if it was compacted."""
+        try:
+            inode = os.stat(self.path).st_ino
+        except FileNotFoundError:
+            inode = None
+        if inode != self._inode:
+            self._open(locked)
+        else:
+            self._read_tail()
+
+    def _find_number(self, number: int) -> Optional[int]:
+        index = bisect_left(self._numbers, number)
+        if index < len(self._numbers) and self._numbers[index] == number:
+            return self._timestamps[index]
+        index = bisect_left(self._tail_numbers, number)
+        if index < len(self._tail_numbers) and self._tail_numbers[index] == number:
+            return self._tail_timestamps[index]
+        return None
+
+    def get_timestamp(self, number: int) -> Optional[int]:
+        """Returns the timestamp of block `number`, or None if it is not indexed."""
+        timestamp = self._find_number(number)
+        if timestamp is None:
+            self.refresh()
+            timestamp = self._find_number(number)
+        return timestamp
+
+    def bracket(
+        self, timestamp: int
+    ) -> Tuple[Optional[BlockNumberAndTimestamp], Optional[BlockNumberAndTimestamp]]:
+        """Returns the last indexed block with a timestamp <= `timestamp` and the first one after it."""
+        self.refresh()
+        below, above = None, None
+        for numbers, timestamps in (
+            (self._numbers, self._timestamps),
+            (self._tail_numbers, self._tail_timestamps),
+        ):
+            # Block timestamps never decrease with the block number, so the timestamp column is sorted too.
+            index = bisect_right(timestamps, timestamp)
+            if index > 0 and (below is None or numbers[index - 1] > below[0]):
+                below = (numbers[index - 1], timestamps[index - 1])
+            if index < len(numbers) and (above is None or numbers[index] < above[0]):
+                above = (numbers[index], timestamps[index])
+        return below, above
+
+    def add(self, number: int, timestamp: int) -> None:
+        """Appends a block to the index. Blocks that are already indexed are ignored."""
+        if self._find_number(number) is not None:
+            return
+        with self._locked():
+            # Another process may have appended the block, or compacted the file, since we last looked.
+            self.refresh(locked=True)
+            if not self._add_to_tail(number, timestamp):
+                return
+            os.write(self._fd, _RECORD.pack(number, timestamp))
+            self._read_offset += _RECORD.size
+        if len(self._tail_numbers) >= self.compact_threshold:
+            self.compact()
+
+    def compact(self) -> None:
+        """Merges appended records into the sorted, memory-mapped section."""
+        with self._locked():
+            self.refresh(locked=True)
+            numbers = array("q", self._numbers)
+            timestamps = array("q", self._timestamps)
+            for number, timestamp in zip(self._tail_numbers, self._tail_timestamps):
+                index = bisect_left(numbers, number)
+                numbers.insert(index, number)
+                timestamps.insert(index, timestamp)
+            self._unmap()
+            self._write_file(numbers, timestamps)
+            self._open(locked=True)
+
+    def _write_file(self, numbers, timestamps) -> None:
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, len(numbers)))
+            array("q", numbers).tofile(f)
+            array("q", timestamps).tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
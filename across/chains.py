@@ -0,0 +1,72 @@
+import json
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Union
+
+__all__ = ["ChainConfig", "CHAINS", "register_chain", "get_chain", "load_chains"]
+
+
+class ChainConfig(NamedTuple):
+    """Addresses and parameters of a chain that quotes need.
+
+    Args:
+        chain_id (int): EIP-155 chain id.
+        rate_model_store (str, optional): address of the RateModelStore, "" where there is none.
+        block_time (float, optional): average seconds per block, used until enough blocks are cached to measure it.
+        rpc_url (Optional[str], optional): JSON-RPC endpoint used when no provider is given for the chain.
+    """
+
+    chain_id: int
+    rate_model_store: str = ""
+    block_time: float = 13.5
+    rpc_url: Optional[str] = None
+
+
+# Chains known out of the box. Sources: https://etherscan.io/chart/blocktime, https://polygonscan.com/chart/blocktime
+CHAINS: Dict[int, ChainConfig] = {
+    1: ChainConfig(1, rate_model_store="0xd18fFeb5fdd1F2e122251eA7Bf357D8Af0B60B50", block_time=13.5),
+    137: ChainConfig(137, block_time=2.5),
+}
+
+
+def register_chain(config: ChainConfig) -> ChainConfig:
+    """Adds or replaces the configuration of a chain in `CHAINS`."""
+    CHAINS[config.chain_id] = config
+    return config
+
+
+def get_chain(chain_id: int) -> ChainConfig:
+    """The registered configuration of a chain, or the defaults for one that is not registered."""
+    config = CHAINS.get(int(chain_id))
+    return config if config is not None else ChainConfig(int(chain_id))
+
+
+def _chain_config(chain_id: int, values: Mapping[str, Any]) -> ChainConfig:
+    defaults = get_chain(chain_id)
+    unknown = set(values) - set(ChainConfig._fields)
+    if unknown:
+        raise ValueError(f"Unknown chain {chain_id} settings: {', '.join(sorted(unknown))}")
+    return defaults._replace(**{k: v for k, v in values.items() if k != "chain_id"})
+
+
+def load_chains(
+    source: Union[str, Mapping[Any, Mapping[str, Any]]], register: bool = True
+) -> Dict[int, ChainConfig]:
+    """Reads chain configurations from a JSON file or a mapping of chain id to settings.
+
+    Settings not given keep their registered (or default) values, e.g.
+    `{"10": {"rate_model_store": "0x...", "block_time": 2, "rpc_url": "https://..."}}`.
+
+    Args:
+        source (Union[str, Mapping]): path of a JSON file, or the mapping itself.
+        register (bool, optional): also add them to `CHAINS`. Defaults to True.
+
+    Returns:
+        Dict[int, ChainConfig]: the loaded configurations by chain id.
+    """
+    if isinstance(source, str):
+        with open(source) as config_file:
+            source = json.load(config_file)
+    chains = {int(chain_id): _chain_config(int(chain_id), values) for chain_id, values in source.items()}
+    if register:
+        for config in chains.values():
+            register_chain(config)
+    return chains
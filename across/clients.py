@@ -1,10 +1,130 @@
 import typing
 
 import json
+import threading
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
 from web3 import Web3
 from web3.providers import BaseProvider
 from web3.contract import Contract
+from web3.exceptions import BadFunctionCallOutput
+from web3._utils.abi import get_abi_output_types
+from .chains import get_chain
+from .exceptions import AcrossException
+
+
+@lru_cache(maxsize=None)
+def load_abi(name: str) -> typing.Tuple[dict, ...]:
+    """Reads and parses an ABI file from `abis/` once per process."""
+    with open(Path(__file__).parent / "abis" / name, "r") as abi_file:
+        return tuple(json.load(abi_file))
+
+
+class ContractRegistry:
+    """
+    A process-wide LRU cache of contract instances keyed by (provider, address, abi).
+
+    Building a `Contract` parses its ABI and wraps a `Web3` instance, so the hot path reuses them
+    instead of rebuilding them for every call. Call `invalidate` after redeploying a contract or
+    replacing a provider.
+
+    web3 validates every `eth_call` against the provider's chain id, so the chain id of each provider
+    is requested once and then answered from the registry, or never if it was given with `set_chain_id`.
+    """
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self._contracts: "OrderedDict[tuple, Contract]" = OrderedDict()
+        self._web3s: "OrderedDict[BaseProvider, Web3]" = OrderedDict()
+        # Weak, so a provider evicted from `_web3s` and dropped by its owner does not stay alive here.
+        self._chain_ids: "weakref.WeakKeyDictionary[BaseProvider, int]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def set_chain_id(self, provider: BaseProvider, chain_id: int) -> None:
+        """Records the chain id of `provider`, so contract calls over it never request `eth_chainId`."""
+        self._chain_ids[provider] = int(chain_id)
+
+    def chain_id(self, provider: BaseProvider) -> int:
+        """The chain id of `provider`, requested once and then shared by everything using the provider."""
+        chain_id = self._chain_ids.get(provider)
+        if chain_id is not None:
+            return chain_id
+        with self._lock:
+            w3 = self._web3(provider)
+        # Recorded by the chain id middleware, a provider does not change chains.
+        return int(w3.eth.chain_id)
+
+    def __len__(self) -> int:
+        return len(self._contracts)
+
+    def get(self, provider: BaseProvider, address: str, abi_name: str) -> Contract:
+        key = (provider, address, abi_name)
+        with self._lock:
+            contract_instance = self._contracts.get(key)
+            if contract_instance is not None:
+                self._contracts.move_to_end(key)
+                return contract_instance
+            w3 = self._web3(provider)
+            contract_instance = w3.eth.contract(address=address, abi=load_abi(abi_name))
+            self._contracts[key] = contract_instance
+            while len(self._contracts) > self.maxsize:
+                self._contracts.popitem(last=False)
+            return contract_instance
+
+    def _web3(self, provider: BaseProvider) -> Web3:
+        w3 = self._web3s.get(provider)
+        if w3 is None:
+            w3 = self._web3s[provider] = Web3(provider)
+            w3.middleware_onion.add(self._chain_id_middleware(provider), "chain_id_cache")
+            while len(self._web3s) > self.maxsize:
+                self._web3s.popitem(last=False)
+        else:
+            self._web3s.move_to_end(provider)
+        return w3
+
+    def _chain_id_middleware(self, provider: BaseProvider):
+        def middleware(make_request, w3):
+            def cached_chain_id(method, params):
+                if method != "eth_chainId":
+                    return make_request(method, params)
+                chain_id = self._chain_ids.get(provider)
+                if chain_id is not None:
+                    return {"jsonrpc": "2.0", "id": 0, "result": hex(chain_id)}
+                response = make_request(method, params)
+                if "result" in response:
+                    self._chain_ids[provider] = int(response["result"], 16) if isinstance(
+                        response["result"], str
+                    ) else int(response["result"])
+                return response
+
+            return cached_chain_id
+
+        return middleware
+
+    def invalidate(
+        self,
+        provider: typing.Optional[BaseProvider] = None,
+        address: typing.Optional[str] = None,
+    ) -> None:
+        """Drops cached contracts matching `provider` and/or `address`, or everything if neither is given."""
+        with self._lock:
+            for key in list(self._contracts):
+                if (provider is None or key[0] is provider) and (
+                    address is None or key[1].lower() == address.lower()
+                ):
+                    del self._contracts[key]
+            if address is None:
+                if provider is None:
+                    self._web3s.clear()
+                    self._chain_ids.clear()
+                else:
+                    self._web3s.pop(provider, None)
+                    self._chain_ids.pop(provider, None)
+
+
+contract_registry = ContractRegistry()
 
 
 class BridgePool:
@@ -14,13 +134,7 @@ class BridgePool:
 
     @staticmethod
     def connect(address: str, provider: BaseProvider) -> Contract:
-        w3 = Web3(provider)
-        with open(
-            Path(__file__).parent / "abis/bridge_pool_abi.json", "r"
-        ) as abi_file:
-            abi = json.load(abi_file)
-        contract_instance = w3.eth.contract(address=address, abi=abi)
-        return contract_instance
+        return contract_registry.get(provider, address, "bridge_pool_abi.json")
 
 
 class RateModelStore:
@@ -30,17 +144,105 @@ class RateModelStore:
 
     @staticmethod
     def connect(address: str, provider: BaseProvider) -> Contract:
-        w3 = Web3(provider)
-        with open(
-            Path(__file__).parent / "abis/rate_model_store_abi.json", "r"
-        ) as abi_file:
-            abi = json.load(abi_file)
-        contract_instance = w3.eth.contract(address=address, abi=abi)
-        return contract_instance
+        return contract_registry.get(provider, address, "rate_model_store_abi.json")
 
     def get_address(self, network_id: int) -> str:
-        # FIXME: hardcoded
-        if network_id == 1:
-            return "0xd18fFeb5fdd1F2e122251eA7Bf357D8Af0B60B50"
-        else:
-            return ""
+        # Configured per chain in `across.chains`, "" where there is no store.
+        return get_chain(network_id).rate_model_store
+
+
+class ERC20:
+    """
+    A class for reading ERC20 token balances.
+    """
+
+    @staticmethod
+    def connect(address: str, provider: BaseProvider) -> Contract:
+        return contract_registry.get(provider, address, "erc20_abi.json")
+
+
+ContractCall = typing.Tuple[Contract, str, typing.Sequence[typing.Any]]
+
+
+class Multicall3:
+    """
+    A class for interacting with the Multicall3 contract.
+
+    Multicall3 is deployed at the same address on mainnet and most L2s, see https://github.com/mds1/multicall.
+    """
+
+    ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+
+    @staticmethod
+    def connect(provider: BaseProvider, address: str = ADDRESS) -> Contract:
+        return contract_registry.get(provider, address, "multicall3_abi.json")
+
+
+def _decode_call_output(contract: Contract, fn_name: str, data: bytes) -> typing.Any:
+    output_types = get_abi_output_types(contract.get_function_by_name(fn_name).abi)
+    values = contract.web3.codec.decode_abi(output_types, data)
+    return values[0] if len(values) == 1 else values
+
+
+def aggregate_calls(
+    provider: BaseProvider,
+    calls: typing.Sequence[ContractCall],
+    block_identifier: typing.Union[int, str] = "latest",
+) -> typing.List[typing.Any]:
+    """Runs many read-only contract calls at one block in a single `eth_call` through Multicall3.
+
+    Args:
+        provider (BaseProvider): provider used to reach the chain.
+        calls (Sequence[ContractCall]): `(contract, function name, args)` tuples.
+        block_identifier (Union[int, str], optional): block to run the calls at. Defaults to "latest".
+
+    Returns:
+        List[Any]: decoded return values in the order of `calls`. A call that failed is
+            returned as an `AcrossException` in its slot instead of raising.
+
+    Raises:
+        ValueError: the node answered the `eth_call` with an error.
+    """
+    if not calls:
+        return []
+    multicall = Multicall3.connect(provider)
+    payload = [
+        (contract.address, True, contract.encodeABI(fn_name=fn_name, args=list(args)))
+        for contract, fn_name, args in calls
+    ]
+    try:
+        aggregated = multicall.functions.aggregate3(payload).call(
+            block_identifier=block_identifier
+        )
+    except BadFunctionCallOutput:
+        # The call returned nothing: Multicall3 has no code at this block (or on this chain), so fall back to
+        # one eth_call per call. RPC errors (rate limits, timeouts) are raised, retrying them per call would
+        # only multiply the load on a struggling node.
+        return _call_each(calls, block_identifier)
+
+    results = []
+    for (contract, fn_name, _), (success, return_data) in zip(calls, aggregated):
+        if not success:
+            results.append(AcrossException(f"Call to {fn_name} on {contract.address} failed"))
+            continue
+        try:
+            results.append(_decode_call_output(contract, fn_name, return_data))
+        except Exception as e:
+            results.append(AcrossException(f"Unable to decode {fn_name} on {contract.address}: {e}"))
+    return results
+
+
+def _call_each(
+    calls: typing.Sequence[ContractCall], block_identifier: typing.Union[int, str]
+) -> typing.List[typing.Any]:
+    results = []
+    for contract, fn_name, args in calls:
+        try:
+            results.append(
+                contract.get_function_by_name(fn_name)(*args).call(
+                    block_identifier=block_identifier
+                )
+            )
+        except Exception as e:
+            results.append(AcrossException(f"Call to {fn_name} on {contract.address} failed: {e}"))
+    return results
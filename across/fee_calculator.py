@@ -1,20 +1,31 @@
 import math
 from decimal import Decimal
-from web3 import Web3
+from typing import Callable, Iterable, List, Tuple, Union
 from .utils import BigNumberish, toBNWei, fixedPointAdjustment
 from .constants import RateModel
+from .rate_model import CompiledRateModel
 
 
 __all__ = [
     "calculate_instantaneous_rate",
     "calculate_apy_from_utilization",
     "calculate_realized_lp_fee_pct",
+    "calculate_areas_under_rate_curve",
+    "calculate_apys_from_utilizations",
+    "convert_apys_to_weekly_fees",
+    "calculate_realized_lp_fee_pcts",
 ]
 
+UtilizationPairs = Union[Iterable[Tuple[BigNumberish, BigNumberish]], "numpy.ndarray"]
+# Every function taking a rate model also takes a `CompiledRateModel`, with identical results.
+AnyRateModel = Union[RateModel, CompiledRateModel]
+
 def calculate_instantaneous_rate(
-    rate_model: RateModel, utilization: BigNumberish
+    rate_model: AnyRateModel, utilization: BigNumberish
 ):
     """Calculate the rate for a 0 sized deposit (infinitesimally small)."""
+    if isinstance(rate_model, CompiledRateModel):
+        return rate_model.instantaneous_rate(utilization)
 
     before_kink = (
         min(utilization, rate_model["UBar"])
@@ -31,11 +42,13 @@ def calculate_instantaneous_rate(
 
 
 def calculate_area_under_rate_curve(
-    rate_model: RateModel, utilization: int
+    rate_model: AnyRateModel, utilization: int
 ) -> int:
     """Compute area under curve of the piece-wise linear rate model.
     """
-    
+    if isinstance(rate_model, CompiledRateModel):
+        return rate_model.area_under_rate_curve(utilization)
+
     # Area under first piecewise component
     utilization_before_kink = min(utilization, rate_model["UBar"])
     rectangle1_area = (
@@ -72,13 +85,40 @@ def calculate_area_under_rate_curve(
     return rectangle1_area + triangle1_area + rectangle2_area + triangle2_area
 
 
-def convert_apy_to_weekly_fee(apy: int) -> str:
+WEEKS_PER_YEAR = 52
+
+
+def _integer_nth_root(value: int, n: int, estimate: float) -> int:
+    """floor(value ** (1 / n)) for a positive int, refined with Newton's method from a float estimate."""
+    # Start just above the root so the iteration decreases monotonically onto the floor.
+    root = int(estimate * (1 + 1e-9)) + 1
+    while True:
+        next_root = ((n - 1) * root + value // root ** (n - 1)) // n
+        if next_root >= root:
+            return root
+        root = next_root
+
+
+def convert_apy_to_weekly_fee(apy: int) -> int:
     """converts an APY rate to a one week rate.
-    Uses the Decimal library to take a fractional exponent
+    Takes the 52nd root of the 1e18 scaled `1 + apy` with integer math, the result is the floored rate scaled by 1e18.
     """
 
     # R_week = (1 + apy)^(1/52) - 1
-    weeklyFeePct = (Decimal("1.0") + Web3.fromWei(apy, "ether")) ** (
+    # floor(1e18 * (1 + apy / 1e18)^(1/52)) is the integer 52nd root of (1e18 + apy) * 1e18^51.
+    base = fixedPointAdjustment + int(apy)
+    if base <= 0:
+        return _convert_apy_to_weekly_fee_decimal(apy)
+    estimate = math.exp(math.log(base / fixedPointAdjustment) / WEEKS_PER_YEAR) * fixedPointAdjustment
+    root = _integer_nth_root(
+        base * fixedPointAdjustment ** (WEEKS_PER_YEAR - 1), WEEKS_PER_YEAR, estimate
+    )
+    return root - fixedPointAdjustment
+
+
+def _convert_apy_to_weekly_fee_decimal(apy: int) -> int:
+    # The original Decimal implementation, kept for rates the integer root cannot take (apy <= -100%).
+    weeklyFeePct = (Decimal("1.0") + Decimal(int(apy)) / Decimal(fixedPointAdjustment)) ** (
         Decimal("1.0") / Decimal("52.0")
     ) - Decimal(1.0)
     # Convert from decimal back to BN, scaled by 1e18.
@@ -113,3 +153,196 @@ def calculate_realized_lp_fee_pct(
         rate_model, utilization_before_deposit, utilization_after_deposit
     )
     return convert_apy_to_weekly_fee(apy)
+
+
+# Batch versions of the functions above for evaluating whole fee curves. With `exact=True` they return lists of
+# ints identical to the scalar functions. With `exact=False` they use float64 math and return a NumPy array when
+# NumPy is installed, or a list of floats otherwise; values keep the 1e18 scaling of the exact results. Approximate
+# results follow the continuous rate curve, so for deposits of a few wei they differ from the exact ones, where the
+# integer truncation is no longer negligible.
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _area_under_rate_curve_fn(rate_model: AnyRateModel) -> Callable[[int], int]:
+    # Same integer operations as `calculate_area_under_rate_curve`, with the per model constants hoisted. Below the
+    # kink, `calculate_instantaneous_rate(u) - R0` reduces to `u * R1 // UBar`, above it
+    # `calculate_instantaneous_rate(u) - (R0 + R1)` reduces to `(u - UBar) * R2 // (1e18 - UBar)`.
+    areas = {}
+    if isinstance(rate_model, CompiledRateModel):
+        compiled_area = rate_model.area_under_rate_curve
+
+        def area(utilization: int) -> int:
+            result = areas.get(utilization)
+            if result is None:
+                result = areas[utilization] = compiled_area(utilization)
+            return result
+
+        return area
+
+    UBar, R0, R1, R2 = (
+        rate_model["UBar"],
+        rate_model["R0"],
+        rate_model["R1"],
+        rate_model["R2"],
+    )
+    R0_plus_R1 = R0 + R1
+    one_minus_UBar = fixedPointAdjustment - UBar
+    half = fixedPointAdjustment // 2
+    F = fixedPointAdjustment
+
+    def area(utilization: int) -> int:
+        result = areas.get(utilization)
+        if result is None:
+            before_kink = min(utilization, UBar)
+            after_kink = max(0, utilization - UBar)
+            result = areas[utilization] = (
+                before_kink * R0 // F
+                + half * (before_kink * R1 // UBar) * before_kink // F // F
+                + after_kink * R0_plus_R1 // F
+                + half * (after_kink * R2 // one_minus_UBar) * after_kink // F // F
+            )
+        return result
+
+    return area
+
+
+def _split_pairs(utilization_pairs: UtilizationPairs):
+    np = _numpy()
+    if np is not None and isinstance(utilization_pairs, np.ndarray):
+        return utilization_pairs[:, 0], utilization_pairs[:, 1]
+    pairs = list(utilization_pairs)
+    return [int(before) for before, _ in pairs], [int(after) for _, after in pairs]
+
+
+def calculate_areas_under_rate_curve(
+    rate_model: AnyRateModel, utilizations: Iterable[BigNumberish]
+) -> List[int]:
+    """Batch version of `calculate_area_under_rate_curve`."""
+    area = _area_under_rate_curve_fn(rate_model)
+    return [area(int(utilization)) for utilization in utilizations]
+
+
+def calculate_apys_from_utilizations(
+    rate_model: AnyRateModel, utilization_pairs: UtilizationPairs, exact: bool = True
+):
+    """Batch version of `calculate_apy_from_utilization`.
+
+    Args:
+        rate_model (AnyRateModel): rate model of the pool.
+        utilization_pairs (UtilizationPairs): (utilization before deposit, utilization after deposit) pairs, either
+            as a sequence of tuples or as an (N, 2) NumPy array.
+        exact (bool, optional): compute with the same integer math as the scalar function. Defaults to True.
+
+    Returns:
+        APYs scaled by 1e18, in the order of `utilization_pairs`.
+    """
+    before, after = _split_pairs(utilization_pairs)
+    if not exact:
+        return _approximate_apys(rate_model, before, after)
+
+    area = _area_under_rate_curve_fn(rate_model)
+    apys = []
+    for utilization_before_deposit, utilization_after_deposit in zip(before, after):
+        utilization_before_deposit = int(utilization_before_deposit)
+        utilization_after_deposit = int(utilization_after_deposit)
+        if utilization_before_deposit == utilization_after_deposit:
+            raise Exception("Deposit cant have zero size")
+        numerator = area(utilization_after_deposit) - area(utilization_before_deposit)
+        denominator = utilization_after_deposit - utilization_before_deposit
+        apys.append(numerator * fixedPointAdjustment // denominator)
+    return apys
+
+
+def _approximate_apys(rate_model: AnyRateModel, before, after):
+    # The APY is the mean rate over [before, after]. On each linear segment of the rate curve the mean is the rate at
+    # the midpoint, which avoids subtracting two nearly equal areas for small deposits.
+    F = float(fixedPointAdjustment)
+    UBar = rate_model["UBar"] / F
+    R0, R1, R2 = rate_model["R0"] / F, rate_model["R1"] / F, rate_model["R2"] / F
+    if isinstance(rate_model, CompiledRateModel):
+        slope_before_kink, slope_after_kink = rate_model.slope_before_kink, rate_model.slope_after_kink
+    else:
+        slope_before_kink = R1 / UBar
+        slope_after_kink = R2 / (1.0 - UBar)
+
+    np = _numpy()
+    if np is None:
+        apys = []
+        for utilization_before_deposit, utilization_after_deposit in zip(before, after):
+            if utilization_before_deposit == utilization_after_deposit:
+                raise Exception("Deposit cant have zero size")
+            lo = min(utilization_before_deposit, utilization_after_deposit) / F
+            hi = max(utilization_before_deposit, utilization_after_deposit) / F
+            width_before_kink = max(min(hi, UBar) - lo, 0.0)
+            width_after_kink = max(hi - max(lo, UBar), 0.0)
+            if width_after_kink == 0.0:
+                apy = R0 + slope_before_kink * (lo + hi) / 2
+            elif width_before_kink == 0.0:
+                apy = R0 + R1 + slope_after_kink * ((lo + hi) / 2 - UBar)
+            else:
+                apy = (
+                    width_before_kink * (R0 + slope_before_kink * (lo + UBar) / 2)
+                    + width_after_kink * (R0 + R1 + slope_after_kink * (hi - UBar) / 2)
+                ) / (width_before_kink + width_after_kink)
+            apys.append(apy * F)
+        return apys
+
+    before, after = np.asarray(before), np.asarray(after)
+    if np.any(before == after):
+        raise Exception("Deposit cant have zero size")
+    before, after = before.astype(np.float64), after.astype(np.float64)
+    lo = np.minimum(before, after) / F
+    hi = np.maximum(before, after) / F
+    width_before_kink = np.maximum(np.minimum(hi, UBar) - lo, 0.0)
+    width_after_kink = np.maximum(hi - np.maximum(lo, UBar), 0.0)
+    mid = (lo + hi) / 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        straddling = (
+            width_before_kink * (R0 + slope_before_kink * (lo + UBar) / 2)
+            + width_after_kink * (R0 + R1 + slope_after_kink * (hi - UBar) / 2)
+        ) / (width_before_kink + width_after_kink)
+    apys = np.where(
+        width_after_kink == 0.0,
+        R0 + slope_before_kink * mid,
+        np.where(
+            width_before_kink == 0.0,
+            R0 + R1 + slope_after_kink * (mid - UBar),
+            straddling,
+        ),
+    )
+    return apys * F
+
+
+def convert_apys_to_weekly_fees(apys: Iterable[BigNumberish], exact: bool = True):
+    """Batch version of `convert_apy_to_weekly_fee`."""
+    if exact:
+        weekly_fees = {}
+        results = []
+        for apy in apys:
+            apy = int(apy)
+            if apy not in weekly_fees:
+                weekly_fees[apy] = convert_apy_to_weekly_fee(apy)
+            results.append(weekly_fees[apy])
+        return results
+
+    F = float(fixedPointAdjustment)
+    np = _numpy()
+    if np is None:
+        return [math.expm1(math.log1p(apy / F) / 52) * F for apy in apys]
+    # R_week = (1 + apy)^(1/52) - 1, in a form that keeps precision for small rates.
+    return np.expm1(np.log1p(np.asarray(apys, dtype=np.float64) / F) / 52) * F
+
+
+def calculate_realized_lp_fee_pcts(
+    rate_model: AnyRateModel, utilization_pairs: UtilizationPairs, exact: bool = True
+):
+    """Batch version of `calculate_realized_lp_fee_pct`, see `calculate_apys_from_utilizations`."""
+    apys = calculate_apys_from_utilizations(rate_model, utilization_pairs, exact)
+    return convert_apys_to_weekly_fees(apys, exact)
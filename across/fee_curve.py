@@ -0,0 +1,126 @@
+from bisect import bisect_right
+from typing import List, Optional, Union
+from .constants import RateModel
+from .fee_calculator import (
+    calculate_instantaneous_rate,
+    calculate_realized_lp_fee_pct,
+    calculate_realized_lp_fee_pcts,
+    convert_apy_to_weekly_fee,
+)
+from .pool_state import PoolState
+from .rate_model import CompiledRateModel, compile_rate_model
+from .utils import fixedPointAdjustment
+
+__all__ = ["FeeCurve"]
+
+
+class FeeCurve:
+    """Realized LP fee of relaying from a pool as a function of the amount, at one block.
+
+    The fee is sampled at `points` evenly spaced amounts up to `max_amount` (the pool's liquid reserves by
+    default) plus the amount where utilization crosses the rate model's kink. `fee` interpolates between
+    the samples, `exact_fee` and `max_amount_for_fee` run the exact integer fee math. Fees do not decrease
+    as the amount grows, which is what makes the inverse lookup a bisection.
+
+    Example:
+        >>> curve = calculator.get_fee_curve(token_address, bridge_pool_address)
+        >>> curve.max_amount_for_fee(toBNWei("0.0005"))  # largest relay paying at most 0.05%
+    """
+
+    def __init__(
+        self,
+        rate_model: Union[RateModel, CompiledRateModel],
+        pool_state: PoolState,
+        block_number: Optional[int] = None,
+        max_amount: Optional[int] = None,
+        points: int = 64,
+    ) -> None:
+        assert points > 1, "points must be greater than 1"
+        self.rate_model = compile_rate_model(rate_model)
+        self.pool_state = pool_state.synced()
+        self.block_number = block_number
+        self.points = points
+        self.current_utilization = self.pool_state.liquidity_utilization_current()
+        self.max_amount = self.pool_state.liquidReserves if max_amount is None else int(max_amount)
+        amounts = {self.max_amount * i // points for i in range(points + 1)}
+        kink = self._kink_amount()
+        if 0 < kink < self.max_amount:
+            amounts.add(kink)
+        self.amounts: List[int] = sorted(amounts)
+        self.fees: List[int] = self._exact_fees(self.amounts)
+
+    def _kink_amount(self) -> int:
+        # Smallest amount whose post-relay utilization reaches UBar.
+        flooredUtilizedReserves = max(self.pool_state.utilizedReserves, 0)
+        denominator = self.pool_state.liquidReserves + flooredUtilizedReserves
+        numerator = self.pool_state.pendingReserves + flooredUtilizedReserves
+        return -(-self.rate_model["UBar"] * denominator // fixedPointAdjustment) - numerator
+
+    def _zero_size_fee(self) -> int:
+        # The limit of the fee as the amount goes to 0, where the realized fee math is undefined.
+        return convert_apy_to_weekly_fee(
+            calculate_instantaneous_rate(self.rate_model, self.current_utilization)
+        )
+
+    def _exact_fees(self, amounts: List[int]) -> List[int]:
+        utilizations = [self.pool_state.liquidity_utilization_post_relay(amount) for amount in amounts]
+        moved = [u for u in utilizations if u != self.current_utilization]
+        fees = iter(
+            calculate_realized_lp_fee_pcts(
+                self.rate_model, [(self.current_utilization, u) for u in moved]
+            )
+        )
+        zero_size_fee = None
+        results = []
+        for u in utilizations:
+            if u != self.current_utilization:
+                results.append(next(fees))
+                continue
+            if zero_size_fee is None:
+                zero_size_fee = self._zero_size_fee()
+            results.append(zero_size_fee)
+        return results
+
+    def exact_fee(self, amount: int) -> int:
+        """Realized LP fee pct of relaying `amount`, as `LpFeeCalculator.get_lp_fee_pct` computes it."""
+        nextUt = self.pool_state.liquidity_utilization_post_relay(int(amount))
+        if nextUt == self.current_utilization:
+            return self._zero_size_fee()
+        return calculate_realized_lp_fee_pct(self.rate_model, self.current_utilization, nextUt)
+
+    def fee(self, amount: int) -> int:
+        """Realized LP fee pct of relaying `amount`, linearly interpolated between the sampled amounts.
+
+        Amounts beyond `max_amount` are computed exactly.
+        """
+        amount = int(amount)
+        if amount < 0 or amount > self.max_amount:
+            return self.exact_fee(amount)
+        i = bisect_right(self.amounts, amount) - 1
+        if self.amounts[i] == amount:
+            return self.fees[i]
+        a0, a1 = self.amounts[i], self.amounts[i + 1]
+        f0, f1 = self.fees[i], self.fees[i + 1]
+        return f0 + (f1 - f0) * (amount - a0) // (a1 - a0)
+
+    def max_amount_for_fee(self, max_fee_pct: int) -> int:
+        """Largest amount up to `max_amount` whose exact fee is at most `max_fee_pct`.
+
+        Returns:
+            int: the amount, 0 when even the smallest relay pays more.
+        """
+        max_fee_pct = int(max_fee_pct)
+        # The samples bracket the answer, bisection with the exact fee math then narrows it down to the wei.
+        i = bisect_right(self.fees, max_fee_pct)
+        if i == 0:
+            return 0
+        if i == len(self.amounts):
+            return self.max_amount
+        low, high = self.amounts[i - 1], self.amounts[i]
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self.exact_fee(middle) <= max_fee_pct:
+                low = middle
+            else:
+                high = middle
+        return low
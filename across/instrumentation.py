@@ -0,0 +1,218 @@
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from web3.providers import BaseProvider
+
+__all__ = [
+    "Instrumentation",
+    "Stats",
+    "CallbackInstrumentation",
+    "StatsdInstrumentation",
+    "InstrumentedProvider",
+    "NULL_INSTRUMENTATION",
+]
+
+
+class _Timer:
+    __slots__ = ("instrumentation", "name", "start")
+
+    def __init__(self, instrumentation: "Instrumentation", name: str) -> None:
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.instrumentation.observe(self.name, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Instrumentation:
+    """Receives metrics from `LpFeeCalculator` and `BlockFinder`. This base class discards them.
+
+    Metric names are dotted, e.g. `rpc.eth_call` or `lp_fee.block_lookup_seconds`:
+        - counters (`increment`): `rpc.<method>` per JSON-RPC request (see `InstrumentedProvider`),
+          `<cache>.hit` and `<cache>.miss`, and `block_finder.request.shared` for block requests answered by
+          another thread's request in flight.
+        - observations (`observe`): phase durations, named `*_seconds`, and per lookup values such as
+          `block_finder.search_iterations`.
+
+    Subclasses set `enabled = True`; while it is False, timers are a shared no-op and cost next to nothing.
+    """
+
+    enabled = False
+
+    def increment(self, name: str, value: int = 1) -> None:
+        pass
+
+    def observe(self, name: str, value: float) -> None:
+        pass
+
+    def timer(self, name: str):
+        """Context manager observing the seconds spent in its block under `name`."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+
+NULL_INSTRUMENTATION = Instrumentation()
+
+
+class Stats(Instrumentation):
+    """Aggregates metrics in memory and exports them in the Prometheus text format."""
+
+    enabled = True
+
+    def __init__(self) -> None:
+        self.counters: Dict[str, int] = {}
+        # name -> (count, sum, max)
+        self.observations: Dict[str, Tuple[int, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            count, total, maximum = self.observations.get(name, (0, 0.0, value))
+            self.observations[name] = (count + 1, total + value, max(maximum, value))
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.observations.clear()
+
+    def to_prometheus(self, prefix: str = "across") -> str:
+        """Renders counters as `<prefix>_<name>_total` and observations as summaries with a `_max` gauge."""
+        lines: List[str] = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric = _prometheus_name(prefix, name) + "_total"
+                lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+            for name, (count, total, maximum) in sorted(self.observations.items()):
+                metric = _prometheus_name(prefix, name)
+                lines += [
+                    f"# TYPE {metric} summary",
+                    f"{metric}_count {count}",
+                    f"{metric}_sum {total!r}",
+                    f"# TYPE {metric}_max gauge",
+                    f"{metric}_max {maximum!r}",
+                ]
+        return "\n".join(lines) + "\n"
+
+
+def _prometheus_name(prefix: str, name: str) -> str:
+    return f"{prefix}_{name}".replace(".", "_").replace("-", "_")
+
+
+class CallbackInstrumentation(Instrumentation):
+    """Forwards every metric to callbacks, e.g. to feed an existing metrics client."""
+
+    enabled = True
+
+    def __init__(
+        self,
+        on_increment: Optional[Callable[[str, int], None]] = None,
+        on_observe: Optional[Callable[[str, float], None]] = None,
+    ) -> None:
+        self.on_increment = on_increment
+        self.on_observe = on_observe
+
+    def increment(self, name: str, value: int = 1) -> None:
+        if self.on_increment is not None:
+            self.on_increment(name, value)
+
+    def observe(self, name: str, value: float) -> None:
+        if self.on_observe is not None:
+            self.on_observe(name, value)
+
+
+class StatsdInstrumentation(Instrumentation):
+    """Sends every metric to a StatsD server over UDP.
+
+    Counters are sent as `|c`, durations (names ending in `_seconds`) as `|ms` and other observations as `|h`.
+    Sending never blocks or raises: metrics that cannot be sent are dropped.
+    """
+
+    enabled = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8125, prefix: str = "across") -> None:
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+    def _send(self, line: str) -> None:
+        try:
+            self.socket.sendto(line.encode(), self.address)
+        except OSError:
+            pass
+
+    def increment(self, name: str, value: int = 1) -> None:
+        self._send(f"{self.prefix}.{name}:{value}|c")
+
+    def observe(self, name: str, value: float) -> None:
+        if name.endswith("_seconds"):
+            self._send(f"{self.prefix}.{name[: -len('_seconds')]}:{value * 1000:.3f}|ms")
+        else:
+            self._send(f"{self.prefix}.{name}:{value}|h")
+
+    def close(self) -> None:
+        self.socket.close()
+
+
+class InstrumentedProvider(BaseProvider):
+    """Wraps a provider to count and time every JSON-RPC request sent through it.
+
+    This sees the requests web3 makes on its own as well, e.g. the `eth_chainId` its validation
+    middleware sends before each `eth_call`. Each request is counted as `rpc.<method>` and timed as
+    `rpc.<method>_seconds`; error responses and exceptions are also counted as `rpc.errors`.
+    """
+
+    def __init__(self, provider: BaseProvider, instrumentation: Instrumentation) -> None:
+        self.provider = provider
+        self.instrumentation = instrumentation
+
+    @property
+    def middlewares(self):
+        return self.provider.middlewares
+
+    @middlewares.setter
+    def middlewares(self, values) -> None:
+        self.provider.middlewares = values
+
+    def is_connected(self) -> bool:
+        return self.provider.is_connected()
+
+    def isConnected(self) -> bool:
+        return self.provider.is_connected()
+
+    def make_request(self, method, params) -> Any:
+        self.instrumentation.increment(f"rpc.{method}")
+        start = time.perf_counter()
+        try:
+            response = self.provider.make_request(method, params)
+        except Exception:
+            self.instrumentation.increment("rpc.errors")
+            raise
+        finally:
+            self.instrumentation.observe(f"rpc.{method}_seconds", time.perf_counter() - start)
+        if "error" in response:
+            self.instrumentation.increment("rpc.errors")
+        return response
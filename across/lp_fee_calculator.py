@@ -1,19 +1,191 @@
-from typing import Optional
+import random
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 from .utils import BigNumberish
 from .fee_calculator import calculate_realized_lp_fee_pct
-from .rate_model import parse_and_return_rate_model_from_string
-from .clients import BridgePool, RateModelStore
+from .fee_curve import FeeCurve
+from .rate_model import RateModelHistory, parse_compiled_rate_model
+from .clients import ERC20, BridgePool, ContractCall, RateModelStore, aggregate_calls, contract_registry
 from .block_finder import BlockFinder
+from .block_index import BlockTimestampIndex
+from .chains import ChainConfig, get_chain
+from .exceptions import AcrossException
+from .pool_state import POOL_STATE_FIELDS, PoolState
+from .read_cache import MISSING, ContractReadCache, ReadKey
+from .instrumentation import Instrumentation, InstrumentedProvider, NULL_INSTRUMENTATION
 from web3 import Web3
 
-__all__ = ["LpFeeCalculator"]
+__all__ = ["LpFeeCalculator", "LpFeeRequest"]
+
+
+class LpFeeRequest(NamedTuple):
+    """A single quote for `LpFeeCalculator.get_lp_fee_pcts`."""
+
+    token_address: str
+    bridge_pool_address: str
+    amount: BigNumberish
+    timestamp: Optional[int] = None
 
 
 class LpFeeCalculator:
-    def __init__(self, provider) -> None:
+    def __init__(
+        self,
+        provider,
+        rate_model_history: Optional[RateModelHistory] = None,
+        block_index: Optional[BlockTimestampIndex] = None,
+        instrumentation: Instrumentation = NULL_INSTRUMENTATION,
+        read_cache: Optional[ContractReadCache] = None,
+        local_utilization: bool = False,
+        verify_utilization: float = 0.0,
+        chain: Optional[ChainConfig] = None,
+    ) -> None:
+        # Receives phase timings, RPC counts and cache hits of quotes, see `across.instrumentation`.
+        self.instrumentation = instrumentation
+        if instrumentation.enabled:
+            provider = InstrumentedProvider(provider, instrumentation)
         self.provider = provider
         self.w3 = Web3(provider=provider)
-        self.block_finder = BlockFinder(provider, self.w3.eth.get_block)
+        self.block_finder = BlockFinder(
+            provider,
+            self.w3.eth.get_block,
+            block_index,
+            instrumentation=instrumentation,
+            network_id=None if chain is None else chain.chain_id,
+        )
+        # Rate models are read from the history when it covers the quoted block.
+        self.rate_model_history = rate_model_history
+        # Memoizes contract reads and the latest block, see `across.read_cache`.
+        self.read_cache = read_cache
+        # Addresses and block time of the provider's chain, looked up in `across.chains` when not given.
+        self._chain = chain
+        if chain is not None:
+            contract_registry.set_chain_id(provider, chain.chain_id)
+        # Computes utilizations from the pool's reserves, read once per block, instead of reading
+        # `liquidityUtilizationPostRelay` for every amount. `verify_utilization` is the fraction of
+        # local results checked against the contract.
+        self.local_utilization = local_utilization
+        self.verify_utilization = verify_utilization
+        self._verify_rng = random.Random()
+        self._l1_tokens: Dict[str, str] = {}
+        # The last fee curve built per (token, pool), reused while quotes stay at its block.
+        self._fee_curves: Dict[Tuple[str, str], FeeCurve] = {}
+
+    @property
+    def chain_id(self) -> int:
+        return self.block_finder.network_id
+
+    @property
+    def chain(self) -> ChainConfig:
+        if self._chain is None:
+            self._chain = get_chain(self.chain_id)
+        return self._chain
+
+    def sync_rate_model_history(self, to_block: Optional[int] = None, chunk_size: int = 100_000) -> int:
+        """Backfills `rate_model_history` from the rate model store's update events.
+
+        Args:
+            to_block (Optional[int], optional): last block to index. Defaults to the latest block.
+            chunk_size (int, optional): blocks per `eth_getLogs` request, lower it for providers that
+                cap the range of a log query. Defaults to 100_000.
+
+        Returns:
+            int: number of rate model updates indexed.
+        """
+        if self.rate_model_history is None:
+            self.rate_model_history = RateModelHistory()
+        if to_block is None:
+            to_block = self.w3.eth.block_number
+        rate_model_store_address = self.chain.rate_model_store
+        rate_model_store_instance = RateModelStore.connect(
+            rate_model_store_address, self.provider
+        )
+        return self.rate_model_history.backfill(rate_model_store_instance, to_block, chunk_size)
+
+    def _indexed_rate_model(self, token_address: str, blockTag: int):
+        if self.rate_model_history is None:
+            return None
+        rateModel = self.rate_model_history.get(token_address, blockTag)
+        self.instrumentation.increment(
+            "rate_model_history.miss" if rateModel is None else "rate_model_history.hit"
+        )
+        return rateModel
+
+    def _read_key(self, contract, fn_name: str, args: tuple, blockTag: int) -> ReadKey:
+        return (self.chain_id, contract.address.lower(), fn_name, args, blockTag)
+
+    def _cached_read(self, contract, fn_name: str, args: tuple, blockTag: int):
+        if self.read_cache is None:
+            return MISSING
+        value = self.read_cache.get(self._read_key(contract, fn_name, args, blockTag))
+        self.instrumentation.increment("read_cache.miss" if value is MISSING else "read_cache.hit")
+        return value
+
+    def _store_read(self, contract, fn_name: str, args: tuple, blockTag: int, value) -> None:
+        if self.read_cache is None:
+            return
+        # Reads at blocks that can still be reorganized away only live for the cache's ttl.
+        latest = self.block_finder.latest_block_number
+        final = latest is not None and blockTag <= latest - self.read_cache.confirmations
+        self.read_cache.set(self._read_key(contract, fn_name, args, blockTag), value, final)
+
+    def _call(self, contract, fn_name: str, args: tuple, blockTag: int):
+        value = self._cached_read(contract, fn_name, args, blockTag)
+        if value is MISSING:
+            value = contract.get_function_by_name(fn_name)(*args).call(block_identifier=blockTag)
+            self._store_read(contract, fn_name, args, blockTag, value)
+        return value
+
+    def _read_many(self, reads: Sequence[ContractCall], blockTag: int) -> List:
+        # Reads missing from the read cache are fetched in one multicall, failures are returned in their slot.
+        values = [self._cached_read(contract, fn_name, args, blockTag) for contract, fn_name, args in reads]
+        missing = [i for i, value in enumerate(values) if value is MISSING]
+        if missing:
+            fetched = aggregate_calls(self.provider, [reads[i] for i in missing], blockTag)
+            for i, value in zip(missing, fetched):
+                values[i] = value
+                if not isinstance(value, Exception):
+                    self._store_read(*reads[i], blockTag, value)
+        return values
+
+    def _pool_state_reads(self, bridge_pool_instance, blockTag: int) -> List[ContractCall]:
+        address = bridge_pool_instance.address
+        if address not in self._l1_tokens:
+            # Set when the pool is deployed and never changed.
+            self._l1_tokens[address] = self._call(bridge_pool_instance, "l1Token", (), blockTag)
+        l1_token_instance = ERC20.connect(self._l1_tokens[address], self.provider)
+        return [(bridge_pool_instance, name, ()) for name in POOL_STATE_FIELDS] + [
+            (l1_token_instance, "balanceOf", (address,))
+        ]
+
+    def _pool_state(self, bridge_pool_instance, blockTag: int) -> PoolState:
+        values = self._read_many(self._pool_state_reads(bridge_pool_instance, blockTag), blockTag)
+        return PoolState(*_raise_first_error(values))
+
+    def _checked_utilization(self, bridge_pool_instance, amount: int, blockTag: int, nextUt: int) -> int:
+        # Spot-checks a locally computed utilization against the contract.
+        if self.verify_utilization <= 0 or self._verify_rng.random() >= self.verify_utilization:
+            return nextUt
+        self.instrumentation.increment("utilization.verified")
+        contractUt = self._call(bridge_pool_instance, "liquidityUtilizationPostRelay", (amount,), blockTag)
+        if contractUt != nextUt:
+            self.instrumentation.increment("utilization.mismatch")
+            raise AcrossException(
+                f"Local utilization {nextUt} of {bridge_pool_instance.address} at block {blockTag} "
+                f"does not match the contract's {contractUt}"
+            )
+        return nextUt
+
+    def _latest_block_number(self) -> int:
+        head = self.block_finder.current_head()
+        if head is not None:
+            return head.number
+        if self.read_cache is None:
+            return self.block_finder.get_latest_block().number
+        key = (self.chain_id, "latest")
+        number = self.read_cache.get(key)
+        if number is MISSING:
+            number = self.block_finder.get_latest_block().number
+            self.read_cache.set(key, number, permanent=False)
+        return number
 
     def get_lp_fee_pct(
         self,
@@ -40,40 +212,356 @@ class LpFeeCalculator:
         """
         amount = int(amount)
         assert amount > 0, "Amount must be greater than 0"
+        instrumentation = self.instrumentation
+        instrumentation.increment("lp_fee.quotes")
 
         bridge_pool_instance = BridgePool.connect(
             bridge_pool_address, self.provider
         )
-        rate_model_store_address = RateModelStore().get_address(self.w3.eth.chain_id)
-        rate_model_store_instance = RateModelStore.connect(
-            rate_model_store_address, self.provider
-        )
 
-        if timestamp is not None:
-            targetBlock = self.block_finder.get_block_for_timestamp(timestamp)
-        else:
-            targetBlock = self.w3.eth.get_block("latest")
+        with instrumentation.timer("lp_fee.block_lookup_seconds"):
+            blockTag = self._block_tag(timestamp)
+
+        with instrumentation.timer("lp_fee.contract_calls_seconds"):
+            if self.local_utilization:
+                poolState = self._pool_state(bridge_pool_instance, blockTag)
+                currentUt = poolState.liquidity_utilization_current()
+                nextUt = self._checked_utilization(
+                    bridge_pool_instance, amount, blockTag, poolState.liquidity_utilization_post_relay(amount)
+                )
+            else:
+                results = [
+                    self._call(bridge_pool_instance, "liquidityUtilizationCurrent", (), blockTag),
+                    self._call(bridge_pool_instance, "liquidityUtilizationPostRelay", (amount,), blockTag),
+                ]
+                [currentUt, nextUt] = results
+
+            rateModel = self._rate_model(token_address, blockTag)
+
+        with instrumentation.timer("lp_fee.fee_math_seconds"):
+            return calculate_realized_lp_fee_pct(rateModel, currentUt, nextUt)
+
+    def _rate_model(self, token_address: str, blockTag: int):
+        rateModel = self._indexed_rate_model(token_address, blockTag)
+        if rateModel is None:
+            rate_model_store_address = self.chain.rate_model_store
+            rate_model_store_instance = RateModelStore.connect(
+                rate_model_store_address, self.provider
+            )
+            rate_model_for_block_height = self._call(
+                rate_model_store_instance, "l1TokenRateModels", (token_address,), blockTag
+            )
+            # Parsing stringified rate model will error if the rate model doesn't contain exactly the expected keys
+            # or isn't a JSON object.
+            rateModel = parse_compiled_rate_model(
+                rate_model_for_block_height
+            )
+        return rateModel
+
+    def _block_tag(self, timestamp: Optional[int]) -> int:
+        if timestamp is None:
+            return self._latest_block_number()
+        targetBlock = self.block_finder.get_block_for_timestamp(timestamp)
         assert targetBlock is not None, (
-            "Unable to find target block for timestamp: " + \
-                timestamp or "latest"
+            f"Unable to find target block for timestamp: {timestamp}"
         )
-        blockTag = targetBlock.number
-
-        results = [
-            bridge_pool_instance.functions.liquidityUtilizationCurrent().call({"blockTag": blockTag}),
-            bridge_pool_instance.functions.liquidityUtilizationPostRelay(amount).call(
-                {"blockTag": blockTag}
-            ),
-            rate_model_store_instance.functions.l1TokenRateModels(token_address).call(
-                {"blockTag": blockTag}
-            ),
-        ]
-        [currentUt, nextUt, rate_model_for_block_height] = results
+        return targetBlock.number
+
+    def get_fee_curve(
+        self,
+        token_address: str,
+        bridge_pool_address: str,
+        timestamp: Optional[int] = None,
+        points: int = 64,
+    ) -> FeeCurve:
+        """Build the realized LP fee versus amount curve of a pool, see `FeeCurve`.
+
+        The curve is computed from the pool's reserves and rate model at the target block and reused
+        until quotes move to another block.
+
+        Args:
+            token_address (str): token address on L1 to transfer from l2 to l1
+            bridge_pool_address (str): bridge pool address on L1 with the liquidity pool
+            timestamp (Optional[int], optional): timestamp in seconds of latest block on L2 chain. Defaults to None.
+            points (int, optional): number of evenly spaced amounts sampled. Defaults to 64.
+
+        Returns:
+            FeeCurve: the fee curve at the target block.
+
+        Raises:
+            AcrossException:
+                - Unable to find target block for timestamp
+        """
+        with self.instrumentation.timer("lp_fee.block_lookup_seconds"):
+            blockTag = self._block_tag(timestamp)
+        return self.warm_fee_curve(token_address, bridge_pool_address, blockTag, points)
+
+    def warm_fee_curve(
+        self, token_address: str, bridge_pool_address: str, block_number: int, points: int = 64
+    ) -> FeeCurve:
+        """Builds the fee curve of a pool at `block_number` unless it is cached, see `get_fee_curve`.
+
+        Only touches the read cache and the curve cache, so a `BlockFollower` can call it from its thread.
+        """
+        blockTag = block_number
+        key = (token_address.lower(), bridge_pool_address.lower())
+        curve = self._fee_curves.get(key)
+        if curve is not None and curve.block_number == blockTag and curve.points == points:
+            return curve
+        bridge_pool_instance = BridgePool.connect(bridge_pool_address, self.provider)
+        with self.instrumentation.timer("lp_fee.contract_calls_seconds"):
+            poolState = self._pool_state(bridge_pool_instance, blockTag)
+            rateModel = self._rate_model(token_address, blockTag)
+        with self.instrumentation.timer("lp_fee.fee_math_seconds"):
+            curve = self._fee_curves[key] = FeeCurve(rateModel, poolState, blockTag, points=points)
+        return curve
+
+    def drop_blocks(self, from_block: int) -> None:
+        """Forgets reads and fee curves at `from_block` and later, after a reorg replaced those blocks."""
+        if self.read_cache is not None:
+            self.read_cache.drop_blocks(from_block)
+        for key, curve in list(self._fee_curves.items()):
+            if curve.block_number >= from_block:
+                self._fee_curves.pop(key, None)
+
+    def get_max_amount_for_lp_fee_pct(
+        self,
+        token_address: str,
+        bridge_pool_address: str,
+        max_fee_pct: BigNumberish,
+        timestamp: Optional[int] = None,
+    ) -> int:
+        """Largest relay whose LP fee is at most `max_fee_pct`, up to the pool's liquid reserves.
+
+        Args:
+            token_address (str): token address on L1 to transfer from l2 to l1
+            bridge_pool_address (str): bridge pool address on L1 with the liquidity pool
+            max_fee_pct (BigNumberish): highest acceptable LP fee pct, scaled by 1e18.
+            timestamp (Optional[int], optional): timestamp in seconds of latest block on L2 chain. Defaults to None.
+
+        Returns:
+            int: amount in wei, 0 if even the smallest relay pays more.
+        """
+        curve = self.get_fee_curve(token_address, bridge_pool_address, timestamp)
+        return curve.max_amount_for_fee(int(max_fee_pct))
+
+    def get_lp_fee_pcts(
+        self, requests: Sequence[LpFeeRequest], max_workers: Optional[int] = None
+    ) -> List[Union[int, AcrossException]]:
+        """Estimate LP Fees for many relays, sharing block lookups and contract reads between them.
+
+        Requests are grouped by target block and every distinct contract read of a group is sent in
+        one Multicall3 `aggregate3` call, so quoting N amounts at one block costs a single `eth_call`.
+        With `local_utilization`, that call reads each pool's reserves instead of one utilization per amount.
+
+        Args:
+            requests (Sequence[LpFeeRequest]): quotes to estimate.
+            max_workers (Optional[int], optional): block requests sent concurrently while resolving timestamps, see
+                `BlockFinder.get_blocks_for_timestamps`. Defaults to the block finder's `max_workers`.
 
-        # Parsing stringified rate model will error if the rate model doesn't contain exactly the expected keys or isn't
-        # a JSON object.
-        rateModel = parse_and_return_rate_model_from_string(
-            rate_model_for_block_height
+        Returns:
+            List[Union[int, AcrossException]]: estimated LP Fees in wei, in the order of `requests`.
+                A request that could not be estimated has an `AcrossException` in its slot.
+        """
+        results: List[Union[int, AcrossException]] = [None] * len(requests)
+        if not requests:
+            return results
+        instrumentation = self.instrumentation
+        instrumentation.increment("lp_fee.quotes", len(requests))
+
+        errors = [_invalid_request(request) for request in requests]
+        valid = [request for request, error in zip(requests, errors) if error is None]
+        # Resolve each distinct timestamp to a block only once, in one bulk search.
+        block_numbers: Dict[Optional[int], Union[int, AcrossException]] = {}
+        timestamps = sorted(
+            {int(request.timestamp) for request in valid if request.timestamp is not None}
         )
+        with instrumentation.timer("lp_fee.block_lookup_seconds"):
+            if any(request.timestamp is None for request in valid):
+                try:
+                    block_numbers[None] = self._latest_block_number()
+                except Exception as e:
+                    block_numbers[None] = _as_across_exception(e)
+            try:
+                targetBlocks = self.block_finder.get_blocks_for_timestamps(timestamps, max_workers)
+            except Exception as e:
+                targetBlocks = [_as_across_exception(e)] * len(timestamps)
+            for timestamp, targetBlock in zip(timestamps, targetBlocks):
+                if targetBlock is None:
+                    block_numbers[timestamp] = AcrossException(
+                        f"Unable to find target block for timestamp: {timestamp}"
+                    )
+                elif isinstance(targetBlock, AcrossException):
+                    block_numbers[timestamp] = targetBlock
+                else:
+                    block_numbers[timestamp] = targetBlock.number
+
+        groups: Dict[int, List[int]] = {}
+        for i, request in enumerate(requests):
+            if errors[i] is not None:
+                results[i] = errors[i]
+                continue
+            timestamp = None if request.timestamp is None else int(request.timestamp)
+            blockTag = block_numbers[timestamp]
+            if isinstance(blockTag, AcrossException):
+                results[i] = blockTag
+            else:
+                groups.setdefault(blockTag, []).append(i)
+
+        for blockTag, indexes in groups.items():
+            self._quote_block(requests, indexes, blockTag, results)
+        return results
+
+    def get_lp_fee_pcts_at_block(
+        self, requests: Sequence[LpFeeRequest], block_number: int
+    ) -> List[Union[int, AcrossException]]:
+        """Estimate LP Fees for many relays at a known block, in one `eth_call` like `get_lp_fee_pcts`.
+
+        Skips the timestamp to block lookup, so the `timestamp` of the requests is ignored.
+
+        Args:
+            requests (Sequence[LpFeeRequest]): quotes to estimate.
+            block_number (int): block to quote at.
+
+        Returns:
+            List[Union[int, AcrossException]]: estimated LP Fees in wei, in the order of `requests`.
+                A request that could not be estimated has an `AcrossException` in its slot.
+        """
+        results: List[Union[int, AcrossException]] = [None] * len(requests)
+        self.instrumentation.increment("lp_fee.quotes", len(requests))
+        indexes = []
+        for i, request in enumerate(requests):
+            error = _invalid_request(request, check_timestamp=False)
+            if error is not None:
+                results[i] = error
+            else:
+                indexes.append(i)
+        if indexes:
+            self._quote_block(requests, indexes, int(block_number), results)
+        return results
+
+    def _quote_block(
+        self,
+        requests: Sequence[LpFeeRequest],
+        indexes: List[int],
+        blockTag: int,
+        results: List[Union[int, AcrossException]],
+    ) -> None:
+        # Quotes `requests[i]` for `i` in `indexes` at `blockTag` into `results`.
+        instrumentation = self.instrumentation
+        rate_model_store_address = self.chain.rate_model_store
+        rate_model_store_instance = RateModelStore.connect(
+            rate_model_store_address, self.provider
+        )
+        # Deduplicate reads: utilization (or the reserves) is shared per pool, rate models per token.
+        calls, slots = [], {}
+
+        def slot(key, contract, fn_name, args):
+            if key not in slots:
+                slots[key] = len(calls)
+                calls.append((contract, fn_name, args))
+            return slots[key]
+
+        planned = []
+        for i in indexes:
+            request = requests[i]
+            pool = request.bridge_pool_address
+            bridge_pool_instance = BridgePool.connect(pool, self.provider)
+            amount = int(request.amount)
+            if self.local_utilization:
+                try:
+                    state_reads = self._pool_state_reads(bridge_pool_instance, blockTag)
+                except Exception as e:
+                    results[i] = _as_across_exception(e)
+                    continue
+                utilization_slots = tuple(
+                    slot(("state", pool, n), *read) for n, read in enumerate(state_reads)
+                )
+            else:
+                utilization_slots = (
+                    slot(("current", pool), bridge_pool_instance, "liquidityUtilizationCurrent", ()),
+                    slot(("post", pool, amount), bridge_pool_instance, "liquidityUtilizationPostRelay", (amount,)),
+                )
+            indexedRateModel = self._indexed_rate_model(request.token_address, blockTag)
+            planned.append(
+                (
+                    i,
+                    bridge_pool_instance,
+                    amount,
+                    utilization_slots,
+                    None
+                    if indexedRateModel is not None
+                    else slot(("rate", request.token_address), rate_model_store_instance, "l1TokenRateModels", (request.token_address,)),
+                    indexedRateModel,
+                )
+            )
+
+        with instrumentation.timer("lp_fee.contract_calls_seconds"):
+            try:
+                values = self._read_many(calls, blockTag)
+            except Exception as e:
+                # The node failed the `eth_call`, every quote of the block gets its error.
+                error = _as_across_exception(e)
+                for i in indexes:
+                    results[i] = error
+                return
+        with instrumentation.timer("lp_fee.fee_math_seconds"):
+            rate_models, pool_states = {}, {}
+            for i, bridge_pool_instance, amount, utilization_slots, rate_slot, indexedRateModel in planned:
+                try:
+                    if self.local_utilization:
+                        if utilization_slots not in pool_states:
+                            pool_states[utilization_slots] = PoolState(
+                                *_raise_first_error(values[n] for n in utilization_slots)
+                            )
+                        poolState = pool_states[utilization_slots]
+                        currentUt = poolState.liquidity_utilization_current()
+                        nextUt = self._checked_utilization(
+                            bridge_pool_instance,
+                            amount,
+                            blockTag,
+                            poolState.liquidity_utilization_post_relay(amount),
+                        )
+                    else:
+                        currentUt, nextUt = _raise_first_error(values[n] for n in utilization_slots)
+                    if indexedRateModel is not None:
+                        rateModel = indexedRateModel
+                    else:
+                        if rate_slot not in rate_models:
+                            rate_model_for_block_height = values[rate_slot]
+                            if isinstance(rate_model_for_block_height, Exception):
+                                raise rate_model_for_block_height
+                            rate_models[rate_slot] = parse_compiled_rate_model(
+                                rate_model_for_block_height
+                            )
+                        rateModel = rate_models[rate_slot]
+                    results[i] = calculate_realized_lp_fee_pct(rateModel, currentUt, nextUt)
+                except Exception as e:
+                    results[i] = _as_across_exception(e)
+
+
+def _raise_first_error(values) -> list:
+    values = list(values)
+    for value in values:
+        if isinstance(value, Exception):
+            raise value
+    return values
+
+
+def _invalid_request(request: LpFeeRequest, check_timestamp: bool = True) -> Optional[AcrossException]:
+    # The checks `get_lp_fee_pct` raises on, returned so one bad request does not fail its whole batch.
+    try:
+        amount = int(request.amount)
+        if check_timestamp and request.timestamp is not None:
+            int(request.timestamp)
+    except (TypeError, ValueError) as e:
+        return AcrossException(f"Invalid request {request}: {e}")
+    if amount <= 0:
+        return AcrossException("Amount must be greater than 0")
+    return None
+
 
-        return calculate_realized_lp_fee_pct(rateModel, currentUt, nextUt)
+def _as_across_exception(e: Exception) -> AcrossException:
+    if isinstance(e, AcrossException):
+        return e
+    return AcrossException(str(e))
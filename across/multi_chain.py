@@ -0,0 +1,184 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Union
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import HTTPProvider, WebsocketProvider
+from .chains import ChainConfig, get_chain, load_chains
+from .exceptions import AcrossException
+from .lp_fee_calculator import LpFeeCalculator, LpFeeRequest, _as_across_exception
+from .utils import BigNumberish
+
+__all__ = ["MultiChainLpFeeCalculator", "ChainLpFeeRequest", "pooled_provider"]
+
+# `LpFeeCalculator` options holding the state of a single chain, they are only accepted per chain.
+_CHAIN_SCOPED_KWARGS = frozenset({"block_index", "rate_model_history"})
+
+
+class ChainLpFeeRequest(NamedTuple):
+    """A single quote for `MultiChainLpFeeCalculator.get_lp_fee_pcts`."""
+
+    chain_id: int
+    token_address: str
+    bridge_pool_address: str
+    amount: BigNumberish
+    timestamp: Optional[int] = None
+
+
+def pooled_provider(rpc_url: str, pool_size: int = 16, timeout: float = 10.0):
+    """A provider for `rpc_url` whose HTTP connections are kept alive and shared by up to `pool_size` threads."""
+    if rpc_url.startswith(("ws://", "wss://")):
+        return WebsocketProvider(rpc_url, websocket_timeout=timeout)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return HTTPProvider(rpc_url, request_kwargs={"timeout": timeout}, session=session)
+
+
+class MultiChainLpFeeCalculator:
+    """Quotes LP fees on several chains, with one `LpFeeCalculator` (and `BlockFinder`) per chain.
+
+    Chains are configured in `across.chains`: their chain id, so it is never requested, the rate model store
+    and the block time. Chains given a URL instead of a provider, or configured with an `rpc_url`, get a pooled
+    keep-alive provider. `get_lp_fee_pcts` quotes the chains of a batch in parallel, and any number of threads
+    can quote at once, a chain's calculator is shared like a single `LpFeeCalculator`.
+
+    Example:
+        >>> calculator = MultiChainLpFeeCalculator({1: "https://mainnet.example", 10: optimism_provider})
+        >>> calculator.get_lp_fee_pcts([ChainLpFeeRequest(1, token_address, bridge_pool_address, amount)])
+
+    Args:
+        providers (Mapping[int, Any], optional): provider or RPC URL by chain id. Defaults to the `rpc_url` of the
+            `chains` given.
+        chains (Optional[Mapping[int, ChainConfig]], optional): configuration by chain id, overriding the
+            registered one. Defaults to the registered configurations.
+        max_workers (Optional[int], optional): chains quoted at once. Defaults to one per chain.
+        chain_kwargs (Optional[Mapping[int, Mapping[str, Any]]], optional): `LpFeeCalculator` options by chain
+            id, e.g. `{1: {"block_index": BlockTimestampIndex("mainnet-blocks.idx")}}`. Defaults to none.
+        **calculator_kwargs: passed to every `LpFeeCalculator`, e.g. `read_cache`, which keys reads by chain, or
+            `local_utilization`. `block_index` and `rate_model_history` hold one chain's state and are only
+            accepted in `chain_kwargs`.
+    """
+
+    def __init__(
+        self,
+        providers: Optional[Mapping[int, Any]] = None,
+        chains: Optional[Mapping[int, ChainConfig]] = None,
+        max_workers: Optional[int] = None,
+        chain_kwargs: Optional[Mapping[int, Mapping[str, Any]]] = None,
+        **calculator_kwargs,
+    ) -> None:
+        chain_scoped = sorted(_CHAIN_SCOPED_KWARGS.intersection(calculator_kwargs))
+        assert not chain_scoped, f"{', '.join(chain_scoped)} must be given per chain in chain_kwargs"
+        chain_kwargs = {int(chain_id): kwargs for chain_id, kwargs in (chain_kwargs or {}).items()}
+        chains = dict(chains or {})
+        providers = dict(providers or {})
+        for chain_id, config in chains.items():
+            if chain_id not in providers and config.rpc_url:
+                providers[chain_id] = config.rpc_url
+        self.calculators: Dict[int, LpFeeCalculator] = {}
+        for chain_id, provider in providers.items():
+            chain_id = int(chain_id)
+            config = chains.get(chain_id) or get_chain(chain_id)
+            if isinstance(provider, str):
+                provider = pooled_provider(provider)
+            self.calculators[chain_id] = LpFeeCalculator(
+                provider, chain=config, **{**calculator_kwargs, **chain_kwargs.get(chain_id, {})}
+            )
+        self.max_workers = max_workers or max(len(self.calculators), 1)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, source: Union[str, Mapping[Any, Mapping[str, Any]]], **kwargs) -> "MultiChainLpFeeCalculator":
+        """Builds a calculator for every chain of a configuration, see `across.chains.load_chains`."""
+        return cls(chains=load_chains(source), **kwargs)
+
+    def __enter__(self) -> "MultiChainLpFeeCalculator":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @property
+    def chain_ids(self) -> List[int]:
+        return sorted(self.calculators)
+
+    def calculator(self, chain_id: int) -> LpFeeCalculator:
+        calculator = self.calculators.get(int(chain_id))
+        if calculator is None:
+            raise AcrossException(f"No provider configured for chain {chain_id}")
+        return calculator
+
+    def get_lp_fee_pct(
+        self,
+        chain_id: int,
+        token_address: str,
+        bridge_pool_address: str,
+        amount: BigNumberish,
+        timestamp: Optional[int] = None,
+    ) -> int:
+        """Estimate LP Fees charged for a relay to `chain_id`, see `LpFeeCalculator.get_lp_fee_pct`."""
+        return self.calculator(chain_id).get_lp_fee_pct(token_address, bridge_pool_address, amount, timestamp)
+
+    def _executor_for_batch(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="across-chains"
+                )
+            return self._executor
+
+    def _quote_chain(
+        self, chain_id: int, requests: Sequence[LpFeeRequest]
+    ) -> List[Union[int, AcrossException]]:
+        try:
+            return self.calculators[chain_id].get_lp_fee_pcts(requests)
+        except Exception as e:
+            return [_as_across_exception(e)] * len(requests)
+
+    def get_lp_fee_pcts(
+        self, requests: Sequence[ChainLpFeeRequest]
+    ) -> List[Union[int, AcrossException]]:
+        """Estimate LP Fees for relays on many chains, quoting each chain's share in parallel.
+
+        Args:
+            requests (Sequence[ChainLpFeeRequest]): quotes to estimate.
+
+        Returns:
+            List[Union[int, AcrossException]]: estimated LP Fees in wei, in the order of `requests`.
+                A request that could not be estimated has an `AcrossException` in its slot.
+        """
+        results: List[Union[int, AcrossException]] = [None] * len(requests)
+        by_chain: Dict[int, List[int]] = {}
+        for i, request in enumerate(requests):
+            chain_id = int(request.chain_id)
+            if chain_id in self.calculators:
+                by_chain.setdefault(chain_id, []).append(i)
+            else:
+                results[i] = AcrossException(f"No provider configured for chain {chain_id}")
+
+        batches = {
+            chain_id: [LpFeeRequest(*requests[i][1:]) for i in indexes]
+            for chain_id, indexes in by_chain.items()
+        }
+        if len(batches) == 1:
+            chain_id, batch = next(iter(batches.items()))
+            quoted = {chain_id: self._quote_chain(chain_id, batch)}
+        else:
+            executor = self._executor_for_batch()
+            futures = {
+                chain_id: executor.submit(self._quote_chain, chain_id, batch)
+                for chain_id, batch in batches.items()
+            }
+            quoted = {chain_id: future.result() for chain_id, future in futures.items()}
+        for chain_id, indexes in by_chain.items():
+            for i, result in zip(indexes, quoted[chain_id]):
+                results[i] = result
+        return results
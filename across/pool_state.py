@@ -0,0 +1,54 @@
+from typing import NamedTuple
+from .exceptions import AcrossException
+from .utils import UINT256_MAX, fixedPointAdjustment
+
+__all__ = ["PoolState", "POOL_STATE_FIELDS"]
+
+# BridgePool getters read into a `PoolState`, besides the l1 token balance of the pool.
+POOL_STATE_FIELDS = ("liquidReserves", "utilizedReserves", "pendingReserves", "bonds")
+
+
+class PoolState(NamedTuple):
+    """The storage of a BridgePool at one block, enough to compute its utilization for any amount.
+
+    `liquidityUtilizationCurrent` and `liquidityUtilizationPostRelay` first `sync()` the pool, which books
+    L1 tokens that arrived since the last sync, so the state also carries the pool's L1 token balance.
+    The integer semantics, including reverts on overflow, follow `BridgePool.sol`.
+    """
+
+    liquidReserves: int
+    utilizedReserves: int
+    pendingReserves: int
+    bonds: int
+    l1TokenBalance: int
+
+    def synced(self) -> "PoolState":
+        """Returns the state after `BridgePool.sync()`."""
+        if self.l1TokenBalance < self.bonds:
+            raise AcrossException("execution reverted: l1Token balance is below bonds")
+        l1TokenBalance = self.l1TokenBalance - self.bonds
+        if l1TokenBalance <= self.liquidReserves:
+            return self
+        return self._replace(
+            utilizedReserves=self.utilizedReserves - (l1TokenBalance - self.liquidReserves),
+            liquidReserves=l1TokenBalance,
+        )
+
+    def liquidity_utilization_post_relay(self, relayedAmount: int) -> int:
+        """Utilization of the pool after relaying `relayedAmount`, as the contract returns it.
+
+        Raises:
+            AcrossException: where the contract would revert.
+        """
+        state = self.synced()
+        flooredUtilizedReserves = max(state.utilizedReserves, 0)
+        numerator = relayedAmount + state.pendingReserves + flooredUtilizedReserves
+        denominator = state.liquidReserves + flooredUtilizedReserves
+        if denominator == 0:
+            return fixedPointAdjustment
+        if numerator * fixedPointAdjustment > UINT256_MAX or denominator > UINT256_MAX:
+            raise AcrossException("execution reverted: utilization overflows uint256")
+        return numerator * fixedPointAdjustment // denominator
+
+    def liquidity_utilization_current(self) -> int:
+        return self.liquidity_utilization_post_relay(0)
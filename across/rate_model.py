@@ -1,6 +1,18 @@
 import json
+from bisect import bisect_right
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple, Union
 from .constants import RateModel, expectedRateModelKeys
 from .exceptions import AcrossException
+from .utils import fixedPointAdjustment
+
+__all__ = [
+    "parse_and_return_rate_model_from_string",
+    "CompiledRateModel",
+    "compile_rate_model",
+    "parse_compiled_rate_model",
+    "RateModelHistory",
+]
 
 
 def parse_and_return_rate_model_from_string(rate_model_string: str) -> RateModel:
@@ -39,3 +51,254 @@ def parse_and_return_rate_model_from_string(rate_model_string: str) -> RateModel
         "R1": int(rateModelFromEvent["R1"]),
         "R2": int(rateModelFromEvent["R2"]),
     }
+
+
+class CompiledRateModel:
+    """An immutable, hashable rate model with its per model constants computed once.
+
+    The `fee_calculator` functions accept it wherever they take a `RateModel` and return the same
+    integers, but skip the dict lookups and recomputed constants: the area under the rate curve up to
+    the kink is stored, so a utilization past the kink only integrates the second segment. Integer
+    slopes keep their numerator and denominator, since the results floor `u * R1 // UBar` and not
+    `u * (R1 / UBar)`. Indexing by the `RateModel` keys works like on the dict, so code reading
+    `rate_model["UBar"]` takes either.
+
+    Build it with `compile_rate_model` to share one instance per distinct model.
+
+    Args:
+        rate_model (Mapping[str, int]): rate model with the `expectedRateModelKeys`.
+
+    Raises:
+        AcrossException: UBar is not strictly between 0 and 1e18, where the rate curve is undefined.
+    """
+
+    __slots__ = (
+        "UBar",
+        "R0",
+        "R1",
+        "R2",
+        "R0_plus_R1",
+        "one_minus_UBar",
+        "kink_area",
+        "slope_before_kink",
+        "slope_after_kink",
+        "_hash",
+    )
+
+    def __init__(self, rate_model: Mapping[str, int]) -> None:
+        UBar, R0, R1, R2 = (int(rate_model[key]) for key in expectedRateModelKeys)
+        if not 0 < UBar < fixedPointAdjustment:
+            raise AcrossException(f"Rate model UBar {UBar} must be between 0 and {fixedPointAdjustment}")
+        F = float(fixedPointAdjustment)
+        values = {
+            "UBar": UBar,
+            "R0": R0,
+            "R1": R1,
+            "R2": R2,
+            "R0_plus_R1": R0 + R1,
+            "one_minus_UBar": fixedPointAdjustment - UBar,
+            # calculate_area_under_rate_curve(UBar): the rate rises by R1 over [0, UBar].
+            "kink_area": UBar * R0 // fixedPointAdjustment
+            + fixedPointAdjustment // 2 * R1 * UBar // fixedPointAdjustment // fixedPointAdjustment,
+            # Rate per unit of utilization on each segment, for the float approximations.
+            "slope_before_kink": (R1 / F) / (UBar / F),
+            "slope_after_kink": (R2 / F) / (1.0 - UBar / F),
+            "_hash": hash((UBar, R0, R1, R2)),
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("CompiledRateModel is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("CompiledRateModel is immutable")
+
+    def __reduce__(self):
+        return (compile_rate_model, (self.to_dict(),))
+
+    def __getitem__(self, key: str) -> int:
+        if key not in expectedRateModelKeys:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def keys(self) -> List[str]:
+        return list(expectedRateModelKeys)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(expectedRateModelKeys)
+
+    def __len__(self) -> int:
+        return len(expectedRateModelKeys)
+
+    def to_dict(self) -> RateModel:
+        return {"UBar": self.UBar, "R0": self.R0, "R1": self.R1, "R2": self.R2}
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, CompiledRateModel):
+            return (self.UBar, self.R0, self.R1, self.R2) == (other.UBar, other.R0, other.R1, other.R2)
+        if isinstance(other, Mapping):
+            return self.to_dict() == dict(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"CompiledRateModel(UBar={self.UBar}, R0={self.R0}, R1={self.R1}, R2={self.R2})"
+
+    def instantaneous_rate(self, utilization: int) -> int:
+        """`fee_calculator.calculate_instantaneous_rate` for this model."""
+        if utilization <= self.UBar:
+            return self.R0 + utilization * self.R1 // self.UBar
+        return self.R0_plus_R1 + (utilization - self.UBar) * self.R2 // self.one_minus_UBar
+
+    def area_under_rate_curve(self, utilization: int) -> int:
+        """`fee_calculator.calculate_area_under_rate_curve` for this model."""
+        if utilization <= self.UBar:
+            return (
+                utilization * self.R0 // fixedPointAdjustment
+                + fixedPointAdjustment // 2 * (utilization * self.R1 // self.UBar) * utilization
+                // fixedPointAdjustment
+                // fixedPointAdjustment
+            )
+        after_kink = utilization - self.UBar
+        return (
+            self.kink_area
+            + after_kink * self.R0_plus_R1 // fixedPointAdjustment
+            + fixedPointAdjustment // 2 * (after_kink * self.R2 // self.one_minus_UBar) * after_kink
+            // fixedPointAdjustment
+            // fixedPointAdjustment
+        )
+
+
+@lru_cache(maxsize=1024)
+def _compile(UBar: int, R0: int, R1: int, R2: int) -> CompiledRateModel:
+    return CompiledRateModel({"UBar": UBar, "R0": R0, "R1": R1, "R2": R2})
+
+
+def compile_rate_model(rate_model: Union[Mapping[str, int], CompiledRateModel]) -> CompiledRateModel:
+    """Returns the shared `CompiledRateModel` of a rate model, e.g. one of `constants.RATE_MODELS`."""
+    if isinstance(rate_model, CompiledRateModel):
+        return rate_model
+    return _compile(*(int(rate_model[key]) for key in expectedRateModelKeys))
+
+
+@lru_cache(maxsize=1024)
+def parse_compiled_rate_model(rate_model_string: str) -> CompiledRateModel:
+    """`parse_and_return_rate_model_from_string` returning a `CompiledRateModel`, memoized by string.
+
+    Raises:
+        AcrossException: the string is not a valid rate model.
+    """
+    return compile_rate_model(parse_and_return_rate_model_from_string(rate_model_string))
+
+
+class RateModelHistory:
+    """An index of rate model updates per L1 token, queried by block number.
+
+    Each token keeps its updates sorted by block so `get` is a binary search. The index is
+    filled from the store's `UpdatedRateModel` events by `backfill`, and blocks up to
+    `synced_block` are answered from those events only. Later blocks are answered by a `seed`,
+    e.g. `constants.RATE_MODELS`, that is newer than the token's last indexed update. Otherwise
+    `get` returns None, so callers fall back to reading the store.
+    """
+
+    def __init__(self) -> None:
+        self._blocks: Dict[str, List[int]] = {}
+        self._rate_models: Dict[str, List[Optional[Union[RateModel, CompiledRateModel]]]] = {}
+        self._seeds: Dict[str, Tuple[int, Optional[Union[RateModel, CompiledRateModel]]]] = {}
+        self.synced_block = -1
+
+    def add(
+        self, l1_token: str, block_number: int, rate_model: Union[RateModel, CompiledRateModel, str]
+    ) -> None:
+        """Records that `l1_token` uses `rate_model` from `block_number` on.
+
+        Models are stored compiled, see `CompiledRateModel`. An unparseable model string is recorded
+        as a gap, so `get` returns None for the blocks it covers and callers read (and fail on) the
+        store like they would without the index.
+        """
+        rate_model = self._compile(rate_model)
+        key = l1_token.lower()
+        blocks = self._blocks.setdefault(key, [])
+        rate_models = self._rate_models.setdefault(key, [])
+        index = bisect_right(blocks, block_number)
+        if index > 0 and blocks[index - 1] == block_number:
+            # Later updates in the same block win.
+            rate_models[index - 1] = rate_model
+        else:
+            blocks.insert(index, block_number)
+            rate_models.insert(index, rate_model)
+
+    @staticmethod
+    def _compile(
+        rate_model: Union[RateModel, CompiledRateModel, str, None]
+    ) -> Optional[Union[RateModel, CompiledRateModel]]:
+        if isinstance(rate_model, str):
+            try:
+                return parse_compiled_rate_model(rate_model)
+            except (AcrossException, ValueError, TypeError):
+                return None
+        if rate_model is not None:
+            try:
+                return compile_rate_model(rate_model)
+            except AcrossException:
+                pass  # Kept as given, quotes fail on it as they would on the store's model.
+        return rate_model
+
+    def seed(self, rate_models: Dict[str, RateModel], from_block: int) -> None:
+        """Adds known rate models, e.g. `constants.RATE_MODELS`, as in effect from `from_block` on.
+
+        A seed answers for blocks from `from_block` on that `backfill` has not indexed yet, until an
+        indexed update is newer than it. It never answers for indexed blocks, so blocks before a
+        token's first update still read the store. Seeding a token again replaces its seed.
+
+        Args:
+            rate_models (Dict[str, RateModel]): rate models by L1 token address.
+            from_block (int): first block the models are known to be in effect at.
+        """
+        for l1_token, rate_model in rate_models.items():
+            self._seeds[l1_token.lower()] = (from_block, self._compile(rate_model))
+
+    def get(self, l1_token: str, block_number: int) -> Optional[Union[RateModel, CompiledRateModel]]:
+        """Returns the rate model of `l1_token` at `block_number`, or None if the index does not cover it."""
+        key = l1_token.lower()
+        blocks = self._blocks.get(key, [])
+        if block_number > self.synced_block:
+            seed = self._seeds.get(key)
+            if seed is None or seed[0] > block_number or (blocks and blocks[-1] >= seed[0]):
+                return None
+            return seed[1]
+        index = bisect_right(blocks, block_number)
+        if index == 0:
+            return None
+        return self._rate_models[key][index - 1]
+
+    def backfill(
+        self, rate_model_store, to_block: int, chunk_size: int = 100_000
+    ) -> int:
+        """Indexes `UpdatedRateModel` events of `rate_model_store` up to `to_block`.
+
+        Args:
+            rate_model_store (Contract): rate model store contract, see `clients.RateModelStore`.
+            to_block (int): last block to index.
+            chunk_size (int, optional): blocks per `eth_getLogs` request. Defaults to 100_000.
+
+        Returns:
+            int: number of updates indexed.
+        """
+        assert chunk_size > 0, "chunk_size must be greater than 0"
+        count = 0
+        from_block = self.synced_block + 1
+        while from_block <= to_block:
+            chunk_end = min(from_block + chunk_size - 1, to_block)
+            events = rate_model_store.events.UpdatedRateModel.get_logs(
+                fromBlock=from_block, toBlock=chunk_end
+            )
+            for event in events:
+                self.add(event.args.l1Token, event.blockNumber, event.args.rateModel)
+                count += 1
+            self.synced_block = chunk_end
+            from_block = chunk_end + 1
+        return count
@@ -0,0 +1,125 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+__all__ = ["ContractReadCache", "MISSING"]
+
+# (chain id, contract address, function name, args, block number)
+ReadKey = Tuple[int, str, str, Tuple[Any, ...], int]
+
+MISSING = object()
+
+
+class ContractReadCache:
+    """Memoizes read-only contract calls made at a block.
+
+    A read at a fixed block never changes once the block is final, so reads at blocks at least
+    `confirmations` behind the latest block are kept until evicted, while reads at recent blocks (and
+    other values that follow the chain head, such as the latest block) expire after `ttl` seconds.
+    At most `maxsize` entries are kept in memory, evicting the least recently used.
+
+    With `path`, final reads are also written to a SQLite database there, so they survive restarts and
+    are shared by every process that opens it. Values must be JSON serializable.
+
+    Example:
+        >>> cache = ContractReadCache(path="/var/cache/across/reads.sqlite")
+        >>> calculator = LpFeeCalculator(provider, read_cache=cache)
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 65_536,
+        ttl: float = 12.0,
+        confirmations: int = 64,
+        path: Optional[str] = None,
+    ) -> None:
+        assert maxsize > 0, "maxsize must be greater than 0"
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.confirmations = confirmations
+        # key -> (expires at or None when permanent, value)
+        self._entries: "OrderedDict[Hashable, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS reads (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __enter__(self) -> "ContractReadCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def get(self, key: Hashable) -> Any:
+        """Returns the cached value for `key`, or `MISSING`."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] is None or entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                del self._entries[key]
+            if self._db is None:
+                return MISSING
+            row = self._db.execute("SELECT value FROM reads WHERE key = ?", (_db_key(key),)).fetchone()
+            if row is None:
+                return MISSING
+            value = json.loads(row[0])
+            self._put(key, None, value)
+            return value
+
+    def set(self, key: Hashable, value: Any, permanent: bool) -> None:
+        """Caches `value`, until evicted if `permanent`, otherwise for `ttl` seconds."""
+        with self._lock:
+            if not permanent:
+                if self.ttl > 0:
+                    self._put(key, time.monotonic() + self.ttl, value)
+                return
+            self._put(key, None, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO reads (key, value) VALUES (?, ?)",
+                    (_db_key(key), json.dumps(value)),
+                )
+
+    def clear(self) -> None:
+        """Drops the entries held in memory. Entries on disk are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def drop_blocks(self, from_block: int) -> None:
+        """Drops the expiring reads made at `from_block` or later, after a reorg replaced those blocks."""
+        with self._lock:
+            replaced = [
+                key
+                for key, (expires_at, _) in self._entries.items()
+                if expires_at is not None
+                and isinstance(key, tuple)
+                and isinstance(key[-1], int)
+                and key[-1] >= from_block
+            ]
+            for key in replaced:
+                del self._entries[key]
+
+    def _put(self, key: Hashable, expires_at: Optional[float], value: Any) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+def _db_key(key: Hashable) -> str:
+    return json.dumps(key, separators=(",", ":"))
@@ -0,0 +1,211 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import Counter
+from typing import Any, Dict, List, Tuple, Union
+from web3.providers import BaseProvider
+from .exceptions import AcrossException
+
+__all__ = ["RecordingProvider", "ReplayProvider"]
+
+_MAGIC = b"ACRRPCv1"
+# Per record: key length, body length and the seconds the provider took to answer.
+_RECORD = struct.Struct("=IId")
+# Written after the index by `RecordingProvider.close`: where the index starts, and a marker.
+_TRAILER = struct.Struct("=Q8s")
+_INDEX_MARKER = b"ACRRPCIX"
+
+# Offset of a record's body, its length and the recorded seconds.
+RecordRef = Tuple[int, int, float]
+
+
+def _json_default(value: Any) -> Any:
+    # web3 may pass `HexBytes` and `AttributeDict` params, encode them as they go over the wire.
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    if hasattr(value, "items"):
+        return dict(value.items())
+    raise TypeError(f"Cannot record a {type(value).__name__}")
+
+
+def request_key(method: str, params: Any) -> str:
+    """The canonical form of a request that recordings are indexed by."""
+    return json.dumps([method, params], sort_keys=True, separators=(",", ":"), default=_json_default)
+
+
+class RecordingProvider(BaseProvider):
+    """Wraps a provider to record every JSON-RPC request and response sent through it to `path`.
+
+    Pass it wherever a provider goes, e.g. `LpFeeCalculator(RecordingProvider(provider, "quotes.rpc"))`, and
+    `close` it when the workload is done. `ReplayProvider` then answers the same requests offline.
+
+    The file holds the magic, then one record per request: a header, the canonical request and the
+    zlib-compressed response. `close` appends an index of the records by request, so a replay loads
+    without reading the responses. A recording that was not closed is still readable, its index is
+    rebuilt by scanning the records. Transport errors are raised and not recorded. Error responses
+    are recorded like any other response.
+    """
+
+    def __init__(self, provider: BaseProvider, path: str) -> None:
+        self.provider = provider
+        self.path = os.fspath(path)
+        self._file = open(self.path, "wb")
+        self._file.write(_MAGIC)
+        self._index: Dict[str, List[RecordRef]] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "RecordingProvider":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def middlewares(self):
+        return self.provider.middlewares
+
+    @middlewares.setter
+    def middlewares(self, values) -> None:
+        self.provider.middlewares = values
+
+    def is_connected(self) -> bool:
+        return self.provider.is_connected()
+
+    def isConnected(self) -> bool:
+        return self.provider.is_connected()
+
+    def make_request(self, method, params) -> Any:
+        start = time.perf_counter()
+        response = self.provider.make_request(method, params)
+        seconds = time.perf_counter() - start
+        key = request_key(method, params).encode()
+        body = zlib.compress(json.dumps(response, separators=(",", ":"), default=_json_default).encode())
+        with self._lock:
+            if self._file is None:
+                raise AcrossException(f"Recording {self.path} is closed")
+            offset = self._file.tell() + _RECORD.size + len(key)
+            self._file.write(_RECORD.pack(len(key), len(body), seconds) + key + body)
+            self._index.setdefault(key.decode(), []).append((offset, len(body), seconds))
+        return response
+
+    def close(self) -> None:
+        """Writes the index and closes the file."""
+        with self._lock:
+            if self._file is None:
+                return
+            index_offset = self._file.tell()
+            self._file.write(zlib.compress(json.dumps(self._index, separators=(",", ":")).encode()))
+            self._file.write(_TRAILER.pack(index_offset, _INDEX_MARKER))
+            self._file.close()
+            self._file = None
+
+
+class ReplayProvider(BaseProvider):
+    """A provider answering requests from a `RecordingProvider` recording, without a network.
+
+    Each request gets the response recorded for it. A request recorded several times, e.g. for the
+    latest block, gets its responses in the recorded order and then keeps the last one, so replaying
+    the recorded workload gives exactly the recorded results. Responses are decompressed on first use.
+
+    `calls` counts the requests by method and `seconds` adds up the injected latency, so a replay shows
+    how a change to the quote path affects RPC count and time spent waiting on the node.
+
+    Args:
+        path (str): recording to replay.
+        latency (Union[float, str], optional): seconds to wait before each response, or "recorded" to wait as
+            long as the recorded provider took. Defaults to 0.
+
+    Raises:
+        AcrossException: the file is not a recording.
+    """
+
+    def __init__(self, path: str, latency: Union[float, str] = 0.0) -> None:
+        assert latency == "recorded" or float(latency) >= 0, "latency must be a number of seconds or 'recorded'"
+        self.path = os.fspath(path)
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.seconds = 0.0
+        self._positions: Counter = Counter()
+        self._responses: Dict[Tuple[str, int], Any] = {}
+        self._lock = threading.Lock()
+        with open(self.path, "rb") as recording:
+            self._mmap = mmap.mmap(recording.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[: len(_MAGIC)] != _MAGIC:
+            raise AcrossException(f"{self.path} is not a JSON-RPC recording")
+        self._index = self._read_index()
+
+    def _read_index(self) -> Dict[str, List[RecordRef]]:
+        data = self._mmap
+        if len(data) >= len(_MAGIC) + _TRAILER.size:
+            index_offset, marker = _TRAILER.unpack_from(data, len(data) - _TRAILER.size)
+            if marker == _INDEX_MARKER:
+                index = json.loads(zlib.decompress(data[index_offset : len(data) - _TRAILER.size]))
+                return {key: [tuple(ref) for ref in refs] for key, refs in index.items()}
+        # Not closed: rebuild the index from the complete records.
+        index: Dict[str, List[RecordRef]] = {}
+        offset = len(_MAGIC)
+        while offset + _RECORD.size <= len(data):
+            key_length, body_length, seconds = _RECORD.unpack_from(data, offset)
+            body_offset = offset + _RECORD.size + key_length
+            if body_offset + body_length > len(data):
+                break
+            key = data[offset + _RECORD.size : body_offset].decode()
+            index.setdefault(key, []).append((body_offset, body_length, seconds))
+            offset = body_offset + body_length
+        return index
+
+    def __len__(self) -> int:
+        return sum(len(refs) for refs in self._index.values())
+
+    def __enter__(self) -> "ReplayProvider":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    @property
+    def rpc_count(self) -> int:
+        return sum(self.calls.values())
+
+    def is_connected(self) -> bool:
+        return True
+
+    def isConnected(self) -> bool:
+        return True
+
+    def make_request(self, method, params) -> Any:
+        key = request_key(method, params)
+        with self._lock:
+            self.calls[method] += 1
+            refs = self._index.get(key)
+            if refs is None:
+                self.misses[method] += 1
+                raise AcrossException(f"No recorded response for {method} {key}")
+            position = min(self._positions[key], len(refs) - 1)
+            self._positions[key] += 1
+            offset, length, seconds = refs[position]
+            response = self._responses.get((key, position))
+            if response is None:
+                response = self._responses[key, position] = zlib.decompress(self._mmap[offset : offset + length])
+            delay = seconds if self.latency == "recorded" else float(self.latency)
+            self.seconds += delay
+        if delay > 0:
+            time.sleep(delay)
+        # A fresh object every time, callers may change it.
+        return json.loads(response)
+
+    def reset(self) -> None:
+        """Starts the replay over, from the first recorded response of every request."""
+        with self._lock:
+            self.calls.clear()
+            self.misses.clear()
+            self._positions.clear()
+            self.seconds = 0.0
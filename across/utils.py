@@ -1,7 +1,40 @@
+from decimal import Decimal, localcontext
 from typing import Union, Iterable, Any, Optional
-from web3 import Web3
 
-toBNWei = lambda x: Web3.toWei(x, "ether")
+__all__ = ["toBNWei", "fixedPointAdjustment", "BigNumberish", "sorted_index_by"]
+
+UINT256_MAX = 2**256 - 1
+
+
+def toBNWei(number: Union[int, float, str, Decimal]) -> int:
+    """Scales a decimal amount by 1e18 with the same rounding as `Web3.toWei(number, "ether")`, without web3."""
+    if isinstance(number, (int, str)) and not isinstance(number, bool):
+        d_number = Decimal(number)
+    elif isinstance(number, float):
+        d_number = Decimal(str(number))
+    elif isinstance(number, Decimal):
+        d_number = number
+    else:
+        raise TypeError("Unsupported type. Must be one of integer, float, or string")
+
+    s_number = str(number)
+    unit_value = Decimal(10**18)
+    if d_number == Decimal(0):
+        return 0
+    if d_number < 1 and "." in s_number:
+        with localcontext() as ctx:
+            multiplier = len(s_number) - s_number.index(".") - 1
+            ctx.prec = multiplier
+            d_number = Decimal(number, context=ctx) * 10**multiplier
+        unit_value /= 10**multiplier
+    with localcontext() as ctx:
+        ctx.prec = 999
+        result_value = Decimal(d_number, context=ctx) * unit_value
+    if result_value < 0 or result_value > UINT256_MAX:
+        raise ValueError("Resulting wei value must be between 1 and 2**256 - 1")
+    return int(result_value)
+
+
 fixedPointAdjustment = toBNWei("1")
 BigNumberish = Union[int, str]
 
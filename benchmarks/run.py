@@ -0,0 +1,360 @@
+"""Offline benchmarks for the quote path.
+
+Run from the repository root:
+
+    python -m benchmarks.run                          # print results
+    python -m benchmarks.run --save baseline.json     # save them as a baseline
+    python -m benchmarks.run --compare baseline.json  # compare against a saved baseline
+
+Every benchmark reports operations per second, JSON-RPC requests per operation (for the ones that talk to the
+in-process mock chain) and the peak memory allocated while running a fixed number of operations.
+"""
+import argparse
+import json
+import random
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from web3.datastructures import AttributeDict
+
+from across.block_finder import BlockFinder
+from across.constants import RATE_MODELS
+from across.fee_calculator import (
+    calculate_apy_from_utilization,
+    calculate_area_under_rate_curve,
+    calculate_realized_lp_fee_pct,
+    calculate_realized_lp_fee_pcts,
+    convert_apy_to_weekly_fee,
+)
+from across.lp_fee_calculator import LpFeeCalculator, LpFeeRequest
+from across.rate_model import compile_rate_model
+from across.read_cache import ContractReadCache
+from across.utils import sorted_index_by
+from tests.mock_chain import MockChain, MockProvider, WETH, WETH_POOL
+
+# An operation to time, and the provider whose requests it makes (if any).
+Setup = Callable[[], Tuple[Callable[[], None], Optional[MockProvider]]]
+
+
+class Benchmark(NamedTuple):
+    name: str
+    setup: Setup
+    # Operations run while tracing memory. Kept fixed so peaks compare between runs.
+    memory_ops: int = 200
+
+
+class Result(NamedTuple):
+    ops_per_sec: float
+    rpc_per_op: float
+    peak_kib: float
+
+
+ROOT = Path(__file__).parent.parent
+RATE_MODEL = RATE_MODELS[WETH]
+COMPILED_RATE_MODEL = compile_rate_model(RATE_MODEL)
+CHAIN = MockChain(length=200_000, seed=9)
+# Block times that change every 20k blocks, where plain interpolation converges slowly.
+UNEVEN_CHAIN = MockChain(length=200_000, seed=9, regimes=(13.5, 1, 120, 2))
+
+
+def _cycle(values: list) -> Callable[[], object]:
+    index = [0]
+
+    def next_value():
+        index[0] = (index[0] + 1) % len(values)
+        return values[index[0]]
+
+    return next_value
+
+
+def _utilization_pairs(count: int = 1000) -> List[Tuple[int, int]]:
+    rng = random.Random(0)
+    pairs = []
+    for _ in range(count):
+        before = rng.randint(0, 9 * 10**17)
+        pairs.append((before, before + rng.randint(10**12, 10**17)))
+    return pairs
+
+
+def bench_area_under_rate_curve(rate_model=RATE_MODEL):
+    next_pair = _cycle(_utilization_pairs())
+    return lambda: calculate_area_under_rate_curve(rate_model, next_pair()[1]), None
+
+
+def bench_area_under_rate_curve_compiled():
+    return bench_area_under_rate_curve(COMPILED_RATE_MODEL)
+
+
+def bench_apy_from_utilization():
+    next_pair = _cycle(_utilization_pairs())
+    return lambda: calculate_apy_from_utilization(RATE_MODEL, *next_pair()), None
+
+
+def bench_apy_to_weekly_fee():
+    next_apy = _cycle([random.Random(1).randint(10**14, 10**18) for _ in range(1000)])
+    return lambda: convert_apy_to_weekly_fee(next_apy()), None
+
+
+def bench_realized_lp_fee_pct(rate_model=RATE_MODEL):
+    next_pair = _cycle(_utilization_pairs())
+    return lambda: calculate_realized_lp_fee_pct(rate_model, *next_pair()), None
+
+
+def bench_realized_lp_fee_pct_compiled():
+    return bench_realized_lp_fee_pct(COMPILED_RATE_MODEL)
+
+
+def bench_realized_lp_fee_pcts_1000():
+    pairs = _utilization_pairs()
+    return lambda: calculate_realized_lp_fee_pcts(RATE_MODEL, pairs), None
+
+
+def bench_sorted_index_by():
+    blocks = [AttributeDict({"number": n, "timestamp": t}) for n, t in enumerate(CHAIN.timestamps[:10_000])]
+    next_timestamp = _cycle(random.Random(2).sample(CHAIN.timestamps[:10_000], 1000))
+    return lambda: sorted_index_by(blocks, next_timestamp(), "timestamp"), None
+
+
+def _fake_request_block(provider: MockProvider, latency: float = 0.0):
+    # Answers like `w3.eth.get_block` from the mock chain, after `latency` seconds, and counts requests like a
+    # provider would.
+    chain = provider.chain
+    lock = threading.Lock()
+
+    def request_block(block_identifier):
+        with lock:
+            provider.calls["eth_getBlockByNumber"] += 1
+        if latency:
+            time.sleep(latency)
+        number = chain.latest if block_identifier == "latest" else block_identifier
+        return AttributeDict({"number": number, "timestamp": chain.timestamps[number]})
+
+    return request_block
+
+
+def _historical_timestamps(count: int = 1000, chain: MockChain = CHAIN) -> List[int]:
+    rng = random.Random(3)
+    return [rng.randint(chain.timestamps[0], chain.timestamps[-1]) for _ in range(count)]
+
+
+def bench_block_finder_cold(chain: MockChain = CHAIN):
+    provider = MockProvider(chain)
+    next_timestamp = _cycle(_historical_timestamps(chain=chain))
+
+    def op():
+        BlockFinder(provider, _fake_request_block(provider)).get_block_for_timestamp(next_timestamp())
+
+    return op, provider
+
+
+def bench_block_finder_cold_uneven():
+    return bench_block_finder_cold(UNEVEN_CHAIN)
+
+
+def bench_block_finder_warm():
+    provider = MockProvider(CHAIN)
+    block_finder = BlockFinder(provider, _fake_request_block(provider))
+    next_timestamp = _cycle(_historical_timestamps())
+    return lambda: block_finder.get_block_for_timestamp(next_timestamp()), provider
+
+
+def _day_of_timestamps(count: int = 1000) -> List[int]:
+    # A day of deposits.
+    rng = random.Random(4)
+    start = CHAIN.timestamps[150_000]
+    return [rng.randint(start, start + 86_400) for _ in range(count)]
+
+
+def bench_block_finder_bulk_1000(latency: float = 0.0):
+    # 1000 timestamps resolved by a fresh finder in one call.
+    provider = MockProvider(CHAIN)
+    timestamps = _day_of_timestamps()
+
+    def op():
+        BlockFinder(provider, _fake_request_block(provider, latency)).get_blocks_for_timestamps(timestamps)
+
+    return op, provider
+
+
+def bench_block_finder_sequential_1000(latency: float = 0.0):
+    # The same timestamps looked up one after another on one shared finder, the baseline for the bulk lookup.
+    provider = MockProvider(CHAIN)
+    timestamps = _day_of_timestamps()
+
+    def op():
+        block_finder = BlockFinder(provider, _fake_request_block(provider, latency))
+        for timestamp in timestamps:
+            block_finder.get_block_for_timestamp(timestamp)
+
+    return op, provider
+
+
+def bench_block_finder_bulk_1000_latency():
+    return bench_block_finder_bulk_1000(latency=0.0005)
+
+
+def bench_block_finder_sequential_1000_latency():
+    return bench_block_finder_sequential_1000(latency=0.0005)
+
+
+def bench_get_lp_fee_pct_latest():
+    provider = MockProvider(CHAIN)
+    calculator = LpFeeCalculator(provider)
+    next_amount = _cycle([i * 10**17 for i in range(1, 1000)])
+    return lambda: calculator.get_lp_fee_pct(WETH, WETH_POOL, next_amount()), provider
+
+
+def bench_get_lp_fee_pct_latest_local():
+    provider = MockProvider(CHAIN)
+    calculator = LpFeeCalculator(provider, read_cache=ContractReadCache(), local_utilization=True)
+    next_amount = _cycle([i * 10**17 for i in range(1, 1000)])
+    return lambda: calculator.get_lp_fee_pct(WETH, WETH_POOL, next_amount()), provider
+
+
+def bench_get_lp_fee_pct_historical():
+    provider = MockProvider(CHAIN)
+    calculator = LpFeeCalculator(provider)
+    next_timestamp = _cycle(_historical_timestamps())
+    return lambda: calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18, next_timestamp()), provider
+
+
+def bench_get_lp_fee_pcts_100():
+    provider = MockProvider(CHAIN)
+    calculator = LpFeeCalculator(provider)
+    requests = [LpFeeRequest(WETH, WETH_POOL, i * 10**17) for i in range(1, 101)]
+    return lambda: calculator.get_lp_fee_pcts(requests), provider
+
+
+def _bench_import(statement: str):
+    # A fresh interpreter per operation, so ops/s is the inverse of the startup plus import time.
+    command = [sys.executable, "-c", statement]
+    return lambda: subprocess.run(command, cwd=ROOT, check=True), None
+
+
+def bench_import_across():
+    return _bench_import("import across")
+
+
+def bench_import_fee_calculator():
+    return _bench_import("from across import calculate_realized_lp_fee_pct")
+
+
+def bench_import_lp_fee_calculator():
+    return _bench_import("from across import LpFeeCalculator")
+
+
+BENCHMARKS = [
+    Benchmark("fee.area_under_rate_curve", bench_area_under_rate_curve),
+    Benchmark("fee.area_under_rate_curve[compiled]", bench_area_under_rate_curve_compiled),
+    Benchmark("fee.apy_from_utilization", bench_apy_from_utilization),
+    Benchmark("fee.apy_to_weekly_fee", bench_apy_to_weekly_fee),
+    Benchmark("fee.realized_lp_fee_pct", bench_realized_lp_fee_pct),
+    Benchmark("fee.realized_lp_fee_pct[compiled]", bench_realized_lp_fee_pct_compiled),
+    Benchmark("fee.realized_lp_fee_pcts[1000]", bench_realized_lp_fee_pcts_1000, 2),
+    Benchmark("utils.sorted_index_by", bench_sorted_index_by),
+    Benchmark("block_finder.cold_lookup", bench_block_finder_cold, 20),
+    Benchmark("block_finder.cold_lookup[uneven]", bench_block_finder_cold_uneven, 20),
+    Benchmark("block_finder.warm_lookup", bench_block_finder_warm),
+    Benchmark("block_finder.bulk_lookup[1000]", bench_block_finder_bulk_1000, 2),
+    Benchmark("block_finder.sequential_lookup[1000]", bench_block_finder_sequential_1000, 2),
+    Benchmark("block_finder.bulk_lookup[1000,0.5ms]", bench_block_finder_bulk_1000_latency, 1),
+    Benchmark("block_finder.sequential_lookup[1000,0.5ms]", bench_block_finder_sequential_1000_latency, 1),
+    Benchmark("lp_fee.get_lp_fee_pct[latest]", bench_get_lp_fee_pct_latest, 20),
+    Benchmark("lp_fee.get_lp_fee_pct[latest,local]", bench_get_lp_fee_pct_latest_local, 20),
+    Benchmark("lp_fee.get_lp_fee_pct[historical]", bench_get_lp_fee_pct_historical, 20),
+    Benchmark("lp_fee.get_lp_fee_pcts[100]", bench_get_lp_fee_pcts_100, 2),
+    Benchmark("import.across", bench_import_across, 1),
+    Benchmark("import.fee_calculator", bench_import_fee_calculator, 1),
+    Benchmark("import.lp_fee_calculator", bench_import_lp_fee_calculator, 1),
+]
+
+
+def run_benchmark(benchmark: Benchmark, min_time: float, rounds: int = 5) -> Result:
+    op, provider = benchmark.setup()
+    op()  # Warm up imports and lazily built state.
+
+    # Report the fastest of several rounds, which is the least disturbed by other work on the machine.
+    rpc_before = provider.rpc_count if provider else 0
+    total_ops = 0
+    ops_per_sec = 0.0
+    for _ in range(rounds):
+        ops = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < min_time / rounds:
+            op()
+            ops += 1
+            elapsed = time.perf_counter() - start
+        total_ops += ops
+        ops_per_sec = max(ops_per_sec, ops / elapsed)
+    rpc_per_op = (provider.rpc_count - rpc_before) / total_ops if provider else 0.0
+
+    op, provider = benchmark.setup()
+    op()
+    tracemalloc.start()
+    for _ in range(benchmark.memory_ops):
+        op()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return Result(ops_per_sec, rpc_per_op, peak / 1024)
+
+
+def compare(results: Dict[str, Result], baseline: Dict[str, Result], threshold: float) -> List[str]:
+    """Prints the change against `baseline` and returns the benchmarks that regressed by more than `threshold`."""
+    regressions = []
+    print(f"\n{'benchmark':<36}{'ops/s':>12}{'rpc/op':>10}{'peak KiB':>11}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<36}{'new':>12}")
+            continue
+        speed = result.ops_per_sec / base.ops_per_sec - 1
+        memory = (result.peak_kib - base.peak_kib) / max(base.peak_kib, 1.0)
+        rpc = result.rpc_per_op - base.rpc_per_op
+        print(f"{name:<36}{speed:>+11.1%}{rpc:>+10.2f}{memory:>+10.1%}")
+        # Small absolute changes in peak memory are allocator noise.
+        memory_regressed = memory > threshold and result.peak_kib - base.peak_kib > 64
+        if speed < -threshold or rpc > 0.01 or memory_regressed:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds to time each benchmark for")
+    parser.add_argument("--save", metavar="PATH", help="save results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare results against a JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change counted as a regression")
+    args = parser.parse_args(argv)
+    warnings.simplefilter("ignore", DeprecationWarning)
+
+    results = {}
+    print(f"{'benchmark':<36}{'ops/s':>12}{'rpc/op':>10}{'peak KiB':>11}")
+    for benchmark in BENCHMARKS:
+        if args.filter not in benchmark.name:
+            continue
+        result = results[benchmark.name] = run_benchmark(benchmark, args.min_time)
+        print(f"{benchmark.name:<36}{result.ops_per_sec:>12.1f}{result.rpc_per_op:>10.2f}{result.peak_kib:>11.1f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({name: result._asdict() for name, result in results.items()}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {name: Result(**values) for name, values in json.load(f).items()}
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nregressions: " + ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,319 @@
+"""A deterministic in-process chain used to exercise the RPC paths without a node."""
+import asyncio
+import json
+import random
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from web3 import Web3
+from web3.providers import BaseProvider
+from web3.providers.async_base import AsyncBaseProvider
+from web3._utils.abi import get_abi_output_types
+
+from across.clients import Multicall3
+from across.constants import RATE_MODELS
+
+ABI_DIR = Path(__file__).parent.parent / "across" / "abis"
+
+WETH = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+USDC = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+WETH_POOL = "0x7355Efc63Ae731f584380a9838292c7046c1e433"
+USDC_POOL = "0x256C8919CE1AB0e33974CF6AA9c71561Ef3017b6"
+RATE_MODEL_STORE = "0xd18fFeb5fdd1F2e122251eA7Bf357D8Af0B60B50"
+
+
+def _load_abi(name: str) -> list:
+    with open(ABI_DIR / name) as abi_file:
+        return json.load(abi_file)
+
+
+class MockChain:
+    """Blocks with jittered block times, bridge pools and a rate model store.
+
+    With `regimes`, the block time cycles through those values every `regime_length` blocks instead, for
+    chains whose block times are uneven.
+
+    Pool reserves change deterministically with the block number so quotes at different
+    blocks differ, and the rate model of every token is updated once at `rate_model_update_block`.
+    """
+
+    def __init__(
+        self,
+        length: int = 50_000,
+        genesis_timestamp: int = 1_600_000_000,
+        block_time: float = 13.5,
+        chain_id: int = 1,
+        seed: int = 0,
+        multicall_block: Optional[int] = 0,
+        rate_model_update_block: int = 1_000,
+        regimes: Sequence[float] = (),
+        regime_length: int = 20_000,
+    ) -> None:
+        rng = random.Random(seed)
+        self.chain_id = chain_id
+        self.timestamps = [genesis_timestamp]
+        for number in range(1, length):
+            if regimes:
+                block_time = regimes[number // regime_length % len(regimes)]
+            self.timestamps.append(
+                self.timestamps[-1] + max(1, round(rng.gauss(block_time, block_time / 3)))
+            )
+        self.block_time = block_time
+        # Blocks replaced by `reorg` get a new generation, which changes their hash.
+        self.generations: Dict[int, int] = {}
+        self.multicall_block = multicall_block
+        self.pools = {WETH_POOL: 1_000, USDC_POOL: 5_000_000}
+        self.l1_tokens = {WETH_POOL: WETH, USDC_POOL: USDC}
+        self.rate_model_updates: Dict[str, List[Tuple[int, str]]] = {}
+        for token in (WETH, USDC):
+            initial = dict(RATE_MODELS[token])
+            updated = dict(initial, R1=initial["R1"] * 2)
+            self.rate_model_updates[token] = [
+                (0, json.dumps({k: str(v) for k, v in initial.items()})),
+                (rate_model_update_block, json.dumps({k: str(v) for k, v in updated.items()})),
+            ]
+
+    @property
+    def latest(self) -> int:
+        return len(self.timestamps) - 1
+
+    def mine(self, count: int = 1) -> None:
+        for _ in range(count):
+            self.timestamps.append(self.timestamps[-1] + max(1, round(self.block_time)))
+
+    def reorg(self, depth: int, length: int) -> None:
+        """Replaces the last `depth` blocks with `length` new ones."""
+        fork = len(self.timestamps) - depth
+        del self.timestamps[fork:]
+        generation = max(self.generations.values(), default=0) + 1
+        for number in range(fork, fork + length):
+            self.generations[number] = generation
+        self.mine(length)
+
+    def block_hash(self, number: int) -> str:
+        return "0x" + number.to_bytes(28, "big").hex() + self.generations.get(number, 0).to_bytes(4, "big").hex()
+
+    def block(self, number: int) -> Dict[str, Any]:
+        return {
+            "number": number,
+            "timestamp": self.timestamps[number],
+            "hash": self.block_hash(number),
+            "parentHash": self.block_hash(max(number - 1, 0)),
+        }
+
+    def pool_reserves(self, pool: str, number: int) -> Tuple[int, int, int]:
+        """(liquidReserves, utilizedReserves, pendingReserves) of a pool at a block."""
+        scale = self.pools[pool] * 10**18
+        liquid = scale + (number % 97) * scale // 100
+        utilized = (number % 89) * scale // 100 - scale // 10
+        pending = (number % 13) * scale // 1000
+        return liquid, utilized, pending
+
+    def pool_bonds(self, pool: str, number: int) -> int:
+        return (number % 7) * self.pools[pool] * 10**18 // 1000
+
+    def l1_token_balance(self, pool: str, number: int) -> int:
+        # Sometimes above the booked reserves, as when a bridge transfer landed since the last sync().
+        scale = self.pools[pool] * 10**18
+        liquid, _, _ = self.pool_reserves(pool, number)
+        return self.pool_bonds(pool, number) + liquid + (number % 11 - 5) * scale // 100
+
+    def liquidity_utilization_post_relay(self, pool: str, amount: int, number: int) -> int:
+        # Mirrors BridgePool.sync() followed by BridgePool._liquidityUtilizationPostRelay.
+        liquid, utilized, pending = self.pool_reserves(pool, number)
+        balance = self.l1_token_balance(pool, number) - self.pool_bonds(pool, number)
+        if balance > liquid:
+            utilized -= balance - liquid
+            liquid = balance
+        floored_utilized = utilized if utilized > 0 else 0
+        numerator = amount + pending + floored_utilized
+        denominator = liquid + floored_utilized
+        if denominator == 0:
+            return 10**18
+        return numerator * 10**18 // denominator
+
+    def rate_model(self, token: str, number: int) -> str:
+        models = [m for block, m in self.rate_model_updates[token] if block <= number]
+        if not models:
+            raise ValueError("execution reverted")
+        return models[-1]
+
+
+class MockProvider(BaseProvider):
+    """A web3 provider answering JSON-RPC requests from a `MockChain`, counting calls per method."""
+
+    def __init__(self, chain: MockChain) -> None:
+        self.chain = chain
+        self.calls: Counter = Counter()
+        self._calls_lock = threading.Lock()
+        w3 = Web3()
+        self.contracts = {
+            "bridge_pool": w3.eth.contract(abi=_load_abi("bridge_pool_abi.json")),
+            "rate_model_store": w3.eth.contract(abi=_load_abi("rate_model_store_abi.json")),
+            "multicall": w3.eth.contract(abi=_load_abi("multicall3_abi.json")),
+            "erc20": w3.eth.contract(abi=_load_abi("erc20_abi.json")),
+        }
+        self.codec = w3.codec
+
+    def is_connected(self) -> bool:
+        return True
+
+    isConnected = is_connected
+
+    @property
+    def rpc_count(self) -> int:
+        return sum(self.calls.values())
+
+    def make_request(self, method, params):
+        # Block lookups send requests from several threads.
+        with self._calls_lock:
+            self.calls[method] += 1
+        handler = getattr(self, "_" + method, None)
+        if handler is None:
+            return {"jsonrpc": "2.0", "id": 1, "error": {"code": -32601, "message": f"{method} not supported"}}
+        try:
+            result = handler(*params)
+        except ValueError as e:
+            return {"jsonrpc": "2.0", "id": 1, "error": {"code": -32000, "message": str(e)}}
+        return {"jsonrpc": "2.0", "id": 1, "result": result}
+
+    def _block_number(self, tag) -> int:
+        if tag in ("latest", "pending", "safe", "finalized"):
+            return self.chain.latest
+        if tag == "earliest":
+            return 0
+        return int(tag, 16) if isinstance(tag, str) else int(tag)
+
+    def _eth_chainId(self):
+        return hex(self.chain.chain_id)
+
+    def _eth_blockNumber(self):
+        return hex(self.chain.latest)
+
+    def _eth_getBlockByNumber(self, tag, full_transactions=False):
+        number = self._block_number(tag)
+        if number > self.chain.latest:
+            return None
+        return {k: hex(v) if isinstance(v, int) else v for k, v in self.chain.block(number).items()}
+
+    def _eth_getCode(self, address, tag="latest"):
+        number = self._block_number(tag)
+        address = Web3.toChecksumAddress(address)
+        if address == Multicall3.ADDRESS:
+            deployed = self.chain.multicall_block is not None and number >= self.chain.multicall_block
+            return "0x00" if deployed else "0x"
+        return "0x00" if address in self.chain.pools or address == RATE_MODEL_STORE else "0x"
+
+    def _eth_getLogs(self, log_filter):
+        from_block = self._block_number(log_filter.get("fromBlock", "latest"))
+        to_block = self._block_number(log_filter.get("toBlock", "latest"))
+        addresses = log_filter.get("address") or []
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        if RATE_MODEL_STORE not in map(Web3.toChecksumAddress, addresses):
+            return []
+        topic = Web3.keccak(text="UpdatedRateModel(address,string)").hex()
+        logs = []
+        for token, updates in self.chain.rate_model_updates.items():
+            for number, rate_model in updates:
+                if not from_block <= number <= to_block:
+                    continue
+                logs.append(
+                    {
+                        "address": RATE_MODEL_STORE,
+                        "topics": [topic, "0x" + bytes.fromhex(token[2:]).rjust(32, b"\0").hex()],
+                        "data": "0x" + self.codec.encode_abi(["string"], [rate_model]).hex(),
+                        "blockNumber": hex(number),
+                        "blockHash": self.chain.block(number)["hash"],
+                        "transactionHash": "0x" + bytes(32).hex(),
+                        "transactionIndex": "0x0",
+                        "logIndex": hex(len(logs)),
+                        "removed": False,
+                    }
+                )
+        return sorted(logs, key=lambda log: int(log["blockNumber"], 16))
+
+    def _eth_call(self, transaction, tag="latest"):
+        number = self._block_number(tag)
+        return "0x" + self._execute(transaction["to"], bytes.fromhex(transaction["data"][2:]), number).hex()
+
+    def _execute(self, to: str, data: bytes, number: int) -> bytes:
+        to = Web3.toChecksumAddress(to)
+        if to == Multicall3.ADDRESS:
+            if self.chain.multicall_block is None or number < self.chain.multicall_block:
+                return b""  # Not deployed yet.
+            contract = self.contracts["multicall"]
+            fn, args = contract.decode_function_input(data)
+            results = []
+            for target, allow_failure, call_data in args["calls"]:
+                try:
+                    results.append((True, self._execute(target, call_data, number)))
+                except ValueError:
+                    if not allow_failure:
+                        raise
+                    results.append((False, b""))
+            return self._encode(fn, [results])
+        if to in self.chain.pools:
+            contract = self.contracts["bridge_pool"]
+            fn, args = contract.decode_function_input(data)
+            liquid, utilized, pending = self.chain.pool_reserves(to, number)
+            getters = {
+                "liquidReserves": liquid,
+                "utilizedReserves": utilized,
+                "pendingReserves": pending,
+                "bonds": self.chain.pool_bonds(to, number),
+                "l1Token": self.chain.l1_tokens[to],
+            }
+            if fn.fn_name in getters:
+                return self._encode(fn, [getters[fn.fn_name]])
+            if fn.fn_name == "liquidityUtilizationCurrent":
+                return self._encode(fn, [self.chain.liquidity_utilization_post_relay(to, 0, number)])
+            return self._encode(
+                fn, [self.chain.liquidity_utilization_post_relay(to, args["relayedAmount"], number)]
+            )
+        if to in self.chain.l1_tokens.values():
+            fn, args = self.contracts["erc20"].decode_function_input(data)
+            account = Web3.toChecksumAddress(args["account"])
+            balance = self.chain.l1_token_balance(account, number) if account in self.chain.pools else 0
+            return self._encode(fn, [balance])
+        if to == RATE_MODEL_STORE:
+            contract = self.contracts["rate_model_store"]
+            fn, args = contract.decode_function_input(data)
+            token = Web3.toChecksumAddress(next(iter(args.values())))
+            if token not in self.chain.rate_model_updates:
+                return self._encode(fn, [""])
+            return self._encode(fn, [self.chain.rate_model(token, number)])
+        return b""
+
+    def _encode(self, fn, values) -> bytes:
+        return self.codec.encode_abi(get_abi_output_types(fn.abi), values)
+
+
+class AsyncMockProvider(AsyncBaseProvider):
+    """An async web3 provider over a `MockChain`, recording how many requests were in flight at once."""
+
+    def __init__(self, chain: MockChain, latency: float = 0.001) -> None:
+        self.sync = MockProvider(chain)
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def calls(self) -> Counter:
+        return self.sync.calls
+
+    async def is_connected(self) -> bool:
+        return True
+
+    isConnected = is_connected
+
+    async def make_request(self, method, params):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            return self.sync.make_request(method, params)
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,100 @@
+"""A local stand-in for the Across API, served over HTTP from a background thread."""
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address) -> None:
+        pass  # Clients that time out close the connection before we answer.
+
+
+def fees_for(l2Token: str, chainId: int, amount: int) -> Dict[str, str]:
+    # Deterministic fees so tests can check which query a response belongs to.
+    return {
+        "slowFeePct": str(10**15 + amount % 1000),
+        "instantFeePct": str(2 * 10**15 + chainId),
+    }
+
+
+class StubAcrossAPI:
+    """Serves `/api/suggested-fees`.
+
+    `delay` slows every response down, `failures` makes the next requests answer 503 and tokens in
+    `bad_tokens` answer 400. Requests are recorded in `requests`, and `connections` counts the client
+    (host, port) pairs seen, so keep-alive reuse can be checked.
+    """
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.failures = 0
+        self.bad_tokens = set()
+        self.requests: List[Tuple[str, int, int]] = []
+        self.connections: Counter = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                stub._handle(self)
+
+        self.server = _Server(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/api"
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handle(self, handler: BaseHTTPRequestHandler) -> None:
+        url = urlparse(handler.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        with self._lock:
+            self.connections[handler.client_address] += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self.failures > 0
+            if fail:
+                self.failures -= 1
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+            if url.path != "/api/suggested-fees":
+                return self._respond(handler, 404, {"error": "not found"})
+            if fail:
+                return self._respond(handler, 503, {"error": "unavailable"})
+            l2Token, chainId, amount = query["l2Token"], int(query["chainId"]), int(query["amount"])
+            with self._lock:
+                self.requests.append((l2Token, chainId, amount))
+            if l2Token in self.bad_tokens:
+                return self._respond(handler, 400, {"error": "invalid input"})
+            self._respond(handler, 200, fees_for(l2Token, chainId, amount))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _respond(self, handler: BaseHTTPRequestHandler, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
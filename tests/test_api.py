@@ -0,0 +1,104 @@
+import threading
+import unittest
+from across.api import AcrossAPI, SuggestedFeesRequest, bucket_amount
+from across.exceptions import AcrossException
+from tests.stub_api import StubAcrossAPI, fees_for
+
+TOKEN = "0x7f5c764cbc14f9669b88837ca1490cca17c31607"
+
+
+class TestAcrossAPI(unittest.TestCase):
+    def setUp(self) -> None:
+        self.stub = StubAcrossAPI()
+        self.api = AcrossAPI(self.stub.url, backoff_factor=0)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.api.close()
+        self.stub.close()
+        return super().tearDown()
+
+    def test_suggested_fees(self):
+        self.assertEqual(self.api.suggested_fees(TOKEN, 10, 10**9), fees_for(TOKEN, 10, 10**9))
+        self.assertEqual(self.stub.requests, [(TOKEN, 10, 10**9)])
+
+    def test_responses_are_cached(self):
+        cached = AcrossAPI(self.stub.url, cache_ttl=10)
+        for _ in range(3):
+            cached.suggested_fees(TOKEN, 10, 10**9)
+        cached.suggested_fees(TOKEN, 10, 2 * 10**9)
+        cached.close()
+        self.assertEqual(len(self.stub.requests), 2)
+
+        # Not cached by default.
+        self.api.suggested_fees(TOKEN, 10, 10**9)
+        self.api.suggested_fees(TOKEN, 10, 10**9)
+        self.assertEqual(len(self.stub.requests), 4)
+
+    def test_amount_buckets_share_a_cache_entry(self):
+        self.assertEqual(bucket_amount(123_456_789, 3), 123_000_000)
+        self.assertEqual(bucket_amount(42, 3), 42)
+        api = AcrossAPI(self.stub.url, cache_ttl=10, amount_significant_digits=3)
+        api.suggested_fees(TOKEN, 10, 123_456_789)
+        api.suggested_fees(TOKEN, 10, 123_999_999)
+        api.close()
+        # The exact amount is queried, the bucket only keys the cache.
+        self.assertEqual(self.stub.requests, [(TOKEN, 10, 123_456_789)])
+
+    def test_connections_are_reused(self):
+        for amount in range(1, 6):
+            self.api.suggested_fees(TOKEN, 10, amount)
+        self.assertEqual(len(self.stub.connections), 1)
+
+    def test_identical_in_flight_queries_are_coalesced(self):
+        self.stub.delay = 0.2
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.api.suggested_fees(TOKEN, 10, 10**9)))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [fees_for(TOKEN, 10, 10**9)] * 10)
+        self.assertEqual(len(self.stub.requests), 1)
+
+    def test_retries_server_errors(self):
+        self.stub.failures = 2
+        self.assertEqual(self.api.suggested_fees(TOKEN, 10, 10**9), fees_for(TOKEN, 10, 10**9))
+
+        self.stub.failures = 10
+        with self.assertRaises(AcrossException):
+            self.api.suggested_fees(TOKEN, 10, 2 * 10**9)
+
+    def test_errors_are_not_cached(self):
+        self.stub.bad_tokens.add(TOKEN)
+        api = AcrossAPI(self.stub.url, backoff_factor=0, cache_ttl=10)
+        for _ in range(2):
+            with self.assertRaises(AcrossException):
+                api.suggested_fees(TOKEN, 10, 10**9)
+        api.close()
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_timeout(self):
+        self.stub.delay = 0.5
+        api = AcrossAPI(self.stub.url, timeout=0.05, retries=0)
+        with self.assertRaises(AcrossException):
+            api.suggested_fees(TOKEN, 10, 10**9)
+        api.close()
+
+    def test_suggested_fees_many(self):
+        self.stub.delay = 0.05
+        self.stub.bad_tokens.add("0x0")
+        queries = [SuggestedFeesRequest(TOKEN, 10, amount) for amount in range(1, 17)]
+        queries.append(SuggestedFeesRequest("0x0", 10, 1))
+        results = self.api.suggested_fees_many(queries)
+        self.assertEqual(results[:-1], [fees_for(*query) for query in queries[:-1]])
+        self.assertIsInstance(results[-1], AcrossException)
+        self.assertGreater(self.stub.max_in_flight, 1)
+        self.assertLessEqual(self.stub.max_in_flight, self.api.max_workers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import asyncio
+import unittest
+from across.api import SuggestedFeesRequest
+from across.async_api import AsyncAcrossAPI
+from across.exceptions import AcrossException
+from tests.stub_api import StubAcrossAPI, fees_for
+
+TOKEN = "0x7f5c764cbc14f9669b88837ca1490cca17c31607"
+
+
+class TestAsyncAcrossAPI(unittest.TestCase):
+    def setUp(self) -> None:
+        self.stub = StubAcrossAPI()
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.stub.close()
+        return super().tearDown()
+
+    def run_with_api(self, fn, **kwargs):
+        async def main():
+            async with AsyncAcrossAPI(self.stub.url, backoff_factor=0, **kwargs) as api:
+                return await fn(api)
+
+        return asyncio.run(main())
+
+    def test_suggested_fees_is_cached(self):
+        async def fn(api):
+            return [await api.suggested_fees(TOKEN, 10, 10**9) for _ in range(3)]
+
+        self.assertEqual(self.run_with_api(fn, cache_ttl=10), [fees_for(TOKEN, 10, 10**9)] * 3)
+        self.assertEqual(len(self.stub.requests), 1)
+        self.assertEqual(self.run_with_api(fn), [fees_for(TOKEN, 10, 10**9)] * 3)
+        self.assertEqual(len(self.stub.requests), 4)
+
+    def test_identical_in_flight_queries_are_merged(self):
+        self.stub.delay = 0.1
+
+        async def fn(api):
+            return await api.suggested_fees_many([SuggestedFeesRequest(TOKEN, 10, 10**9)] * 20)
+
+        self.assertEqual(self.run_with_api(fn, cache_ttl=0), [fees_for(TOKEN, 10, 10**9)] * 20)
+        self.assertEqual(len(self.stub.requests), 1)
+
+    def test_limits_requests_per_host(self):
+        self.stub.delay = 0.02
+        queries = [SuggestedFeesRequest(TOKEN, 10, amount) for amount in range(1, 41)]
+
+        async def fn(api):
+            return await api.suggested_fees_many(queries)
+
+        self.assertEqual(self.run_with_api(fn, limit_per_host=4), [fees_for(*query) for query in queries])
+        self.assertEqual(self.stub.max_in_flight, 4)
+
+    def test_retries_and_reports_errors(self):
+        self.stub.failures = 2
+        self.stub.bad_tokens.add("0x0")
+
+        async def fn(api):
+            return await api.suggested_fees_many(
+                [SuggestedFeesRequest(TOKEN, 10, 1), SuggestedFeesRequest("0x0", 10, 1)]
+            )
+
+        fees, error = self.run_with_api(fn)
+        self.assertEqual(fees, fees_for(TOKEN, 10, 1))
+        self.assertIsInstance(error, AcrossException)
+
+    def test_iter_suggested_fees_streams_as_completed(self):
+        queries = [SuggestedFeesRequest(TOKEN, 10, amount) for amount in range(1, 101)]
+
+        async def fn(api):
+            return [item async for item in api.iter_suggested_fees(queries)]
+
+        results = self.run_with_api(fn, limit_per_host=2)
+        self.assertEqual(sorted(index for index, _ in results), list(range(100)))
+        for index, fees in results:
+            self.assertEqual(fees, fees_for(*queries[index]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import asyncio
+import unittest
+from across.async_lp_fee_calculator import AsyncLpFeeCalculator
+from across.lp_fee_calculator import LpFeeCalculator, LpFeeRequest
+from tests.mock_chain import AsyncMockProvider, MockChain, MockProvider, WETH, USDC, WETH_POOL, USDC_POOL
+
+
+class TestAsyncLpFeeCalculator(unittest.TestCase):
+    def setUp(self) -> None:
+        self.chain = MockChain(length=20_000)
+        self.requests = [
+            LpFeeRequest(token, pool, (i % 7 + 1) * 10**18, self.chain.timestamps[i * 97 % self.chain.latest])
+            for i in range(50)
+            for token, pool in ((WETH, WETH_POOL), (USDC, USDC_POOL))
+        ]
+        return super().setUp()
+
+    def test_matches_sync_calculator(self):
+        calculator = LpFeeCalculator(MockProvider(self.chain))
+        expected = [calculator.get_lp_fee_pct(*request) for request in self.requests[:20]]
+        async_calculator = AsyncLpFeeCalculator(AsyncMockProvider(self.chain))
+        self.assertEqual(asyncio.run(async_calculator.get_lp_fee_pcts(self.requests[:20])), expected)
+        self.assertEqual(
+            asyncio.run(async_calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18)),
+            calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18),
+        )
+
+    def test_caps_in_flight_requests(self):
+        provider = AsyncMockProvider(self.chain)
+        calculator = AsyncLpFeeCalculator(provider, max_in_flight=4)
+        results = asyncio.run(calculator.get_lp_fee_pcts(self.requests))
+        self.assertTrue(all(isinstance(result, int) for result in results))
+        self.assertEqual(provider.max_in_flight, 4)
+
+    def test_merges_identical_in_flight_reads(self):
+        provider = AsyncMockProvider(self.chain)
+        calculator = AsyncLpFeeCalculator(provider)
+        results = asyncio.run(calculator.get_lp_fee_pcts([LpFeeRequest(WETH, WETH_POOL, 10**18)] * 50))
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(provider.calls["eth_call"], 3)
+        self.assertEqual(provider.calls["eth_getBlockByNumber"], 1)
+
+    def test_resolves_network_from_chain_id(self):
+        chain = MockChain(length=20_000, block_time=2.5, chain_id=137, seed=1)
+        provider = AsyncMockProvider(chain)
+        calculator = AsyncLpFeeCalculator(provider)
+        timestamp = chain.timestamps[5_000]
+        # Polygon has no rate model store, the quote fails after the block lookup.
+        result = asyncio.run(calculator.get_lp_fee_pcts([LpFeeRequest(WETH, WETH_POOL, 10**18, timestamp)]))[0]
+        self.assertIsInstance(result, Exception)
+        self.assertEqual(calculator.block_finder.network_id, 137)
+        self.assertEqual(provider.calls["eth_chainId"], 1)
+        self.assertEqual(asyncio.run(calculator.block_finder.get_block_for_timestamp(timestamp)).number, 5_000)
+
+    def test_reports_errors_per_item(self):
+        calculator = AsyncLpFeeCalculator(AsyncMockProvider(self.chain))
+        results = asyncio.run(
+            calculator.get_lp_fee_pcts([LpFeeRequest(WETH, WETH_POOL, 10**18), LpFeeRequest(WETH, WETH_POOL, 0)])
+        )
+        self.assertIsInstance(results[0], int)
+        self.assertIsInstance(results[1], Exception)
@@ -0,0 +1,105 @@
+import csv
+import functools
+import json
+import os
+import tempfile
+import unittest
+from across.backfill import Backfill, BackfillPool
+from across.exceptions import AcrossException
+from across.lp_fee_calculator import LpFeeCalculator
+from across.constants import RATE_MODELS
+from across.rate_model import RateModelHistory
+from tests.mock_chain import MockChain, MockProvider, WETH, USDC, WETH_POOL, USDC_POOL
+
+POOLS = [BackfillPool(WETH, WETH_POOL, (10**18, 100 * 10**18)), BackfillPool(USDC, USDC_POOL, (10**12,))]
+
+
+class TestBackfill(unittest.TestCase):
+    def setUp(self) -> None:
+        self.chain = MockChain(length=2_000)
+        self.provider = functools.partial(MockProvider, self.chain)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        return super().setUp()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory.name, name)
+
+    def backfill(self, **kwargs) -> Backfill:
+        kwargs = {"step": 7, "chunk_size": 4, "workers": 0, **kwargs}
+        return Backfill(self.provider, POOLS, 1_000, 1_100, **kwargs)
+
+    def read_jsonl(self, path: str) -> list:
+        with open(path) as f:
+            return sorted((json.loads(line) for line in f), key=lambda row: (row["block_number"], row["token_address"], row["amount"]))
+
+    def test_matches_calculator(self):
+        summary = self.backfill().run(self.path("fees.jsonl"))
+        self.assertEqual((summary.chunks, summary.completed, summary.remaining), (4, 4, 0))
+        rows = self.read_jsonl(self.path("fees.jsonl"))
+        self.assertEqual(len(rows), summary.rows)
+        self.assertEqual(len(rows), 15 * 3)
+        calculator = LpFeeCalculator(MockProvider(self.chain))
+        for row in rows[::4]:
+            self.assertEqual(row["timestamp"], self.chain.timestamps[row["block_number"]])
+            self.assertIsNone(row["error"])
+            self.assertEqual(
+                row["lp_fee_pct"],
+                calculator.get_lp_fee_pct(row["token_address"], row["bridge_pool_address"], row["amount"], row["timestamp"]),
+            )
+
+    def test_process_pool_matches_in_process(self):
+        self.backfill().run(self.path("inline.csv"))
+        self.backfill(workers=2).run(self.path("pool.csv"))
+        results = []
+        for name in ("inline.csv", "pool.csv"):
+            with open(self.path(name), newline="") as f:
+                reader = csv.reader(f)
+                self.assertEqual(next(reader)[0], "block_number")
+                results.append(sorted(reader))
+        self.assertEqual(results[0], results[1])
+
+    def test_resumes_from_checkpoint(self):
+        self.backfill().run(self.path("full.jsonl"))
+        output, checkpoint = self.path("fees.jsonl"), self.path("fees.checkpoint")
+
+        summary = self.backfill(workers=2).run(output, checkpoint=checkpoint, max_chunks=2)
+        self.assertEqual((summary.completed, summary.remaining), (2, 2))
+        # A run interrupted after writing part of a chunk, and part of its checkpoint line.
+        with open(output, "a") as f:
+            f.write('{"block_number": 1')
+        with open(checkpoint, "a") as f:
+            f.write('{"chunk": 3, "off')
+
+        summary = self.backfill().run(output, checkpoint=checkpoint)
+        self.assertEqual((summary.completed, summary.skipped, summary.remaining), (2, 2, 0))
+        self.assertEqual(self.read_jsonl(output), self.read_jsonl(self.path("full.jsonl")))
+        summary = self.backfill().run(output, checkpoint=checkpoint)
+        self.assertEqual((summary.completed, summary.skipped), (0, 4))
+        self.assertEqual(self.read_jsonl(output), self.read_jsonl(self.path("full.jsonl")))
+
+        with self.assertRaises(AcrossException):
+            self.backfill(step=8).run(output, checkpoint=checkpoint)
+        # Rows quoted with other calculator settings would be mixed into the same file.
+        with self.assertRaises(AcrossException):
+            self.backfill(local_utilization=True).run(output, checkpoint=checkpoint)
+        # Settings given their default, as the command line does, resume a default backfill.
+        summary = self.backfill(local_utilization=False, verify_utilization=0.0).run(output, checkpoint=checkpoint)
+        self.assertEqual((summary.completed, summary.skipped), (0, 4))
+        history = RateModelHistory()
+        history.add(WETH, 0, RATE_MODELS[WETH])
+        self.assertNotEqual(
+            self.backfill(rate_model_history=history)._fingerprint("jsonl"), self.backfill()._fingerprint("jsonl")
+        )
+
+    def test_reports_errors_per_row(self):
+        pools = [BackfillPool(WETH, WETH_POOL, (0, 10**18))]
+        Backfill(self.provider, pools, 1_000, 1_001, workers=0, with_timestamps=False).run(self.path("fees.jsonl"))
+        rows = self.read_jsonl(self.path("fees.jsonl"))
+        self.assertEqual([row["lp_fee_pct"] is None for row in rows], [True, False, True, False])
+        self.assertEqual(rows[0]["error"], "Amount must be greater than 0")
+        self.assertIsNone(rows[0]["timestamp"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,285 @@
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import unittest
+from bisect import bisect_right
+from web3 import Web3
+from across.block_finder import Block, BlockCache, BlockFinder, estimate_blocks_elapsed
+from across.block_index import BlockTimestampIndex
+from across.instrumentation import Stats
+from across.lp_fee_calculator import LpFeeCalculator, LpFeeRequest
+from tests.mock_chain import MockChain, MockProvider, WETH, WETH_POOL
+
+
+class TestBlockFinder(unittest.TestCase):
+    def setUp(self) -> None:
+        self.chain = MockChain(length=50_000)
+        rng = random.Random(1)
+        self.timestamps = [
+            rng.randint(self.chain.timestamps[0], self.chain.timestamps[-1] + 100) for _ in range(50)
+        ]
+        return super().setUp()
+
+    def expected_block(self, timestamp: int) -> int:
+        return bisect_right(self.chain.timestamps, timestamp) - 1
+
+    def make_block_finder(self, block_index=None, max_blocks=100_000):
+        provider = MockProvider(self.chain)
+        return BlockFinder(provider, Web3(provider).eth.get_block, block_index, max_blocks), provider
+
+    def test_get_block_for_timestamp(self):
+        block_finder, _ = self.make_block_finder()
+        for timestamp in self.timestamps:
+            block = block_finder.get_block_for_timestamp(timestamp)
+            self.assertEqual(block.number, self.expected_block(timestamp))
+            self.assertLessEqual(block.timestamp, timestamp)
+
+    def test_get_block_for_timestamp_with_small_cache(self):
+        block_finder, _ = self.make_block_finder(max_blocks=4)
+        for timestamp in self.timestamps:
+            block = block_finder.get_block_for_timestamp(timestamp)
+            self.assertEqual(block, Block(self.expected_block(timestamp), block.timestamp))
+            self.assertLessEqual(len(block_finder.blocks), 4)
+
+    def test_lookups_stay_logarithmic_with_uneven_block_times(self):
+        chain = MockChain(length=50_000, regimes=(13.5, 1, 120, 2), regime_length=5_000)
+        provider = MockProvider(chain)
+        rng = random.Random(4)
+        # Latest block, a galloping backward search and at most four probes per halving of the range.
+        bound = 2 + 2 * math.ceil(math.log2(chain.latest)) + 4 * math.ceil(math.log2(chain.latest))
+        for _ in range(100):
+            timestamp = rng.randint(chain.timestamps[0], chain.timestamps[-1])
+            block_finder = BlockFinder(provider, Web3(provider).eth.get_block)
+            before = provider.rpc_count
+            block = block_finder.get_block_for_timestamp(timestamp)
+            self.assertEqual(block.number, bisect_right(chain.timestamps, timestamp) - 1)
+            self.assertLessEqual(provider.rpc_count - before, bound)
+
+    def test_get_blocks_for_timestamps(self):
+        block_finder, _ = self.make_block_finder()
+        timestamps = self.timestamps + self.timestamps[:5] + [self.chain.timestamps[0] - 1]
+        blocks = block_finder.get_blocks_for_timestamps(timestamps, max_workers=4)
+        self.assertIsNone(blocks[-1])
+        for timestamp, block in zip(timestamps[:-1], blocks):
+            self.assertEqual(block.number, self.expected_block(timestamp))
+        self.assertEqual(block_finder.get_blocks_for_timestamps([]), [])
+
+    def test_get_blocks_for_timestamps_cost_tracks_distinct_blocks(self):
+        block_finder, provider = self.make_block_finder()
+        rng = random.Random(5)
+        start = self.chain.timestamps[30_000]
+        timestamps = [rng.randint(start, start + 86_400) for _ in range(2_000)]
+        blocks = block_finder.get_blocks_for_timestamps(timestamps)
+        answers = {self.expected_block(timestamp) for timestamp in timestamps}
+        self.assertEqual({block.number for block in blocks}, answers)
+        # Every answer and the block after it must be fetched, the search adds little on top of that.
+        needed = len(answers | {number + 1 for number in answers})
+        self.assertLessEqual(provider.rpc_count, needed * 1.05 + 20)
+
+    def test_average_block_time(self):
+        cache = BlockCache()
+        self.assertIsNone(cache.average_block_time())
+        cache.add(Block(100, 1_000))
+        cache.add(Block(200, 2_200))
+        self.assertEqual(cache.average_block_time(), 12.0)
+        self.assertEqual(estimate_blocks_elapsed(250), 18)
+        self.assertEqual(estimate_blocks_elapsed(250, networkId=137), 100)
+
+    def test_block_cache(self):
+        cache = BlockCache(max_size=3)
+        for number in (5, 1, 3, 3, 9):
+            cache.add(Block(number, number * 10))
+        self.assertEqual(list(cache.numbers), [1, 3, 9])  # 5 was cached first.
+        self.assertEqual(cache.get(3), Block(3, 30))
+        self.assertIsNone(cache.get(5))
+        self.assertEqual(cache.bracket(30), (Block(3, 30), Block(9, 90)))
+        self.assertEqual(cache.bracket(5), (None, Block(1, 10)))
+        self.assertEqual(cache.bracket(95), (Block(9, 90), None))
+
+    def test_block_cache_after_reorg(self):
+        cache = BlockCache(max_size=3)
+        for number in (1, 2, 3):
+            cache.add(Block(number, number * 10))
+        cache.drop_from(1)
+        # Replacement blocks are evicted in the order they were re-added.
+        for number in (3, 1, 2):
+            cache.add(Block(number, number * 10 + 1))
+        cache.add(Block(4, 41))
+        self.assertEqual(list(cache.numbers), [1, 2, 4])
+        self.assertEqual(len(cache._insertion_order), len(cache))
+
+    def test_warm_restart_from_block_index(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "blocks.idx")
+            with BlockTimestampIndex(path, compact_threshold=64) as block_index:
+                block_finder, _ = self.make_block_finder(block_index)
+                for timestamp in self.timestamps:
+                    block_finder.get_block_for_timestamp(timestamp)
+                self.assertGreater(len(block_index), 0)
+
+            with BlockTimestampIndex(path) as block_index:
+                block_finder, provider = self.make_block_finder(block_index)
+                for timestamp in self.timestamps[:-5]:
+                    block = block_finder.get_block_for_timestamp(timestamp)
+                    self.assertEqual(block.number, self.expected_block(timestamp))
+                self.assertEqual(provider.rpc_count, 0)
+
+    def test_block_index_is_shared_between_handles(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "blocks.idx")
+            with BlockTimestampIndex(path, compact_threshold=10) as writer, BlockTimestampIndex(path) as reader:
+                for number in random.Random(2).sample(range(100), 25):
+                    writer.add(number, self.chain.timestamps[number])
+                self.assertEqual(len(writer), 25)
+                for number in range(100):
+                    timestamp = reader.get_timestamp(number)
+                    self.assertIn(timestamp, (None, self.chain.timestamps[number]))
+                self.assertEqual(len(reader), 25)
+                below, above = reader.bracket(self.chain.timestamps[50])
+                self.assertLessEqual(below[0], 50)
+                self.assertGreater(above[0], 50)
+
+    def test_block_index_writes_a_block_once(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "blocks.idx")
+            with BlockTimestampIndex(path) as first, BlockTimestampIndex(path) as second:
+                first.add(7, 70)
+                # `second` has not seen the record yet, and must not append it again.
+                second.add(7, 70)
+                second.add(8, 80)
+                self.assertEqual(os.path.getsize(path), 16 + 2 * 16)
+                # Compacting a removed file recreates it without taking the lock twice.
+                os.remove(path)
+                first.compact()
+                first.add(9, 90)
+                self.assertEqual((len(first), first.get_timestamp(9)), (1, 90))
+
+
+class CountingBlocks:
+    """A `request_block` over a mock chain that counts requests and takes `latency` seconds to answer."""
+
+    def __init__(self, chain: MockChain, latency: float = 0.0, gate: threading.Event = None) -> None:
+        self.get_block = Web3(MockProvider(chain)).eth.get_block
+        self.latency = latency
+        self.gate = gate
+        self.requests = []
+        self.in_flight = self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, number):
+        with self._lock:
+            self.requests.append(number)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.gate is not None:
+                self.gate.wait(5)
+            time.sleep(self.latency)
+            return self.get_block(number)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def run_threads(count: int, target) -> list:
+    results = [None] * count
+    errors = []
+
+    def run(i):
+        try:
+            results[i] = target(i)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+class TestConcurrentBlockFinder(unittest.TestCase):
+    def setUp(self) -> None:
+        self.chain = MockChain(length=50_000)
+        rng = random.Random(3)
+        self.timestamps = [
+            rng.randint(self.chain.timestamps[0], self.chain.timestamps[-1]) for _ in range(40)
+        ]
+        return super().setUp()
+
+    def expected_block(self, timestamp: int) -> int:
+        return bisect_right(self.chain.timestamps, timestamp) - 1
+
+    def test_concurrent_requests_share_one_rpc(self):
+        for number in (777, "latest"):
+            gate, stats = threading.Event(), Stats()
+            request_block = CountingBlocks(self.chain, gate=gate)
+            block_finder = BlockFinder(None, request_block, instrumentation=stats)
+
+            def release():
+                # Answers once the other seven threads wait on the first one's request.
+                deadline = time.monotonic() + 5
+                while stats.counters.get("block_finder.request.shared", 0) < 7 and time.monotonic() < deadline:
+                    time.sleep(0.001)
+                gate.set()
+
+            releaser = threading.Thread(target=release)
+            releaser.start()
+            get = block_finder.get_latest_block if number == "latest" else lambda: block_finder.get_block(number)
+            blocks = run_threads(8, lambda _: get())
+            releaser.join()
+            self.assertEqual(request_block.requests, [number])
+            self.assertEqual(len(set(blocks)), 1)
+
+    def test_bulk_lookup_rounds_are_concurrent(self):
+        requests = [LpFeeRequest(WETH, WETH_POOL, 10**18, timestamp) for timestamp in self.timestamps]
+        for max_workers, concurrent in ((None, True), (1, False)):
+            calculator = LpFeeCalculator(MockProvider(self.chain))
+            request_block = calculator.block_finder.request_block = CountingBlocks(self.chain, latency=0.002)
+            results = calculator.get_lp_fee_pcts(requests, max_workers=max_workers)
+            self.assertTrue(all(isinstance(result, int) for result in results))
+            self.assertEqual(request_block.max_in_flight > 1, concurrent)
+
+    def test_failed_request_reaches_every_waiter(self):
+        gate = threading.Event()
+        calls = []
+
+        def request_block(number):
+            calls.append(number)
+            gate.wait(5)
+            raise ValueError("rpc down")
+
+        block_finder = BlockFinder(None, request_block)
+        threading.Timer(0.05, gate.set).start()
+        with self.assertRaises(ValueError):
+            run_threads(4, lambda _: block_finder.get_block(5))
+        self.assertLessEqual(len(calls), 4)
+        self.assertEqual(block_finder._in_flight, {})
+
+    def test_stress_shared_finder(self):
+        threads = 8
+
+        def lookups(block_finder, i):
+            timestamps = list(self.timestamps)
+            random.Random(i).shuffle(timestamps)
+            return [(timestamp, block_finder.get_block_for_timestamp(timestamp)) for timestamp in timestamps]
+
+        per_thread = CountingBlocks(self.chain, latency=0.0005)
+        finders = [BlockFinder(None, per_thread) for _ in range(threads)]
+        run_threads(threads, lambda i: lookups(finders[i], i))
+
+        for max_blocks in (100_000, 64):
+            shared = CountingBlocks(self.chain, latency=0.0005)
+            block_finder = BlockFinder(None, shared, max_blocks=max_blocks)
+            for results in run_threads(threads, lambda i: lookups(block_finder, i)):
+                for timestamp, block in results:
+                    self.assertEqual(block, Block(self.expected_block(timestamp), self.chain.timestamps[block.number]))
+            self.assertEqual(list(block_finder.blocks.numbers), sorted(block_finder.blocks.numbers))
+            if max_blocks == 100_000:
+                self.assertLess(len(shared.requests) * 3, len(per_thread.requests))
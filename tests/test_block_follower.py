@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+import unittest
+from aiohttp import web
+from across.block_finder import Block
+from across.block_follower import BlockFollower
+from across.lp_fee_calculator import LpFeeCalculator
+from across.read_cache import ContractReadCache
+from tests.mock_chain import MockChain, MockProvider, WETH, WETH_POOL
+
+
+class TestBlockFollower(unittest.TestCase):
+    def setUp(self) -> None:
+        self.chain = MockChain(length=2_000)
+        self.provider = MockProvider(self.chain)
+        self.read_cache = ContractReadCache()
+        self.calculator = LpFeeCalculator(self.provider, read_cache=self.read_cache, local_utilization=True)
+        self.follower = BlockFollower(self.calculator, warm=[(WETH, WETH_POOL)])
+        return super().setUp()
+
+    def test_heads_serve_latest_quotes_without_rpcs(self):
+        self.follower.poll()
+        self.provider.calls.clear()
+        self.calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18)
+        self.calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18, self.chain.timestamps[-1] + 5)
+        self.assertEqual(sum(self.provider.calls.values()), 0)
+
+        self.chain.mine(3)
+        self.follower.poll()
+        self.assertEqual(self.calculator.block_finder.get_latest_block().number, self.chain.latest)
+        self.provider.calls.clear()
+        curve = self.calculator.get_fee_curve(WETH, WETH_POOL)
+        self.assertEqual(curve.block_number, self.chain.latest)
+        self.assertEqual(sum(self.provider.calls.values()), 0)
+
+    def test_reorg_drops_replaced_blocks(self):
+        self.chain.mine(5)
+        self.follower.poll()
+        old_head = self.chain.latest
+        old_curve = self.calculator.get_fee_curve(WETH, WETH_POOL)
+        self.assertIsNotNone(self.calculator.block_finder.blocks.get(old_head))
+
+        self.chain.reorg(depth=3, length=2)  # A shorter chain, replacing the old head.
+        self.chain.timestamps[-1] += 1
+        self.follower.poll()
+        block_finder = self.calculator.block_finder
+        self.assertEqual(block_finder.get_latest_block(), Block(self.chain.latest, self.chain.timestamps[-1]))
+        self.assertIsNone(block_finder.blocks.get(old_head))
+        self.assertIsNot(self.calculator.get_fee_curve(WETH, WETH_POOL), old_curve)
+        self.assertFalse(
+            any(key[-1] == old_head for key in self.read_cache._entries if isinstance(key[-1], int))
+        )
+
+    def test_stale_heads_are_not_used(self):
+        block_finder = self.calculator.block_finder
+        block_finder.max_head_age = 0.05
+        follower = BlockFollower(self.calculator)
+        follower.poll()
+        self.assertIsNotNone(block_finder.current_head())
+        time.sleep(0.1)
+        follower.poll()  # The same head, it is used again.
+        self.assertEqual(block_finder.current_head().number, self.chain.latest)
+
+        time.sleep(0.1)
+        self.chain.mine(2)
+        self.assertIsNone(block_finder.current_head())
+        self.provider.calls.clear()
+        self.assertEqual(block_finder.get_latest_block().number, self.chain.latest)
+        self.assertEqual(self.provider.calls["eth_getBlockByNumber"], 1)
+
+    def test_follows_in_the_background(self):
+        self.follower.poll_interval = 0.01
+        with self.follower:
+            self.chain.mine(2)
+            deadline = time.monotonic() + 5
+            while self.calculator.block_finder.get_latest_block().number != self.chain.latest:
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.01)
+        # Stopped, so the latest block is requested again.
+        self.provider.calls.clear()
+        self.calculator.block_finder.get_latest_block()
+        self.assertEqual(self.provider.calls["eth_getBlockByNumber"], 1)
+
+    def test_subscribes_to_new_heads(self):
+        subscribed, stop, ports = threading.Event(), threading.Event(), []
+
+        async def serve(request):
+            connection = web.WebSocketResponse()
+            await connection.prepare(request)
+            subscription = await connection.receive_json()
+            await connection.send_json({"jsonrpc": "2.0", "id": subscription["id"], "result": "0x1"})
+            subscribed.set()
+            for number in range(self.chain.latest - 2, self.chain.latest + 1):
+                head = {k: hex(v) if isinstance(v, int) else v for k, v in self.chain.block(number).items()}
+                params = {"subscription": "0x1", "result": head}
+                await connection.send_json({"jsonrpc": "2.0", "method": "eth_subscription", "params": params})
+            async for _ in connection:
+                pass
+            return connection
+
+        async def main():
+            app = web.Application()
+            app.router.add_get("/", serve)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            ports.append(site._server.sockets[0].getsockname()[1])
+            while not stop.is_set():
+                await asyncio.sleep(0.01)
+            await runner.cleanup()
+
+        thread = threading.Thread(target=asyncio.run, args=(main(),), daemon=True)
+        thread.start()
+        try:
+            while not ports:
+                time.sleep(0.01)
+            follower = BlockFollower(self.calculator, websocket_url=f"ws://127.0.0.1:{ports[0]}/", poll_interval=0.05)
+            with follower:
+                self.assertTrue(subscribed.wait(5))
+                head = Block(self.chain.latest, self.chain.timestamps[-1])
+                deadline = time.monotonic() + 5
+                while self.calculator.block_finder.current_head() != head:
+                    self.assertLess(time.monotonic(), deadline)
+                    time.sleep(0.01)
+        finally:
+            stop.set()
+            thread.join(5)
+
+if __name__ == "__main__":
+    unittest.main()
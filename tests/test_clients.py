@@ -0,0 +1,84 @@
+import gc
+import unittest
+import weakref
+from across.clients import BridgePool, ContractRegistry, RateModelStore, aggregate_calls, contract_registry
+from tests.mock_chain import MockChain, MockProvider, WETH_POOL, USDC_POOL, RATE_MODEL_STORE
+
+
+class FailingCallProvider(MockProvider):
+    def _eth_call(self, transaction, tag="latest"):
+        raise ValueError("rate limited")
+
+
+class TestContractRegistry(unittest.TestCase):
+    def setUp(self) -> None:
+        self.provider = MockProvider(MockChain(length=10))
+        return super().setUp()
+
+    def test_connect_reuses_contracts(self):
+        self.assertIs(
+            BridgePool.connect(WETH_POOL, self.provider),
+            BridgePool.connect(WETH_POOL, self.provider),
+        )
+        self.assertIsNot(
+            BridgePool.connect(WETH_POOL, self.provider),
+            BridgePool.connect(WETH_POOL, MockProvider(MockChain(length=10))),
+        )
+        self.assertIs(
+            RateModelStore.connect(RATE_MODEL_STORE, self.provider).web3,
+            BridgePool.connect(WETH_POOL, self.provider).web3,
+        )
+
+    def test_lru_eviction(self):
+        registry = ContractRegistry(maxsize=2)
+        weth_pool = registry.get(self.provider, WETH_POOL, "bridge_pool_abi.json")
+        registry.get(self.provider, USDC_POOL, "bridge_pool_abi.json")
+        registry.get(self.provider, WETH_POOL, "bridge_pool_abi.json")
+        registry.get(self.provider, RATE_MODEL_STORE, "rate_model_store_abi.json")
+        self.assertEqual(len(registry), 2)
+        self.assertIs(registry.get(self.provider, WETH_POOL, "bridge_pool_abi.json"), weth_pool)
+
+    def test_forgets_dropped_providers(self):
+        registry = ContractRegistry(maxsize=1)
+        provider = MockProvider(MockChain(length=10))
+        registry.set_chain_id(provider, 1)
+        registry.get(provider, WETH_POOL, "bridge_pool_abi.json")
+        registry.get(self.provider, WETH_POOL, "bridge_pool_abi.json")
+        dropped = weakref.ref(provider)
+        del provider
+        gc.collect()
+        self.assertIsNone(dropped())
+        self.assertEqual(len(registry._chain_ids), 0)
+
+    def test_chain_id_is_requested_once(self):
+        registry = ContractRegistry()
+        provider = MockProvider(MockChain(length=10, chain_id=137))
+        self.assertEqual(registry.chain_id(provider), 137)
+        registry.get(provider, WETH_POOL, "bridge_pool_abi.json").functions.liquidReserves().call()
+        self.assertEqual(registry.chain_id(provider), 137)
+        self.assertEqual(provider.calls["eth_chainId"], 1)
+
+    def test_invalidate(self):
+        weth_pool = BridgePool.connect(WETH_POOL, self.provider)
+        contract_registry.invalidate(address=WETH_POOL.lower())
+        weth_pool_reconnected = BridgePool.connect(WETH_POOL, self.provider)
+        self.assertIsNot(weth_pool_reconnected, weth_pool)
+        contract_registry.invalidate(provider=self.provider)
+        self.assertIsNot(BridgePool.connect(WETH_POOL, self.provider), weth_pool_reconnected)
+
+
+class TestAggregateCalls(unittest.TestCase):
+    def test_falls_back_only_without_multicall(self):
+        chain = MockChain(length=10, multicall_block=None)
+        provider = MockProvider(chain)
+        calls = [(BridgePool.connect(pool, provider), "liquidReserves", ()) for pool in (WETH_POOL, USDC_POOL)]
+        expected = [chain.pool_reserves(pool, chain.latest)[0] for pool in (WETH_POOL, USDC_POOL)]
+        self.assertEqual(aggregate_calls(provider, calls), expected)
+        self.assertEqual(provider.calls["eth_call"], 3)
+
+    def test_raises_rpc_errors(self):
+        provider = FailingCallProvider(MockChain(length=10))
+        calls = [(BridgePool.connect(pool, provider), "liquidReserves", ()) for pool in (WETH_POOL, USDC_POOL)]
+        with self.assertRaises(ValueError):
+            aggregate_calls(provider, calls)
+        self.assertEqual(provider.calls["eth_call"], 1)
@@ -1,8 +1,19 @@
+import math
+import random
 import unittest
+from decimal import Decimal
+from unittest import mock
+from across.constants import RATE_MODELS
 from across.fee_calculator import (
     calculate_apy_from_utilization,
+    calculate_apys_from_utilizations,
+    calculate_area_under_rate_curve,
+    calculate_instantaneous_rate,
     calculate_realized_lp_fee_pct,
+    calculate_realized_lp_fee_pcts,
+    convert_apy_to_weekly_fee,
 )
+from across.rate_model import compile_rate_model
 from across.utils import toBNWei
 
 
@@ -43,3 +54,80 @@ class TestFeeCalculator(unittest.TestCase):
                 self.rateModel, interval["utilA"], interval["utilB"]
             )
             self.assertEqual(realizedLpFeePct, interval["wpy"])
+
+    def test_batch_exact_matches_scalar(self):
+        pairs = [(interval["utilA"], interval["utilB"]) for interval in self.tested_intervals]
+        self.assertEqual(
+            calculate_apys_from_utilizations(self.rateModel, pairs),
+            [interval["apy"] for interval in self.tested_intervals],
+        )
+        self.assertEqual(
+            calculate_realized_lp_fee_pcts(self.rateModel, pairs),
+            [interval["wpy"] for interval in self.tested_intervals],
+        )
+
+    def test_batch_approximate_is_close(self):
+        pairs = [(interval["utilA"], interval["utilB"]) for interval in self.tested_intervals]
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        inputs = [pairs] if numpy is None else [pairs, numpy.array(pairs, dtype=numpy.int64)]
+        for utilization_pairs in inputs:
+            apys = calculate_apys_from_utilizations(self.rateModel, utilization_pairs, exact=False)
+            wpys = calculate_realized_lp_fee_pcts(self.rateModel, utilization_pairs, exact=False)
+            for interval, apy, wpy in zip(self.tested_intervals, apys, wpys):
+                if interval["utilB"] - interval["utilA"] < 10**12:
+                    continue  # Integer truncation dominates the exact result for dust deposits.
+                self.assertAlmostEqual(apy / interval["apy"], 1.0, places=9)
+                self.assertAlmostEqual(wpy / interval["wpy"], 1.0, places=9)
+
+    def test_batch_approximate_without_numpy(self):
+        with mock.patch("across.fee_calculator._numpy", return_value=None):
+            self.test_batch_approximate_is_close()
+
+    def test_compiled_rate_model_matches_dict(self):
+        rng = random.Random(21)
+        F = 10**18
+        rate_models = [self.rateModel, *RATE_MODELS.values()] + [
+            {"UBar": rng.randint(1, F - 1), "R0": rng.randint(0, F), "R1": rng.randint(0, F), "R2": rng.randint(0, 5 * F)}
+            for _ in range(50)
+        ]
+        for rate_model in rate_models:
+            compiled = compile_rate_model(rate_model)
+            utilizations = [0, F, rate_model["UBar"], rate_model["UBar"] + 1, rate_model["UBar"] - 1, -F // 3, 2 * F]
+            utilizations += [rng.randint(0, F) for _ in range(50)]
+            for utilization in utilizations:
+                self.assertEqual(
+                    calculate_instantaneous_rate(compiled, utilization), calculate_instantaneous_rate(rate_model, utilization)
+                )
+                self.assertEqual(
+                    calculate_area_under_rate_curve(compiled, utilization),
+                    calculate_area_under_rate_curve(rate_model, utilization),
+                )
+            pairs = [(a, b) for a, b in zip(utilizations, utilizations[1:] + [1]) if a != b and min(a, b) >= 0]
+            self.assertEqual(
+                [calculate_realized_lp_fee_pct(compiled, *pair) for pair in pairs],
+                [calculate_realized_lp_fee_pct(rate_model, *pair) for pair in pairs],
+            )
+            self.assertEqual(calculate_realized_lp_fee_pcts(compiled, pairs), calculate_realized_lp_fee_pcts(rate_model, pairs))
+            self.assertEqual(
+                list(calculate_apys_from_utilizations(compiled, pairs, exact=False)),
+                list(calculate_apys_from_utilizations(rate_model, pairs, exact=False)),
+            )
+
+    def test_convert_apy_to_weekly_fee_matches_decimal(self):
+        def reference(apy):
+            # The Decimal implementation the integer root replaced.
+            weekly = (Decimal("1.0") + Decimal(apy) / Decimal(10**18)) ** (Decimal("1.0") / Decimal("52.0")) - Decimal(1.0)
+            return math.floor(weekly * 10**18)
+
+        for interval in self.tested_intervals:
+            self.assertEqual(convert_apy_to_weekly_fee(interval["apy"]), reference(interval["apy"]))
+
+        rng = random.Random(8)
+        apys = [0, 1, 10**18, 10**19, -(10**17)] + [
+            int(10 ** rng.uniform(0, 19.5)) for _ in range(3000)
+        ]
+        for apy in apys:
+            self.assertLessEqual(abs(convert_apy_to_weekly_fee(apy) - reference(apy)), 1, apy)
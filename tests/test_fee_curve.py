@@ -0,0 +1,58 @@
+import unittest
+from across.fee_curve import FeeCurve
+from across.lp_fee_calculator import LpFeeCalculator
+from across.pool_state import PoolState
+from across.constants import RATE_MODELS
+from tests.mock_chain import MockChain, MockProvider, WETH, WETH_POOL, USDC, USDC_POOL
+
+
+class TestFeeCurve(unittest.TestCase):
+    def setUp(self) -> None:
+        self.chain = MockChain(length=2_000)
+        self.provider = MockProvider(self.chain)
+        self.calculator = LpFeeCalculator(self.provider)
+        return super().setUp()
+
+    def test_exact_fee_matches_get_lp_fee_pct(self):
+        for token, pool in ((WETH, WETH_POOL), (USDC, USDC_POOL)):
+            curve = self.calculator.get_fee_curve(token, pool)
+            for amount in (curve.max_amount // 1000, curve.max_amount // 3, curve.max_amount):
+                self.assertEqual(curve.exact_fee(amount), self.calculator.get_lp_fee_pct(token, pool, amount))
+
+    def test_fee_interpolates_between_samples(self):
+        curve = self.calculator.get_fee_curve(WETH, WETH_POOL)
+        self.assertTrue(all(a <= b for a, b in zip(curve.fees, curve.fees[1:])))
+        for amount, fee in zip(curve.amounts, curve.fees):
+            self.assertEqual(curve.fee(amount), fee)
+        for i in range(1, 200):
+            amount = curve.max_amount * i // 200 + 12345
+            self.assertAlmostEqual(curve.fee(amount) / curve.exact_fee(amount), 1, delta=0.005)
+
+    def test_max_amount_for_fee_is_exact(self):
+        curve = self.calculator.get_fee_curve(WETH, WETH_POOL)
+        for max_fee_pct in (curve.fees[1], (curve.fees[20] + curve.fees[21]) // 2, curve.fees[-1] - 1):
+            amount = curve.max_amount_for_fee(max_fee_pct)
+            self.assertLessEqual(curve.exact_fee(amount), max_fee_pct)
+            self.assertGreater(curve.exact_fee(amount + 1), max_fee_pct)
+        self.assertEqual(curve.max_amount_for_fee(0), 0)
+        self.assertEqual(curve.max_amount_for_fee(10**18), curve.max_amount)
+
+    def test_zero_sized_relay_pays_the_instantaneous_rate(self):
+        curve = FeeCurve(RATE_MODELS[WETH], PoolState(10**18, 0, 0, 0, 10**18))
+        self.assertEqual(curve.exact_fee(0), 0)
+        self.assertGreater(curve.exact_fee(10**17), 0)
+
+    def test_curve_is_reused_until_the_block_changes(self):
+        curve = self.calculator.get_fee_curve(WETH, WETH_POOL)
+        self.provider.calls.clear()
+        self.assertIs(self.calculator.get_fee_curve(WETH, WETH_POOL), curve)
+        self.calculator.get_max_amount_for_lp_fee_pct(WETH, WETH_POOL, curve.fees[10])
+        self.assertEqual(self.provider.calls["eth_call"], 0)
+
+        historical = self.calculator.get_fee_curve(WETH, WETH_POOL, self.chain.timestamps[1_500])
+        self.assertIsNot(historical, curve)
+        self.assertEqual(historical.block_number, 1_500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import socket
+import unittest
+from across.instrumentation import (
+    CallbackInstrumentation,
+    NULL_INSTRUMENTATION,
+    Stats,
+    StatsdInstrumentation,
+)
+from across.lp_fee_calculator import LpFeeCalculator, LpFeeRequest
+from tests.mock_chain import MockChain, MockProvider, WETH, USDC, WETH_POOL, USDC_POOL
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self) -> None:
+        self.chain = MockChain(length=20_000)
+        self.provider = MockProvider(self.chain)
+        self.stats = Stats()
+        self.calculator = LpFeeCalculator(self.provider, instrumentation=self.stats)
+        return super().setUp()
+
+    def assert_rpc_counts_match_provider(self):
+        for method in ("eth_call", "eth_getBlockByNumber", "eth_chainId"):
+            self.assertEqual(
+                self.stats.counters.get("rpc." + method, 0), self.provider.calls[method], method
+            )
+
+    def test_get_lp_fee_pct_records_phases_and_rpcs(self):
+        timestamp = self.chain.timestamps[12_345] + 3
+        self.calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18, timestamp)
+        self.calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18)
+
+        self.assert_rpc_counts_match_provider()
+        self.assertEqual(self.stats.counters["lp_fee.quotes"], 2)
+        for phase in ("block_lookup", "contract_calls", "fee_math"):
+            self.assertEqual(self.stats.observations[f"lp_fee.{phase}_seconds"][0], 2)
+        count, iterations, _ = self.stats.observations["block_finder.search_iterations"]
+        self.assertEqual(count, 1)
+        self.assertEqual(iterations, self.stats.counters["block_finder.cache.miss"])
+
+    def test_repeated_lookup_hits_block_cache(self):
+        timestamp = self.chain.timestamps[4_000] + 1
+        self.calculator.block_finder.get_block_for_timestamp(timestamp)
+        self.stats.reset()
+        self.calculator.block_finder.get_block_for_timestamp(timestamp - 1)
+        self.assertNotIn("rpc.eth_getBlockByNumber", self.stats.counters)
+
+    def test_get_lp_fee_pcts_counts_multicall(self):
+        requests = [LpFeeRequest(WETH, WETH_POOL, i * 10**18) for i in range(1, 20)]
+        requests.append(LpFeeRequest(USDC, USDC_POOL, 10**12))
+        self.calculator.get_lp_fee_pcts(requests)
+        self.assert_rpc_counts_match_provider()
+        self.assertEqual(self.stats.counters["rpc.eth_call"], 1)
+        self.assertEqual(self.stats.counters["lp_fee.quotes"], 20)
+
+    def test_to_prometheus(self):
+        self.calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18)
+        text = self.stats.to_prometheus()
+        self.assertIn("# TYPE across_rpc_eth_call_total counter\nacross_rpc_eth_call_total 3\n", text)
+        self.assertIn("across_lp_fee_fee_math_seconds_count 1\n", text)
+        self.assertIn("across_lp_fee_fee_math_seconds_max ", text)
+
+    def test_callbacks(self):
+        events = []
+        calculator = LpFeeCalculator(
+            self.provider,
+            instrumentation=CallbackInstrumentation(
+                on_increment=lambda name, value: events.append(name)
+            ),
+        )
+        calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18)
+        self.assertIn("rpc.eth_call", events)
+
+    def test_statsd(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(("127.0.0.1", 0))
+        server.settimeout(5)
+        statsd = StatsdInstrumentation(*server.getsockname())
+        try:
+            statsd.increment("rpc.eth_call", 3)
+            statsd.observe("lp_fee.fee_math_seconds", 0.0015)
+            statsd.observe("block_finder.search_iterations", 7)
+            self.assertEqual(server.recv(512), b"across.rpc.eth_call:3|c")
+            self.assertEqual(server.recv(512), b"across.lp_fee.fee_math:1.500|ms")
+            self.assertEqual(server.recv(512), b"across.block_finder.search_iterations:7|h")
+        finally:
+            statsd.close()
+            server.close()
+
+    def test_disabled_by_default(self):
+        calculator = LpFeeCalculator(self.provider)
+        self.assertIs(calculator.instrumentation, NULL_INSTRUMENTATION)
+        self.assertIs(calculator.block_finder.instrumentation, NULL_INSTRUMENTATION)
+        self.assertIs(
+            NULL_INSTRUMENTATION.timer("a_seconds"), NULL_INSTRUMENTATION.timer("b_seconds")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
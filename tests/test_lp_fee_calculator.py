@@ -0,0 +1,121 @@
+import unittest
+from across.exceptions import AcrossException
+from across.lp_fee_calculator import LpFeeCalculator, LpFeeRequest
+from across.read_cache import ContractReadCache
+from tests.mock_chain import MockChain, MockProvider, WETH, USDC, WETH_POOL, USDC_POOL
+
+
+class FailingCallProvider(MockProvider):
+    def _eth_call(self, transaction, tag="latest"):
+        raise ValueError("rate limited")
+
+
+class TestLpFeeCalculator(unittest.TestCase):
+    def setUp(self) -> None:
+        self.chain = MockChain(length=2_000)
+        self.provider = MockProvider(self.chain)
+        self.calculator = LpFeeCalculator(self.provider)
+        return super().setUp()
+
+    def test_get_lp_fee_pcts_matches_get_lp_fee_pct(self):
+        requests = [
+            LpFeeRequest(WETH, WETH_POOL, 10**18),
+            LpFeeRequest(WETH, WETH_POOL, 50 * 10**18),
+            LpFeeRequest(USDC, USDC_POOL, 10**12),
+        ]
+        expected = [self.calculator.get_lp_fee_pct(*request) for request in requests]
+        self.assertEqual(self.calculator.get_lp_fee_pcts(requests), expected)
+
+    def test_get_lp_fee_pcts_uses_one_eth_call_per_block(self):
+        requests = [LpFeeRequest(WETH, WETH_POOL, i * 10**18) for i in range(1, 50)]
+        self.provider.calls.clear()
+        results = self.calculator.get_lp_fee_pcts(requests)
+        self.assertEqual(self.provider.calls["eth_call"], 1)
+        self.assertTrue(all(isinstance(r, int) for r in results))
+
+    def test_get_lp_fee_pcts_reports_errors_per_item(self):
+        unknown_token = "0x04Fa0d235C4abf4BcF4787aF4CF447DE572eF828"
+        results = self.calculator.get_lp_fee_pcts(
+            [
+                LpFeeRequest(WETH, WETH_POOL, 10**18),
+                LpFeeRequest(WETH, WETH_POOL, 0),
+                LpFeeRequest(unknown_token, WETH_POOL, 10**18),
+            ]
+        )
+        self.assertIsInstance(results[0], int)
+        self.assertIsInstance(results[1], AcrossException)
+        self.assertIsInstance(results[2], AcrossException)
+
+        malformed = [LpFeeRequest(WETH, WETH_POOL, "abc"), LpFeeRequest(WETH, WETH_POOL, None)]
+        valid = LpFeeRequest(WETH, WETH_POOL, 10**18)
+        results = self.calculator.get_lp_fee_pcts(malformed + [valid._replace(timestamp="soon"), valid])
+        self.assertEqual([type(result) for result in results], [AcrossException] * 3 + [int])
+        # Timestamps are ignored at a known block.
+        results = self.calculator.get_lp_fee_pcts_at_block(malformed + [valid._replace(timestamp="soon")], 1_500)
+        self.assertEqual([type(result) for result in results], [AcrossException] * 2 + [int])
+
+    def test_resolves_chain_from_provider(self):
+        provider = MockProvider(MockChain(length=2_000, block_time=2.5, chain_id=137, seed=1))
+        calculator = LpFeeCalculator(provider)
+        self.assertEqual(calculator.block_finder.network_id, 137)
+        self.assertEqual(calculator.chain_id, 137)
+        self.assertEqual(calculator.chain.block_time, 2.5)
+        self.assertEqual(provider.calls["eth_chainId"], 1)
+
+    def test_get_lp_fee_pcts_reports_rpc_errors_per_item(self):
+        provider = FailingCallProvider(self.chain)
+        requests = [LpFeeRequest(WETH, WETH_POOL, i * 10**18) for i in range(1, 4)]
+        results = LpFeeCalculator(provider).get_lp_fee_pcts(requests)
+        self.assertTrue(all(isinstance(result, AcrossException) and "rate limited" in str(result) for result in results))
+        self.assertEqual(provider.calls["eth_call"], 1)
+
+    def test_get_lp_fee_pcts_without_multicall(self):
+        chain = MockChain(length=2_000, multicall_block=None)
+        calculator = LpFeeCalculator(MockProvider(chain))
+        requests = [LpFeeRequest(WETH, WETH_POOL, 10**18), LpFeeRequest(WETH, WETH_POOL, 2 * 10**18)]
+        self.assertEqual(
+            calculator.get_lp_fee_pcts(requests),
+            [self.calculator.get_lp_fee_pct(*request) for request in requests],
+        )
+
+
+class TestLocalUtilization(unittest.TestCase):
+    def setUp(self) -> None:
+        self.chain = MockChain(length=2_000)
+        self.provider = MockProvider(self.chain)
+        self.calculator = LpFeeCalculator(self.provider, local_utilization=True)
+        self.contract_calculator = LpFeeCalculator(MockProvider(self.chain))
+        return super().setUp()
+
+    def test_matches_contract_utilization(self):
+        for number in range(1_000, 2_000, 97):
+            timestamp = self.chain.timestamps[number]
+            for amount in (10**15, 10**18, 300 * 10**18):
+                self.assertEqual(
+                    self.calculator.get_lp_fee_pct(WETH, WETH_POOL, amount, timestamp),
+                    self.contract_calculator.get_lp_fee_pct(WETH, WETH_POOL, amount, timestamp),
+                )
+
+    def test_get_lp_fee_pcts_matches_contract_utilization(self):
+        requests = [LpFeeRequest(WETH, WETH_POOL, i * 10**18) for i in range(1, 20)]
+        requests += [LpFeeRequest(USDC, USDC_POOL, i * 10**12) for i in range(1, 20)]
+        self.assertEqual(
+            self.calculator.get_lp_fee_pcts(requests), self.contract_calculator.get_lp_fee_pcts(requests)
+        )
+
+    def test_more_amounts_cost_no_more_reads(self):
+        cache = ContractReadCache()
+        calculator = LpFeeCalculator(self.provider, read_cache=cache, local_utilization=True)
+        calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18)
+        self.provider.calls.clear()
+        for amount in range(2, 50):
+            calculator.get_lp_fee_pct(WETH, WETH_POOL, amount * 10**18)
+        self.assertEqual(self.provider.calls["eth_call"], 0)
+
+    def test_verification_detects_mismatch(self):
+        calculator = LpFeeCalculator(self.provider, local_utilization=True, verify_utilization=1.0)
+        self.assertIsInstance(calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18), int)
+        self.chain.pool_bonds = lambda pool, number: 0  # The contract no longer agrees with the getters.
+        self.chain.liquidity_utilization_post_relay = lambda pool, amount, number: 10**17
+        with self.assertRaises(AcrossException):
+            calculator.get_lp_fee_pct(WETH, WETH_POOL, 2 * 10**18)
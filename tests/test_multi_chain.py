@@ -0,0 +1,147 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from across.block_finder import average_block_time_seconds
+from across.block_index import BlockTimestampIndex
+from across.chains import CHAINS, ChainConfig, get_chain, load_chains
+from across.exceptions import AcrossException
+from across.lp_fee_calculator import LpFeeCalculator
+from across.multi_chain import ChainLpFeeRequest, MultiChainLpFeeCalculator
+from tests.mock_chain import MockChain, MockProvider, RATE_MODEL_STORE, WETH, USDC, WETH_POOL, USDC_POOL
+
+POLYGON = ChainConfig(137, rate_model_store=RATE_MODEL_STORE, block_time=2.5)
+
+
+class SlowProvider(MockProvider):
+    """Records how many requests of all `SlowProvider`s sharing `state` were in flight at once."""
+
+    def __init__(self, chain: MockChain, state: dict, latency: float = 0.02) -> None:
+        super().__init__(chain)
+        self.state = state
+        self.latency = latency
+
+    def make_request(self, method, params):
+        with self.state["lock"]:
+            self.state["in_flight"] += 1
+            self.state["max_in_flight"] = max(self.state["max_in_flight"], self.state["in_flight"])
+        try:
+            time.sleep(self.latency)
+            return super().make_request(method, params)
+        finally:
+            with self.state["lock"]:
+                self.state["in_flight"] -= 1
+
+
+class TestMultiChainLpFeeCalculator(unittest.TestCase):
+    def setUp(self) -> None:
+        self.mainnet = MockChain(length=2_000)
+        self.polygon = MockChain(length=2_500, block_time=2.5, chain_id=137, seed=1)
+        self.providers = {1: MockProvider(self.mainnet), 137: MockProvider(self.polygon)}
+        self.calculator = MultiChainLpFeeCalculator(self.providers, chains={137: POLYGON})
+        self.addCleanup(self.calculator.close)
+        return super().setUp()
+
+    def test_matches_single_chain_calculators(self):
+        requests = [
+            ChainLpFeeRequest(1, WETH, WETH_POOL, 10**18),
+            ChainLpFeeRequest(137, WETH, WETH_POOL, 10**18),
+            ChainLpFeeRequest(137, USDC, USDC_POOL, 10**12),
+            ChainLpFeeRequest(1, USDC, USDC_POOL, 10**12, self.mainnet.timestamps[1_500]),
+        ]
+        single = {
+            1: LpFeeCalculator(MockProvider(self.mainnet)),
+            137: LpFeeCalculator(MockProvider(self.polygon), chain=POLYGON),
+        }
+        expected = [single[r.chain_id].get_lp_fee_pct(*r[1:]) for r in requests]
+        self.assertEqual(self.calculator.get_lp_fee_pcts(requests), expected)
+        self.assertEqual(self.calculator.get_lp_fee_pct(*requests[1]), expected[1])
+        self.assertNotEqual(expected[0], expected[1])
+
+    def test_uses_configured_chain_ids(self):
+        self.calculator.get_lp_fee_pcts(
+            [ChainLpFeeRequest(1, WETH, WETH_POOL, 10**18), ChainLpFeeRequest(137, WETH, WETH_POOL, 10**18)]
+        )
+        for provider in self.providers.values():
+            self.assertEqual(provider.calls["eth_chainId"], 0)
+        self.assertEqual(self.calculator.calculator(137).chain, POLYGON)
+
+    def test_reports_unknown_chains_per_item(self):
+        results = self.calculator.get_lp_fee_pcts(
+            [ChainLpFeeRequest(10, WETH, WETH_POOL, 10**18), ChainLpFeeRequest(1, WETH, WETH_POOL, 0)]
+        )
+        self.assertIsInstance(results[0], AcrossException)
+        self.assertIsInstance(results[1], AcrossException)
+        with self.assertRaises(AcrossException):
+            self.calculator.get_lp_fee_pct(10, WETH, WETH_POOL, 10**18)
+
+    def test_quotes_chains_in_parallel(self):
+        state = {"lock": threading.Lock(), "in_flight": 0, "max_in_flight": 0}
+        providers = {1: SlowProvider(self.mainnet, state), 137: SlowProvider(self.polygon, state)}
+        with MultiChainLpFeeCalculator(providers, chains={137: POLYGON}) as calculator:
+            results = calculator.get_lp_fee_pcts(
+                [ChainLpFeeRequest(chain_id, WETH, WETH_POOL, 10**18) for chain_id in (1, 137)]
+            )
+        self.assertTrue(all(isinstance(result, int) for result in results))
+        self.assertEqual(state["max_in_flight"], 2)
+
+    def test_quotes_one_chain_from_many_threads(self):
+        state = {"lock": threading.Lock(), "in_flight": 0, "max_in_flight": 0}
+        with MultiChainLpFeeCalculator({1: SlowProvider(self.mainnet, state)}) as calculator:
+            calculator.get_lp_fee_pct(1, WETH, WETH_POOL, 10**18)
+            threads = [
+                threading.Thread(
+                    target=calculator.get_lp_fee_pct, args=(1, WETH, WETH_POOL, 10**18, self.mainnet.timestamps[n])
+                )
+                for n in (500, 1_000, 1_500)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertGreater(state["max_in_flight"], 1)
+
+    def test_chain_scoped_options_are_given_per_chain(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        block_index = BlockTimestampIndex(os.path.join(directory.name, "mainnet-blocks.idx"))
+        with self.assertRaises(AssertionError):
+            MultiChainLpFeeCalculator(self.providers, chains={137: POLYGON}, block_index=block_index)
+        with MultiChainLpFeeCalculator(
+            self.providers, chains={137: POLYGON}, chain_kwargs={1: {"block_index": block_index}}
+        ) as calculator:
+            self.assertIs(calculator.calculator(1).block_finder.block_index, block_index)
+            self.assertIsNone(calculator.calculator(137).block_finder.block_index)
+
+
+class TestChains(unittest.TestCase):
+    def setUp(self) -> None:
+        self.registered = dict(CHAINS)
+        self.addCleanup(lambda: (CHAINS.clear(), CHAINS.update(self.registered)))
+        return super().setUp()
+
+    def test_load_chains_from_file(self):
+        config = {"10": {"rate_model_store": RATE_MODEL_STORE, "block_time": 2}, "137": {"rpc_url": "http://localhost:8545"}}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "chains.json")
+            with open(path, "w") as config_file:
+                json.dump(config, config_file)
+            chains = load_chains(path)
+        self.assertEqual(chains[10], ChainConfig(10, RATE_MODEL_STORE, 2))
+        self.assertEqual(chains[137], get_chain(137))
+        self.assertEqual(chains[137].block_time, 2.5)
+        self.assertEqual(average_block_time_seconds(networkId=10), 2)
+        with self.assertRaises(ValueError):
+            load_chains({"10": {"blocktime": 2}})
+
+    def test_from_config_builds_pooled_providers(self):
+        calculator = MultiChainLpFeeCalculator.from_config({"137": {"rpc_url": "http://localhost:8545"}})
+        self.assertEqual(calculator.chain_ids, [137])
+        provider = calculator.calculator(137).provider
+        self.assertEqual(provider.endpoint_uri, "http://localhost:8545")
+
+
+if __name__ == "__main__":
+    unittest.main()
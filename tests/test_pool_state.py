@@ -0,0 +1,66 @@
+import unittest
+from across.exceptions import AcrossException
+from across.pool_state import PoolState
+from tests.mock_chain import MockChain, WETH_POOL, USDC_POOL
+
+
+class TestPoolState(unittest.TestCase):
+    def test_matches_contract_semantics(self):
+        chain = MockChain(length=300)
+        for pool in (WETH_POOL, USDC_POOL):
+            for number in range(0, 300, 7):
+                state = PoolState(
+                    *chain.pool_reserves(pool, number),
+                    chain.pool_bonds(pool, number),
+                    chain.l1_token_balance(pool, number),
+                )
+                for amount in (0, 1, 10**18, 123_456_789 * 10**12):
+                    self.assertEqual(
+                        state.liquidity_utilization_post_relay(amount),
+                        chain.liquidity_utilization_post_relay(pool, amount, number),
+                    )
+
+    def test_matches_worked_contract_vectors(self):
+        # (liquidReserves, utilizedReserves, pendingReserves, bonds, l1TokenBalance, relayedAmount, expected),
+        # worked by hand through BridgePool.sync() and _liquidityUtilizationPostRelay.
+        e18 = 10**18
+        vectors = [
+            # Bonds held, balance - bonds == liquidReserves so sync changes nothing: 65 / 150.
+            (100 * e18, 50 * e18, 5 * e18, 2 * e18, 102 * e18, 10 * e18, 433333333333333333),
+            # 30 tokens arrived: liquid 130, utilized 20, so (5 + 20) / (130 + 20).
+            (100 * e18, 50 * e18, 0, 3 * e18, 133 * e18, 5 * e18, 166666666666666666),
+            # Sync drives utilized to 10 - 40 = -30, floored to 0: (6 + 1) / 120.
+            (80 * e18, 10 * e18, e18, 0, 120 * e18, 6 * e18, 58333333333333333),
+            # Already negative utilized reserves, no sync: (3 + 2) / 50.
+            (50 * e18, -5 * e18, 2 * e18, e18, 51 * e18, 3 * e18, 100000000000000000),
+            # Nothing liquid and utilized floored to 0: the denominator is 0 and the contract returns 1e18.
+            (0, -7 * e18, 4 * e18, 5 * e18, 5 * e18, e18, e18),
+            # Integer division rounds down: 1 / 3.
+            (3, 0, 0, 0, 3, 1, 333333333333333333),
+        ]
+        for *fields, amount, expected in vectors:
+            with self.subTest(fields=fields, amount=amount):
+                self.assertEqual(PoolState(*fields).liquidity_utilization_post_relay(amount), expected)
+
+    def test_sync_books_arrived_tokens(self):
+        state = PoolState(100, 50, 0, 10, 130).synced()
+        self.assertEqual((state.liquidReserves, state.utilizedReserves), (120, 30))
+        # A balance below the booked reserves leaves the state as it is.
+        self.assertEqual(PoolState(100, 50, 0, 10, 60).synced(), PoolState(100, 50, 0, 10, 60))
+
+    def test_negative_utilized_reserves_are_floored(self):
+        state = PoolState(10**18, -(10**17), 10**16, 0, 10**18)
+        self.assertEqual(state.liquidity_utilization_current(), 10**16)
+
+    def test_empty_pool_is_fully_utilized(self):
+        self.assertEqual(PoolState(0, 0, 0, 0, 0).liquidity_utilization_post_relay(5), 10**18)
+
+    def test_reverts_like_the_contract(self):
+        with self.assertRaises(AcrossException):
+            PoolState(1, 0, 0, 0, 1).liquidity_utilization_post_relay(2**250)
+        with self.assertRaises(AcrossException):
+            PoolState(1, 0, 0, 10, 5).liquidity_utilization_current()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import json
+import pickle
+import unittest
+from across.constants import RATE_MODELS
+from across.exceptions import AcrossException
+from across.lp_fee_calculator import LpFeeCalculator, LpFeeRequest
+from across.rate_model import CompiledRateModel, RateModelHistory, compile_rate_model, parse_compiled_rate_model
+from tests.mock_chain import MockChain, MockProvider, WETH, USDC, WETH_POOL
+
+
+class TestCompiledRateModel(unittest.TestCase):
+    def test_immutable_and_hashable(self):
+        compiled = compile_rate_model(RATE_MODELS[WETH])
+        self.assertIs(compile_rate_model(dict(RATE_MODELS[WETH])), compiled)
+        self.assertEqual(compiled, RATE_MODELS[WETH])
+        self.assertEqual(dict(compiled), RATE_MODELS[WETH])
+        self.assertEqual(compiled["UBar"], RATE_MODELS[WETH]["UBar"])
+        self.assertEqual(len({compiled, CompiledRateModel(RATE_MODELS[WETH]), compile_rate_model(RATE_MODELS[USDC])}), 2)
+        with self.assertRaises(AttributeError):
+            compiled.UBar = 1
+        with self.assertRaises(AttributeError):
+            compiled.extra = 1
+        with self.assertRaises(KeyError):
+            compiled["kink_area"]
+        self.assertIs(pickle.loads(pickle.dumps(compiled)), compiled)
+
+    def test_parse_compiled_rate_model(self):
+        rate_model_string = json.dumps({key: str(value) for key, value in RATE_MODELS[USDC].items()})
+        self.assertIs(parse_compiled_rate_model(rate_model_string), compile_rate_model(RATE_MODELS[USDC]))
+        with self.assertRaises(AcrossException):
+            parse_compiled_rate_model('{"UBar": "0", "R0": "0", "R1": "0", "R2": "0"}')
+        with self.assertRaises(AcrossException):
+            parse_compiled_rate_model('{"UBar": "1"}')
+
+
+class TestRateModelHistory(unittest.TestCase):
+    def test_get_by_block(self):
+        history = RateModelHistory()
+        history.seed(RATE_MODELS, 100)
+        updated = dict(RATE_MODELS[WETH], R0=1)
+        self.assertIsNone(history.get(WETH, 99))
+        self.assertEqual(history.get(WETH, 150), RATE_MODELS[WETH])  # Seeds answer before a backfill.
+        history.add(WETH.lower(), 200, updated)
+        history.synced_block = 300
+        self.assertIsNone(history.get(WETH, 150))  # Indexed blocks before the first update read the store.
+        self.assertEqual(history.get(WETH, 200), updated)
+        self.assertEqual(history.get(WETH, 300), updated)
+        self.assertIsNone(history.get(WETH, 301))  # The indexed update is newer than the seed.
+        self.assertIsNone(history.get(USDC, 150))
+        self.assertEqual(history.get(USDC, 301), RATE_MODELS[USDC])
+        history.add(USDC, 250, "not a rate model")
+        self.assertIsNone(history.get(USDC, 260))
+        self.assertIsNone(history.get(USDC, 301))
+
+    def test_backfilled_quotes_need_no_rate_model_rpcs(self):
+        chain = MockChain(length=2_000)
+        provider = MockProvider(chain)
+        expected = [LpFeeCalculator(provider).get_lp_fee_pct(WETH, WETH_POOL, 10**18, chain.timestamps[n]) for n in (500, 1500)]
+
+        calculator = LpFeeCalculator(provider)
+        self.assertEqual(calculator.sync_rate_model_history(chunk_size=500), 4)
+        self.assertEqual(provider.calls["eth_getLogs"], 4)  # Blocks 0 to 1_999, 500 per request.
+        provider.calls.clear()
+        self.assertEqual(
+            [calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18, chain.timestamps[n]) for n in (500, 1500)],
+            expected,
+        )
+        self.assertEqual(provider.calls["eth_call"], 4)  # Two utilization reads per quote.
+        self.assertEqual(
+            calculator.get_lp_fee_pcts(
+                [LpFeeRequest(WETH, WETH_POOL, 10**18, chain.timestamps[n]) for n in (500, 1500)]
+            ),
+            expected,
+        )
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import time
+import unittest
+from across.lp_fee_calculator import LpFeeCalculator, LpFeeRequest
+from across.read_cache import MISSING, ContractReadCache
+from tests.mock_chain import MockChain, MockProvider, WETH, WETH_POOL
+
+
+class TestContractReadCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = ContractReadCache(maxsize=2)
+        cache.set("a", 1, permanent=True)
+        cache.set("b", 2, permanent=True)
+        cache.get("a")
+        cache.set("c", 3, permanent=True)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIs(cache.get("b"), MISSING)
+
+    def test_recent_reads_expire(self):
+        cache = ContractReadCache(ttl=0.05)
+        cache.set("recent", 1, permanent=False)
+        cache.set("final", 2, permanent=True)
+        self.assertEqual(cache.get("recent"), 1)
+        time.sleep(0.06)
+        self.assertIs(cache.get("recent"), MISSING)
+        self.assertEqual(cache.get("final"), 2)
+
+    def test_final_reads_persist_on_disk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "reads.sqlite")
+            key = (1, "0xpool", "liquidityUtilizationPostRelay", (10**18,), 100)
+            with ContractReadCache(path=path) as cache:
+                cache.set(key, 10**40, permanent=True)
+                cache.set((1, "latest"), 200, permanent=False)
+            with ContractReadCache(path=path) as cache:
+                self.assertEqual(cache.get(key), 10**40)
+                self.assertIs(cache.get((1, "latest")), MISSING)
+
+
+class TestLpFeeCalculatorReadCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.chain = MockChain(length=2_000)
+        self.provider = MockProvider(self.chain)
+        self.cache = ContractReadCache()
+        self.calculator = LpFeeCalculator(self.provider, read_cache=self.cache)
+        return super().setUp()
+
+    def test_repeated_historical_quotes_skip_contract_reads(self):
+        timestamp = self.chain.timestamps[1_500]
+        expected = LpFeeCalculator(MockProvider(self.chain)).get_lp_fee_pct(WETH, WETH_POOL, 10**18, timestamp)
+        self.assertEqual(self.calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18, timestamp), expected)
+        self.provider.calls.clear()
+        self.assertEqual(self.calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18, timestamp), expected)
+        self.assertEqual(
+            self.calculator.get_lp_fee_pcts([LpFeeRequest(WETH, WETH_POOL, 10**18, timestamp)]), [expected]
+        )
+        self.assertEqual(self.provider.calls["eth_call"], 0)
+
+    def test_get_lp_fee_pcts_only_fetches_missing_reads(self):
+        self.calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18)
+        self.provider.calls.clear()
+        results = self.calculator.get_lp_fee_pcts(
+            [LpFeeRequest(WETH, WETH_POOL, 10**18), LpFeeRequest(WETH, WETH_POOL, 2 * 10**18)]
+        )
+        self.assertTrue(all(isinstance(result, int) for result in results))
+        # The latest block is reused and only the new amount's utilization is read.
+        self.assertEqual(self.provider.calls["eth_getBlockByNumber"], 0)
+        self.assertEqual(self.provider.calls["eth_call"], 1)
+
+    def test_latest_reads_expire(self):
+        self.cache.ttl = 0.05
+        self.calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18)
+        time.sleep(0.06)
+        self.provider.calls.clear()
+        self.calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18)
+        self.assertEqual(self.provider.calls["eth_getBlockByNumber"], 1)
+        self.assertEqual(self.provider.calls["eth_call"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
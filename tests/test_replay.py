@@ -0,0 +1,84 @@
+import os
+import tempfile
+import time
+import unittest
+from across.exceptions import AcrossException
+from across.lp_fee_calculator import LpFeeCalculator, LpFeeRequest
+from across.replay import RecordingProvider, ReplayProvider, _TRAILER
+from tests.mock_chain import MockChain, MockProvider, WETH, USDC, WETH_POOL, USDC_POOL
+
+
+class TestReplayProvider(unittest.TestCase):
+    def setUp(self) -> None:
+        self.chain = MockChain(length=2_000)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "quotes.rpc")
+        self.requests = [
+            LpFeeRequest(WETH, WETH_POOL, 10**18, self.chain.timestamps[1_200]),
+            LpFeeRequest(USDC, USDC_POOL, 10**12, self.chain.timestamps[1_700]),
+            LpFeeRequest(WETH, WETH_POOL, 10**20),
+        ]
+        return super().setUp()
+
+    def quote(self, provider) -> list:
+        calculator = LpFeeCalculator(provider)
+        return [calculator.get_lp_fee_pct(*request) for request in self.requests] + calculator.get_lp_fee_pcts(
+            self.requests
+        )
+
+    def record(self) -> tuple:
+        provider = MockProvider(self.chain)
+        with RecordingProvider(provider, self.path) as recording:
+            expected = self.quote(recording)
+        return expected, provider
+
+    def test_replays_recorded_results(self):
+        expected, provider = self.record()
+        with ReplayProvider(self.path) as replay:
+            self.assertEqual(len(replay), provider.rpc_count)
+            self.assertEqual(self.quote(replay), expected)
+            self.assertEqual(replay.calls, provider.calls)
+            self.assertFalse(replay.misses)
+            replay.reset()
+            self.assertEqual(self.quote(replay), expected)
+
+    def test_injects_latency(self):
+        self.record()
+        with ReplayProvider(self.path, latency=0.001) as replay:
+            start = time.perf_counter()
+            self.quote(replay)
+            self.assertGreaterEqual(time.perf_counter() - start, replay.rpc_count * 0.001)
+            self.assertAlmostEqual(replay.seconds, replay.rpc_count * 0.001)
+        with ReplayProvider(self.path, latency="recorded") as replay:
+            self.quote(replay)
+            self.assertGreater(replay.seconds, 0)
+
+    def test_reads_interrupted_recording(self):
+        expected, provider = self.record()
+        with open(self.path, "rb") as f:
+            f.seek(-_TRAILER.size, os.SEEK_END)
+            index_offset = _TRAILER.unpack(f.read())[0]
+        # Drop the index and trailer, and tear the last record.
+        with open(self.path, "r+b") as f:
+            f.truncate(index_offset - 4)
+        with ReplayProvider(self.path) as replay:
+            self.assertEqual(len(replay), provider.rpc_count - 1)
+            calculator = LpFeeCalculator(replay)
+            self.assertEqual([calculator.get_lp_fee_pct(*request) for request in self.requests[:2]], expected[:2])
+
+    def test_raises_on_unrecorded_requests(self):
+        self.record()
+        with ReplayProvider(self.path) as replay:
+            calculator = LpFeeCalculator(replay)
+            with self.assertRaises(AcrossException):
+                calculator.get_lp_fee_pct(WETH, WETH_POOL, 10**18, self.chain.timestamps[1_000])
+            self.assertEqual(sum(replay.misses.values()), 1)
+        with open(self.path, "wb") as f:
+            f.write(b"not a recording")
+        with self.assertRaises(AcrossException):
+            ReplayProvider(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
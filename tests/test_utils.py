@@ -1,6 +1,11 @@
 from dataclasses import dataclass
+from decimal import Decimal
+import subprocess
+import sys
 import unittest
-from across.utils import sorted_index_by
+from pathlib import Path
+from web3 import Web3
+from across.utils import sorted_index_by, toBNWei
 
 
 class TestFeeCalculator(unittest.TestCase):
@@ -21,3 +26,22 @@ class TestFeeCalculator(unittest.TestCase):
             self.assertEqual(
                 sorted_index_by(data[i][0], data[i][1], data[i][2]), data[i][3]
             )
+
+    def test_toBNWei_matches_web3(self):
+        for value in (0, 1, 10**40, "0", "0.65", "123.456789012345678912", "0.0000000000000000001",
+                      0.01, 0.04693201411030239, 3.14159, 1e-7, Decimal("0.3"), "1e3"):
+            self.assertEqual(toBNWei(value), Web3.toWei(value, "ether"))
+        for value in (-1, "-0.5", 2**256):
+            with self.assertRaises(ValueError):
+                toBNWei(value)
+        with self.assertRaises(TypeError):
+            toBNWei(None)
+
+    def test_fee_math_does_not_import_web3(self):
+        modules = "across.constants, across.fee_calculator, across.fee_curve, across.pool_state, across.rate_model, across.utils"
+        script = f"import sys, across, {modules}; across.toBNWei; assert 'web3' not in sys.modules, 'web3 imported'"
+        subprocess.run([sys.executable, "-c", script], cwd=Path(__file__).parent.parent, check=True)
+
+    def test_api_clients_do_not_import_web3(self):
+        script = "import sys, across.api, across.async_api; assert 'web3' not in sys.modules, 'web3 imported'"
+        subprocess.run([sys.executable, "-c", script], cwd=Path(__file__).parent.parent, check=True)